@@ -174,6 +174,9 @@ class flags(metaclass=FlagsMeta):
             "(pg compiler output)."
     )
 
+    sql_disable_normalization = Flag(
+        doc="Disable SQL normalization (constant extraction)")
+
 
 @contextlib.contextmanager
 def timeit(title='block'):
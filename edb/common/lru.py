@@ -42,13 +42,31 @@ class LRUMapping(collections.abc.MutableMapping):
     # entries dict, whereas the unused one will group in the
     # beginning of it.
 
-    def __init__(self, *, maxsize):
+    # Optionally, every entry can be assigned a weight (e.g. its size
+    # in bytes) with the *weigher* callable; entries are then also
+    # evicted while the total weight exceeds *maxweight*.  The most
+    # recently pushed entry is never evicted on insertion, even if it
+    # exceeds *maxweight* on its own.
+
+    def __init__(self, *, maxsize, maxweight=None, weigher=None,
+                 on_evict=None):
         if maxsize <= 0:
             raise ValueError(
                 f'maxsize is expected to be greater than 0, got {maxsize}')
+        if maxweight is not None and weigher is None:
+            raise ValueError('maxweight requires a weigher')
 
         self._dict = collections.OrderedDict()
         self._maxsize = maxsize
+        self._maxweight = maxweight
+        self._weigher = weigher
+        self._weights = {} if weigher is not None else None
+        self._weight = 0
+        self._on_evict = on_evict
+
+    @property
+    def weight(self):
+        return self._weight
 
     def __getitem__(self, key):
         o = self._dict[key]
@@ -56,16 +74,37 @@ class LRUMapping(collections.abc.MutableMapping):
         return o
 
     def __setitem__(self, key, o):
+        if self._weights is not None:
+            weight = self._weigher(o)
+            self._weight += weight - self._weights.get(key, 0)
+            self._weights[key] = weight
+
         if key in self._dict:
             self._dict[key] = o
             self._dict.move_to_end(key, last=True)
         else:
             self._dict[key] = o
             if len(self._dict) > self._maxsize:
-                self._dict.popitem(last=False)
+                self.evict()
+
+        if self._maxweight is not None:
+            while self._weight > self._maxweight and len(self._dict) > 1:
+                self.evict()
+
+    def replace(self, key, o):
+        """Replace the value of an existing entry without promoting it."""
+        if key not in self._dict:
+            raise KeyError(key)
+        if self._weights is not None:
+            weight = self._weigher(o)
+            self._weight += weight - self._weights[key]
+            self._weights[key] = weight
+        self._dict[key] = o
 
     def __delitem__(self, key):
         del self._dict[key]
+        if self._weights is not None:
+            self._weight -= self._weights.pop(key)
 
     def __contains__(self, key):
         return key in self._dict
@@ -75,3 +114,22 @@ class LRUMapping(collections.abc.MutableMapping):
 
     def __iter__(self):
         return iter(self._dict)
+
+    def items(self):
+        # Unlike the generic Mapping implementation, looking at the
+        # entries does not promote them.
+        return self._dict.items()
+
+    def clear(self):
+        self._dict.clear()
+        if self._weights is not None:
+            self._weights.clear()
+        self._weight = 0
+
+    def evict(self):
+        """Remove the least recently used entry."""
+        key, o = self._dict.popitem(last=False)
+        if self._weights is not None:
+            self._weight -= self._weights.pop(key)
+        if self._on_evict is not None:
+            self._on_evict(key, o)
@@ -190,6 +190,21 @@ class Registry:
         self._add_metric(hist)
         return hist
 
+    def new_labeled_histogram(
+        self,
+        name: str,
+        desc: str,
+        /,
+        *,
+        unit: Unit | None = None,
+        buckets: list[float] | None = None,
+        labels: tuple[str],
+    ) -> LabeledHistogram:
+        hist = LabeledHistogram(
+            self, name, desc, unit, buckets=buckets, labels=labels)
+        self._add_metric(hist)
+        return hist
+
     def generate(self) -> str:
         buffer: list[str] = []
         for metric in self._metrics:
@@ -527,6 +542,103 @@ class Histogram(BaseMetric):
         buffer.append(f'{self._name}_created {float(self._created)}')
 
 
+class LabeledHistogram(BaseMetric):
+
+    _type = 'histogram'
+
+    _buckets: list[float]
+    _labels: tuple[str, ...]
+    _metric_values: dict[tuple[str, ...], list[float]]
+    _metric_sums: dict[tuple[str, ...], float]
+    _metric_created: dict[tuple[str, ...], float]
+
+    def __init__(
+        self,
+        *args: typing.Any,
+        buckets: list[float] | None = None,
+        labels: tuple[str, ...],
+    ) -> None:
+        if buckets is None:
+            buckets = Histogram.DEFAULT_BUCKETS
+        else:
+            buckets = list(buckets)  # copy, just in case
+
+        if buckets != sorted(buckets):
+            raise ValueError('*buckets* must be sorted')
+        if len(buckets) < 2:
+            raise ValueError('*buckets* must have at least 2 numbers')
+        if not math.isinf(buckets[-1]):
+            buckets = buckets + [float('+inf')]
+
+        super().__init__(*args)
+        self._validate_label_names(labels)
+
+        self._buckets = buckets
+        self._labels = labels
+        self._metric_values = {}
+        self._metric_sums = {}
+        self._metric_created = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        try:
+            values = self._metric_values[labels]
+        except KeyError:
+            self._validate_label_values(self._labels, labels)
+            values = self._metric_values[labels] = [0.0] * len(self._buckets)
+            self._metric_sums[labels] = 0.0
+            self._metric_created[labels] = self._registry.now()
+
+        idx = bisect.bisect_left(self._buckets, value)
+        values[idx] += 1.0
+        self._metric_sums[labels] += value
+
+    def _generate(self, buffer: list[str]) -> None:
+        desc = _format_desc(self._desc)
+
+        buffer.append(f'# HELP {self._name} {desc}')
+        buffer.append(f'# TYPE {self._name} histogram')
+
+        for labels, values in self._metric_values.items():
+            fmt_label = ','.join(
+                f'{label}="{_format_label_val(label_val)}"'
+                for label, label_val in zip(self._labels, labels)
+            )
+
+            accum = 0.0
+            for buck, val in zip(self._buckets, values):
+                accum += val
+
+                if math.isinf(buck):
+                    if buck > 0:
+                        buckf = '+Inf'
+                    else:
+                        buckf = '-Inf'
+                else:
+                    buckf = str(buck)
+
+                buffer.append(
+                    f'{self._name}_bucket{{{fmt_label},le="{buckf}"}} {accum}'
+                )
+
+            buffer.append(f'{self._name}_count{{{fmt_label}}} {accum}')
+            buffer.append(
+                f'{self._name}_sum{{{fmt_label}}} {self._metric_sums[labels]}'
+            )
+
+        if self._metric_values:
+            buffer.append(f'# HELP {self._name}_created {desc}')
+            buffer.append(f'# TYPE {self._name}_created gauge')
+
+            for labels, value in self._metric_created.items():
+                fmt_label = ','.join(
+                    f'{label}="{_format_label_val(label_val)}"'
+                    for label, label_val in zip(self._labels, labels)
+                )
+                buffer.append(
+                    f'{self._name}_created{{{fmt_label}}} {float(value)}'
+                )
+
+
 @functools.lru_cache(maxsize=1024)
 def _format_desc(desc: str) -> str:
     return desc.replace('\\', r'\\').replace('\n', r'\n')
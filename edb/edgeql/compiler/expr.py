@@ -541,7 +541,10 @@ def compile_TypeCast(
         else:
             required = True
 
-        if ctx.env.options.json_parameters:
+        if (
+            ctx.env.options.json_parameters
+            and not _is_extracted_param(param_name, ctx=ctx)
+        ):
             if param_name.isdecimal():
                 raise errors.QueryError(
                     'queries compiled to accept JSON parameters do not '
@@ -634,6 +637,14 @@ def compile_TypeCast(
     return stmt.maybe_add_view(res, ctx=ctx)
 
 
+def _is_extracted_param(name: str, *, ctx: context.ContextLevel) -> bool:
+    first = ctx.env.options.first_extracted_param
+    if first is None:
+        return False
+    index = name.removeprefix('__edb_arg_')
+    return index.isdecimal() and int(index) >= first
+
+
 @dispatch.compile.register(qlast.Introspect)
 def compile_Introspect(
         expr: qlast.Introspect, *, ctx: context.ContextLevel) -> irast.Set:
@@ -58,6 +58,11 @@ class GlobalCompilerOptions:
     #: Force types of all parameters to std::json
     json_parameters: bool = False
 
+    #: Index of the first parameter extracted from query literals by
+    #: the normalizer.  Extracted parameters keep their type even with
+    #: json_parameters.
+    first_extracted_param: Optional[int] = None
+
     #: Use material types for pointer targets in schema views.
     schema_view_mode: bool = False
 
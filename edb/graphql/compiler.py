@@ -21,27 +21,202 @@ from __future__ import annotations
 from typing import *
 
 import functools
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+import time
 
+from edb import buildmeta
 from edb import graphql
 
 from edb.schema import schema as s_schema
+from edb.schema import version as s_ver
 
 from graphql.language import lexer as gql_lexer
 
 
+# When EDGEDB_SERVER_GRAPHQL_SCHEMA_CACHE_DIR is set, the GraphQL schemas
+# are stored there as SDL, keyed by the schema versions they are built
+# for.  The first compiler worker to build a schema for a version produces
+# its SDL in the background, and other workers, and workers started later,
+# build their GraphQL schema from the SDL instead of from the EdgeDB
+# schema.  At most EDGEDB_SERVER_GRAPHQL_SCHEMA_CACHE_SIZE of the most
+# recently used schemas are kept.
+GRAPHQL_SCHEMA_CACHE_DIR = os.getenv('EDGEDB_SERVER_GRAPHQL_SCHEMA_CACHE_DIR')
+GRAPHQL_SCHEMA_CACHE_SIZE = int(os.getenv(
+    'EDGEDB_SERVER_GRAPHQL_SCHEMA_CACHE_SIZE', 100
+))
+# Seconds after which the claim of a worker on producing an SDL is
+# considered abandoned, e.g. because the worker was killed.
+GRAPHQL_SCHEMA_CLAIM_TIMEOUT = 300
+
+# Bump when the GraphQL schema generated for an EdgeDB schema changes.
+FORMAT_VERSION = 1
+
+logger = logging.getLogger("edb.server")
+
+
 @functools.lru_cache()
 def _get_gqlcore(
     std_schema: s_schema.FlatSchema,
     user_schema: s_schema.FlatSchema,
     global_schema: s_schema.FlatSchema,
 ) -> graphql.GQLCoreSchema:
-    return graphql.GQLCoreSchema(
-        s_schema.ChainedSchema(
-            std_schema,
-            user_schema,
-            global_schema
-        )
+    schema = s_schema.ChainedSchema(
+        std_schema,
+        user_schema,
+        global_schema
     )
+    if GRAPHQL_SCHEMA_CACHE_DIR is None:
+        return graphql.GQLCoreSchema(schema)
+
+    cache_dir = pathlib.Path(GRAPHQL_SCHEMA_CACHE_DIR)
+    version_key = _get_version_key(user_schema, global_schema)
+    sdl = _load_sdl(cache_dir, version_key)
+    if sdl is not None:
+        return graphql.GQLCoreSchema(schema, sdl=sdl)
+
+    if _claim_sdl(cache_dir, version_key):
+        threading.Thread(
+            target=_produce_sdl,
+            args=(cache_dir, version_key, schema),
+            name='graphql-sdl',
+            daemon=True,
+        ).start()
+    return graphql.GQLCoreSchema(schema)
+
+
+def _get_version_key(
+    user_schema: s_schema.FlatSchema,
+    global_schema: s_schema.FlatSchema,
+) -> str:
+    user_ver = user_schema.get_global(
+        s_ver.SchemaVersion, '__schema_version__')
+    global_ver = global_schema.get_global(
+        s_ver.GlobalSchemaVersion, '__global_schema_version__')
+    return ':'.join((
+        str(FORMAT_VERSION),
+        str(buildmeta.EDGEDB_CATALOG_VERSION),
+        str(user_ver.get_version(user_schema)),
+        str(global_ver.get_version(global_schema)),
+    ))
+
+
+def _get_sdl_path(cache_dir: pathlib.Path, version_key: str) -> pathlib.Path:
+    digest = hashlib.sha1(version_key.encode('utf-8')).hexdigest()
+    return cache_dir / f'{digest}.graphql'
+
+
+def _load_sdl(cache_dir: pathlib.Path, version_key: str) -> Optional[str]:
+    path = _get_sdl_path(cache_dir, version_key)
+    try:
+        with open(path, encoding='utf-8') as f:
+            header = f.readline()
+            sdl = f.read()
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning(
+            'could not load cached GraphQL schema %s', path, exc_info=True)
+        return None
+
+    if header != f'# {version_key}\n':
+        return None
+
+    # Mark the schema as recently used, see _prune_sdl().
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return sdl
+
+
+def _save_sdl(cache_dir: pathlib.Path, version_key: str, sdl: str) -> None:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and rename so that other workers never
+    # read a truncated schema.
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f'# {version_key}\n')
+            f.write(sdl)
+        os.replace(tmp, _get_sdl_path(cache_dir, version_key))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    _prune_sdl(cache_dir)
+
+
+def _prune_sdl(cache_dir: pathlib.Path) -> None:
+    # Other workers may be pruning at the same time.
+    entries = []
+    for path in cache_dir.glob('*.graphql'):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            pass
+    entries.sort()
+    for _, path in entries[:max(len(entries) - GRAPHQL_SCHEMA_CACHE_SIZE, 0)]:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _get_claim_path(
+    cache_dir: pathlib.Path,
+    version_key: str,
+) -> pathlib.Path:
+    return _get_sdl_path(cache_dir, version_key).with_suffix('.claim')
+
+
+def _claim_sdl(cache_dir: pathlib.Path, version_key: str) -> bool:
+    # Only one worker produces the SDL of a schema version.
+    path = _get_claim_path(cache_dir, version_key)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    mtime = path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if time.time() - mtime < GRAPHQL_SCHEMA_CLAIM_TIMEOUT:
+                    return False
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+    except Exception:
+        logger.warning(
+            'could not claim GraphQL schema %s', path, exc_info=True)
+    return False
+
+
+def _produce_sdl(
+    cache_dir: pathlib.Path,
+    version_key: str,
+    schema: s_schema.Schema,
+) -> None:
+    # Printing the SDL needs all the types of the schema, so it is
+    # done with a schema of its own, which leaves the one serving
+    # queries to resolve its types on demand.
+    try:
+        sdl = graphql.GQLCoreSchema(schema).get_sdl()
+        _save_sdl(cache_dir, version_key, sdl)
+    except Exception:
+        logger.warning('could not cache GraphQL schema', exc_info=True)
+    finally:
+        try:
+            _get_claim_path(cache_dir, version_key).unlink()
+        except FileNotFoundError:
+            pass
 
 
 def compile_graphql(
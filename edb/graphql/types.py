@@ -43,8 +43,13 @@ from graphql import (
     GraphQLBoolean,
     GraphQLID,
     GraphQLEnumType,
+    is_introspection_type,
+    parse as parse_sdl,
+    print_type,
 )
 from graphql.type import GraphQLEnumValue, GraphQLScalarType
+from graphql.type.schema import InterfaceImplementations
+from graphql.utilities.extend_schema import extend_schema_impl
 from graphql.language import ast as gql_ast
 import itertools
 
@@ -229,6 +234,13 @@ GraphQLDecimal = GraphQLScalarType(
 )
 
 
+# Scalars with custom coercion, which SDL cannot express.
+CUSTOM_SCALARS = {
+    t.name: t
+    for t in (GraphQLInt64, GraphQLBigint, GraphQLJSON, GraphQLDecimal)
+}
+
+
 EDB_TO_GQL_SCALARS_MAP = {
     # For compatibility with GraphQL we cast json into a String, since
     # GraphQL doesn't have an equivalent type with arbitrary fields.
@@ -307,6 +319,146 @@ HIDDEN_TYPES = {
 }
 
 
+class _LazyTypeMap(Dict[str, GraphQLNamedType]):
+    """Type map of a _LazyGraphQLSchema.
+
+    Completed with the types returned by *collect* when a type is not
+    found or the map is iterated.  Without *collect*, the map is
+    already complete.
+    """
+
+    def __init__(
+        self,
+        collect: Optional[Callable[[], Dict[str, GraphQLNamedType]]],
+    ) -> None:
+        super().__init__()
+        self._collect: Optional[
+            Callable[[], Dict[str, GraphQLNamedType]]] = collect
+
+    def _complete(self) -> None:
+        if self._collect is not None:
+            collect, self._collect = self._collect, None
+            types = collect()
+            self.clear()
+            self.update(types)
+
+    def __contains__(self, name: object) -> bool:
+        if not super().__contains__(name):
+            self._complete()
+        return super().__contains__(name)
+
+    def __getitem__(self, name: str) -> GraphQLNamedType:
+        if not super().__contains__(name):
+            self._complete()
+        return super().__getitem__(name)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        if not super().__contains__(name):
+            self._complete()
+        return super().get(name, default)
+
+    def __iter__(self) -> Iterator[str]:
+        self._complete()
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self._complete()
+        return super().__len__()
+
+    def keys(self) -> KeysView[str]:
+        self._complete()
+        return super().keys()
+
+    def values(self) -> ValuesView[GraphQLNamedType]:
+        self._complete()
+        return super().values()
+
+    def items(self) -> ItemsView[str, GraphQLNamedType]:
+        self._complete()
+        return super().items()
+
+
+class _LazyGraphQLSchema(GraphQLSchema):
+    """A GraphQL schema that resolves the fields of its types on demand.
+
+    GraphQLSchema collects every type reachable from the root types
+    upfront, which resolves the fields of all types.  Validating a
+    query only needs the types the query refers to, so this schema
+    starts out with the named types it is given and collects the rest
+    only when a type is not found among them or when all types are
+    listed, e.g. by introspection.  If *complete* is true, *types*
+    already has all the named types, e.g. those defined by an SDL
+    document, and no types are collected at all.
+
+    The schema is generated, so it is assumed to be valid.
+    """
+
+    def __init__(
+        self,
+        *,
+        query: GraphQLObjectType,
+        mutation: Optional[GraphQLObjectType],
+        types: List[GraphQLNamedType],
+        known_types: Iterable[GraphQLNamedType],
+        complete: bool = False,
+    ) -> None:
+        # Only the introspection types are collected here.
+        super().__init__(assume_valid=True)
+        self.query_type = query
+        self.mutation_type = mutation
+        self._types = types
+
+        type_map = _LazyTypeMap(None if complete else self._collect_types)
+        type_map.update(
+            (t.name, t)
+            for t in itertools.chain(
+                dict.values(self.type_map),
+                types,
+                known_types,
+                (query, mutation) if mutation is not None else (query,),
+            )
+        )
+        self.type_map = type_map
+
+        # The interfaces of the object types are known without
+        # resolving their fields, and all object types are in *types*.
+        for t in types:
+            if isinstance(t, GraphQLObjectType):
+                for iface in t.interfaces:
+                    impls = self._implementations_map.setdefault(
+                        iface.name,
+                        InterfaceImplementations(objects=[], interfaces=[]),
+                    )
+                    impls.objects.append(t)
+
+    def _collect_types(self) -> Dict[str, GraphQLNamedType]:
+        schema = GraphQLSchema(
+            query=self.query_type,
+            mutation=self.mutation_type,
+            types=self._types,
+            assume_valid=True,
+        )
+        self._implementations_map = schema._implementations_map
+        self._sub_type_map = {}
+        return schema.type_map
+
+
+def _print_sdl(schema: GraphQLSchema) -> str:
+    # All the named types are printed, so that a schema built from
+    # the SDL has the same types without collecting them.
+    assert schema.query_type is not None
+    operations = [f'  query: {schema.query_type.name}']
+    if schema.mutation_type is not None:
+        operations.append(f'  mutation: {schema.mutation_type.name}')
+    definitions = ['schema {\n' + '\n'.join(operations) + '\n}']
+    definitions.extend(
+        print_type(t)
+        for t in schema.type_map.values()
+        if not is_introspection_type(t)
+    )
+    return '\n\n'.join(definitions) + '\n'
+
+
 class GQLCoreSchema:
 
     _gql_interfaces: Dict[
@@ -339,8 +491,17 @@ class GQLCoreSchema:
 
     _type_map: Dict[Tuple[str, bool], GQLBaseType]
 
-    def __init__(self, edb_schema: s_schema.Schema) -> None:
-        '''Create a graphql schema based on edgedb schema.'''
+    def __init__(
+        self,
+        edb_schema: s_schema.Schema,
+        *,
+        sdl: Optional[str] = None,
+    ) -> None:
+        '''Create a graphql schema based on edgedb schema.
+
+        If *sdl* is given, the GraphQL schema is built from it instead,
+        see get_sdl().
+        '''
 
         self.edb_schema = edb_schema
         # extract and sort modules to have a consistent type ordering
@@ -356,7 +517,13 @@ class GQLCoreSchema:
         self._gql_inobjtypes = {}
         self._gql_ordertypes = {}
         self._gql_enums = {}
+        self._gql_schema: Optional[GraphQLSchema] = None
+        self._sdl = sdl
 
+        # this map is used for GQL -> EQL translator needs
+        self._type_map = {}
+
+    def _build_graphql_schema(self) -> GraphQLSchema:
         self._define_types()
 
         # Use a fake name as a placeholder.
@@ -390,11 +557,15 @@ class GQLCoreSchema:
             if name not in TOP_LEVEL_TYPES
         ]
         types = sorted(types, key=lambda x: x.name)
-        self._gql_schema = GraphQLSchema(
-            query=query, mutation=mutation, types=types)
-
-        # this map is used for GQL -> EQL translator needs
-        self._type_map = {}
+        return _LazyGraphQLSchema(
+            query=query,
+            mutation=mutation,
+            types=types,
+            known_types=itertools.chain(
+                self._gql_ordertypes.values(),
+                self._gql_enums.values(),
+            ),
+        )
 
     @property
     def edgedb_schema(self) -> s_schema.Schema:
@@ -402,8 +573,52 @@ class GQLCoreSchema:
 
     @property
     def graphql_schema(self) -> GraphQLSchema:
+        # Translating a query only needs the EdgeDB schema, the GraphQL
+        # types are defined once a query is validated or introspected.
+        if self._gql_schema is None:
+            if self._sdl is not None:
+                self._gql_schema = self._build_graphql_schema_from_sdl()
+            else:
+                self._gql_schema = self._build_graphql_schema()
         return self._gql_schema
 
+    def get_sdl(self) -> str:
+        '''Serialize the GraphQL schema into SDL.
+
+        This collects all the types of the schema.
+        '''
+        return _print_sdl(self.graphql_schema)
+
+    def _build_graphql_schema_from_sdl(self) -> GraphQLSchema:
+        assert self._sdl is not None
+        document = parse_sdl(self._sdl, no_location=True)
+        # SDL cannot express the coercion of the custom scalars, so
+        # they are extended rather than built from their definitions.
+        custom = [
+            CUSTOM_SCALARS[d.name.value]
+            for d in document.definitions
+            if isinstance(d, gql_ast.ScalarTypeDefinitionNode)
+            and d.name.value in CUSTOM_SCALARS
+        ]
+        document = gql_ast.DocumentNode(definitions=[
+            d
+            for d in document.definitions
+            if not isinstance(d, gql_ast.ScalarTypeDefinitionNode)
+            or d.name.value not in CUSTOM_SCALARS
+        ])
+        base = GraphQLSchema(types=custom, assume_valid=True)
+        # The named types are built from their definitions, which are
+        # all in the SDL, and their fields are only resolved on demand.
+        kwargs = extend_schema_impl(
+            base.to_kwargs(), document, assume_valid=True)
+        return _LazyGraphQLSchema(
+            query=kwargs['query'],
+            mutation=kwargs['mutation'],
+            types=list(kwargs['types']),
+            known_types=(),
+            complete=True,
+        )
+
     @classmethod
     def get_gql_name(cls, name: s_name.QualName) -> str:
         module, shortname = name.module, name.name
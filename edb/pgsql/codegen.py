@@ -74,6 +74,7 @@ def generate(
         text=generator.finish(),
         translation_data=generator.translation_data,
         param_index=generator.param_index,
+        param_offsets=generator.param_offsets,
     )
 
 
@@ -141,6 +142,98 @@ class SQLSource:
     text: str
     param_index: dict[int, list[int]]
     translation_data: Optional[TranslationData] = None
+    param_offsets: dict[int, list[int]] = dataclasses.field(
+        default_factory=dict)
+
+    def get_template(self, first_param: int) -> SQLTemplate:
+        """Split the text at the parameters numbered *first_param* and up.
+
+        The parameters are substituted with SQL text by
+        SQLTemplate.instantiate(), the first of them with the first
+        element of its argument.
+        """
+        params = sorted(
+            (offset, number)
+            for number, offsets in self.param_offsets.items()
+            if number >= first_param
+            for offset in offsets
+        )
+        chunks = []
+        pos = 0
+        for offset, number in params:
+            chunks.append(self.text[pos:offset])
+            pos = offset + len(f'${number}')
+        chunks.append(self.text[pos:])
+        return SQLTemplate(
+            chunks=tuple(chunks),
+            params=tuple(number - first_param for _, number in params),
+            first_param=first_param,
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class SQLTemplate:
+    chunks: tuple[str, ...]
+    params: tuple[int, ...]
+    first_param: int
+
+    def instantiate(self, values: Sequence[str]) -> str:
+        parts = [self.chunks[0]]
+        for param, chunk in zip(self.params, self.chunks[1:]):
+            parts.append(values[param])
+            parts.append(chunk)
+        return ''.join(parts)
+
+    def translate(self, pos: int, values: Sequence[str]) -> int:
+        """Map a position in the instantiated text to the template text.
+
+        Positions within a substituted value map to its parameter.
+        """
+        inst_pos = tmpl_pos = 0
+        for i, chunk in enumerate(self.chunks):
+            if pos < inst_pos + len(chunk) or i == len(self.params):
+                return tmpl_pos + pos - inst_pos
+            inst_pos += len(chunk)
+            tmpl_pos += len(chunk)
+
+            value = values[self.params[i]]
+            param = f'${self.first_param + self.params[i]}'
+            if pos < inst_pos + len(value):
+                return tmpl_pos + min(pos - inst_pos, len(param) - 1)
+            inst_pos += len(value)
+            tmpl_pos += len(param)
+        raise AssertionError('unreachable')
+
+
+class TemplateTranslationData:
+    """Translation source map of an instantiated SQLTemplate.
+
+    Positions are mapped to the template text, translated by the source
+    map of the template and then, if the template was generated from
+    a query that was itself generated, by the source map of the latter.
+    """
+
+    def __init__(
+        self,
+        *,
+        template: SQLTemplate,
+        values: Sequence[str],
+        translation_data: TranslationData,
+        source_translation_data: Optional[TranslationData] = None,
+    ):
+        self.template = template
+        self.values = values
+        self.translation_data = translation_data
+        self.source_translation_data = source_translation_data
+
+    def translate(self, pos: int) -> int:
+        pos = self.template.translate(pos, self.values)
+        pos = self.translation_data.translate(pos)
+        if self.source_translation_data is not None:
+            # Like the 1-based positions reported by Postgres, positions
+            # to translate must be past the start of the node they are in.
+            pos = self.source_translation_data.translate(pos + 1)
+        return pos
 
 
 class SQLSourceGenerator(codegen.SourceGenerator):
@@ -163,6 +256,8 @@ class SQLSourceGenerator(codegen.SourceGenerator):
         # state
         self.param_index: collections.defaultdict[int, list[int]] = (
             collections.defaultdict(list))
+        self.param_offsets: collections.defaultdict[int, list[int]] = (
+            collections.defaultdict(list))
         self.write_index: int = 0
         self.translation_data: Optional[TranslationData] = None
 
@@ -761,8 +856,10 @@ class SQLSourceGenerator(codegen.SourceGenerator):
         self.write(common.quote_bytea_literal(node.val))
 
     def visit_ParamRef(self, node: pgast.ParamRef) -> None:
-        self.write(f'${node.number}')
+        text = f'${node.number}'
+        self.write(text)
         self.param_index[node.number].append(len(self.result) - 1)
+        self.param_offsets[node.number].append(self.write_index - len(text))
 
     def visit_RowExpr(self, node: pgast.RowExpr) -> None:
         self.write('ROW(')
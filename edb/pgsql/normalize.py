@@ -0,0 +1,154 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2024-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Lifting of constants out of SQL queries.
+
+Queries that differ only in their constants, e.g. the values compared
+in WHERE, are translated once and then instantiated with the constants
+of every query.  The constants are replaced with parameters numbered
+after the parameters of the query itself; the translated query is split
+at them into a codegen.SQLTemplate.
+
+Only constants the translation never looks at are lifted: the operands
+of operators and the elements of IN lists.  Arguments of function calls
+and casts are left alone, since some of them are evaluated statically.
+"""
+
+from __future__ import annotations
+from typing import *
+
+import dataclasses
+import hashlib
+
+from edb.common.ast import base as ast_base
+
+from edb.pgsql import ast as pgast
+from edb.pgsql import codegen
+from edb.pgsql import parser as pg_parser
+
+
+@dataclasses.dataclass(frozen=True)
+class NormalizedSource:
+    text: str
+    """Query text with the constants replaced with parameters."""
+    constants: Tuple[str, ...]
+    """SQL text of the lifted constants, in the order of their parameters."""
+    first_param: int
+    """Number of the parameter replacing the first constant."""
+    translation_data: Optional[codegen.TranslationData]
+    """Source map of the text to the original query."""
+
+    def cache_key(self) -> bytes:
+        return hashlib.sha1(self.text.encode('utf-8')).digest()
+
+
+def normalize(query_str: str) -> Optional[NormalizedSource]:
+    """Lift the constants out of *query_str*.
+
+    Only queries made of a single SELECT statement are normalized.
+    Returns None if the query cannot be parsed or has nothing to lift.
+    """
+    # The text of the query is visible to the query itself.
+    if 'current_query' in query_str.lower():
+        return None
+    try:
+        stmts = pg_parser.parse(query_str)
+    except Exception:
+        # Let the compiler report the error.
+        return None
+
+    if len(stmts) != 1 or not isinstance(stmts[0], pgast.SelectStmt):
+        return None
+
+    lifter = _ConstantLifter(first_param=_max_param(stmts[0]) + 1)
+    stmt = lifter.lift(stmts[0])
+    if not lifter.constants:
+        return None
+
+    source = codegen.generate(stmt, pretty=False, with_translation_data=True)
+    return NormalizedSource(
+        text=source.text,
+        constants=tuple(lifter.constants),
+        first_param=lifter.first_param,
+        translation_data=source.translation_data,
+    )
+
+
+def _max_param(node: Any) -> int:
+    if isinstance(node, pgast.ParamRef):
+        return node.number
+    elif isinstance(node, ast_base.AST):
+        return max(
+            (
+                _max_param(value)
+                for _, value in ast_base.iter_fields(node, include_meta=False)
+            ),
+            default=0,
+        )
+    elif isinstance(node, (list, tuple)):
+        return max((_max_param(item) for item in node), default=0)
+    else:
+        return 0
+
+
+class _ConstantLifter:
+
+    def __init__(self, *, first_param: int) -> None:
+        self.first_param = first_param
+        self.constants: List[str] = []
+
+    def lift(self, node: Any) -> Any:
+        if isinstance(node, (list, tuple)):
+            items = [self.lift(item) for item in node]
+            if all(new is old for new, old in zip(items, node)):
+                return node
+            return type(node)(items)
+        elif not isinstance(node, pgast.Base) or isinstance(
+            node, (pgast.FuncCall, pgast.TypeCast)
+        ):
+            return node
+
+        changes = {}
+        for field, value in ast_base.iter_fields(node, include_meta=False):
+            if not isinstance(node, pgast.Expr):
+                new_value = self.lift(value)
+            elif field == 'rexpr' and node.name in ('IN', 'NOT IN') and (
+                isinstance(value, pgast.ImplicitRowExpr)
+            ):
+                new_value = value.replace(args=[
+                    self._lift_operand(arg) for arg in value.args
+                ])
+            elif field in ('lexpr', 'rexpr'):
+                new_value = self._lift_operand(value)
+            else:
+                new_value = self.lift(value)
+            if new_value is not value:
+                changes[field] = new_value
+
+        return node.replace(**changes) if changes else node
+
+    def _lift_operand(self, node: Any) -> Any:
+        if not isinstance(
+            node, (pgast.StringConstant, pgast.NumericConstant)
+        ):
+            return self.lift(node)
+        self.constants.append(codegen.generate_source(node, pretty=False))
+        return pgast.ParamRef(
+            number=self.first_param + len(self.constants) - 1,
+            context=node.context,
+        )
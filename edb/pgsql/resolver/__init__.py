@@ -17,6 +17,9 @@
 #
 
 from __future__ import annotations
+from typing import *
+
+import uuid
 
 from edb.pgsql import ast as pgast
 from edb.schema import schema as s_schema
@@ -34,11 +37,17 @@ def resolve(
     query: pgast.Base,
     schema: s_schema.Schema,
     options: context.Options,
-) -> pgast.Base:
+) -> Tuple[pgast.Base, FrozenSet[uuid.UUID]]:
+    """Resolve *query* against *schema*.
+
+    Returns the resolved query and the ids of the schema objects
+    it depends on.
+    """
     ctx = context.ResolverContextLevel(
         None, context.ContextSwitchMode.EMPTY, schema=schema, options=options
     )
 
     _ = context.ResolverContext(initial=ctx)
 
-    return dispatch.resolve(query, ctx=ctx)
+    resolved = dispatch.resolve(query, ctx=ctx)
+    return resolved, frozenset(ctx.schema_refs)
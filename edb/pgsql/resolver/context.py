@@ -22,6 +22,7 @@ from copy import deepcopy
 from typing import *
 from dataclasses import dataclass, field
 import enum
+import uuid
 
 from edb.common import compiler
 from edb.schema import schema as s_schema
@@ -127,6 +128,10 @@ class ResolverContextLevel(compiler.ContextLevel):
 
     options: Options
 
+    # Ids of the schema objects the query is resolved against, shared by
+    # all levels.
+    schema_refs: Set[uuid.UUID]
+
     def __init__(
         self,
         prevlevel: Optional[ResolverContextLevel],
@@ -144,11 +149,13 @@ class ResolverContextLevel(compiler.ContextLevel):
             self.scope = Scope()
             self.include_inherited = True
             self.names = compiler.AliasGenerator()
+            self.schema_refs = set()
 
         else:
             self.schema = prevlevel.schema
             self.options = prevlevel.options
             self.names = prevlevel.names
+            self.schema_refs = prevlevel.schema_refs
 
             self.include_inherited = True
 
@@ -280,6 +280,12 @@ def resolve_relation(
             pgext_code=pgerror.ERROR_UNDEFINED_TABLE,
         )
 
+    ctx.schema_refs.add(obj.id)
+    if isinstance(obj, s_pointers.Pointer):
+        source = obj.get_source(ctx.schema)
+        assert source
+        ctx.schema_refs.add(source.id)
+
     # extract table name
     table = context.Table(name=relation.name)
 
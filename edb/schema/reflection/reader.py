@@ -82,6 +82,10 @@ def parse_into(
         uuid.UUID,
         Dict[Tuple[Type[s_obj.Object], str], Dict[uuid.UUID, None]]
     ] = collections.defaultdict(dict_of_dicts)
+    module_to_ids: Dict[s_name.Name, Dict[uuid.UUID, None]] = (
+        collections.defaultdict(dict))
+    type_to_ids: Dict[str, Dict[uuid.UUID, None]] = (
+        collections.defaultdict(dict))
 
     objects: Dict[uuid.UUID, Tuple[s_obj.Object, Dict[str, Any]]] = {}
     objid: uuid.UUID
@@ -110,6 +114,7 @@ def parse_into(
 
         if isinstance(obj, s_obj.QualifiedObject):
             name_to_id[name] = objid
+            module_to_ids[name.get_module_name()][objid] = None
         else:
             name = s_name.UnqualName(str(name))
             globalname_to_id[mcls, name] = objid
@@ -119,6 +124,7 @@ def parse_into(
             shortname_to_id[mcls, shortname].add(objid)
 
         id_to_type[objid] = type(obj).__name__
+        type_to_ids[type(obj).__name__][objid] = None
 
         all_fields = mcls.get_schema_fields()
         objdata: List[Any] = [None] * len(all_fields)
@@ -284,11 +290,26 @@ def parse_into(
         ),
         globalname_to_id=schema._globalname_to_id.update(globalname_to_id),
         refs_to=mm.finish(),
+        module_to_ids=_update_index(schema._module_to_ids, module_to_ids),
+        type_to_ids=_update_index(schema._type_to_ids, type_to_ids),
     )
 
     return schema
 
 
+def _update_index(
+    index: immutables.Map[Any, immutables.Map[uuid.UUID, None]],
+    updates: Mapping[Any, Dict[uuid.UUID, None]],
+) -> immutables.Map[Any, immutables.Map[uuid.UUID, None]]:
+    with index.mutate() as mm:
+        for key, ids in updates.items():
+            try:
+                mm[key] = mm[key].update(ids)
+            except KeyError:
+                mm[key] = immutables.Map(ids)
+        return mm.finish()
+
+
 def _parse_expression(
     val: Dict[str, Any], id: uuid.UUID, field: str
 ) -> s_expr.Expression:
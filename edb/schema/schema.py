@@ -25,7 +25,9 @@ from typing import overload
 import abc
 import collections
 import functools
+import hashlib
 import itertools
+import pickle
 
 import immutables as immu
 
@@ -55,6 +57,8 @@ if TYPE_CHECKING:
         ],
     ]
 
+    Index_T = immu.Map[Any, immu.Map[uuid.UUID, None]]
+
 STD_MODULES = (
     sn.UnqualName('std'),
     sn.UnqualName('schema'),
@@ -437,6 +441,15 @@ class Schema(abc.ABC):
     def _get_object_ids(self) -> Iterable[uuid.UUID]:
         raise NotImplementedError
 
+    def _get_object_ids_filtered(
+        self,
+        *,
+        type: Optional[Type[so.Object]] = None,
+        included_modules: Optional[Iterable[sn.Name]] = None,
+    ) -> Iterable[uuid.UUID]:
+        """Return a superset of ids of objects of *type* in *modules*."""
+        return self._get_object_ids()
+
     @abc.abstractmethod
     def has_object(self, object_id: uuid.UUID) -> bool:
         raise NotImplementedError
@@ -507,6 +520,10 @@ class FlatSchema(Schema):
         uuid.UUID,
     ]
     _refs_to: Refs_T
+    # Secondary indexes used by get_objects(): object ids by module name
+    # (for qualified objects) and by schema class name.
+    _module_to_ids: Index_T
+    _type_to_ids: Index_T
     _generation: int
 
     def __init__(self) -> None:
@@ -516,11 +533,88 @@ class FlatSchema(Schema):
         self._name_to_id = immu.Map()
         self._globalname_to_id = immu.Map()
         self._refs_to = immu.Map()
+        self._module_to_ids = immu.Map()
+        self._type_to_ids = immu.Map()
         self._generation = 0
 
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        if '_module_to_ids' not in state:
+            # Schema pickled before the secondary indexes were added.
+            self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        module_to_ids: Dict[Any, Dict[uuid.UUID, None]] = {}
+        type_to_ids: Dict[Any, Dict[uuid.UUID, None]] = {}
+        for obj_id, type_name in self._id_to_type.items():
+            type_to_ids.setdefault(type_name, {})[obj_id] = None
+            sclass = so.ObjectMeta.get_schema_class(type_name)
+            if issubclass(sclass, so.QualifiedObject):
+                name_field = sclass.get_schema_field('name')
+                name = self._id_to_data[obj_id][name_field.index]
+                module_to_ids.setdefault(
+                    name.get_module_name(), {})[obj_id] = None
+
+        self._module_to_ids = immu.Map(
+            (k, immu.Map(v)) for k, v in module_to_ids.items())
+        self._type_to_ids = immu.Map(
+            (k, immu.Map(v)) for k, v in type_to_ids.items())
+
     def _get_object_ids(self) -> Iterable[uuid.UUID]:
         return self._id_to_type.keys()
 
+    def _get_object_ids_filtered(
+        self,
+        *,
+        type: Optional[Type[so.Object]] = None,
+        included_modules: Optional[Iterable[sn.Name]] = None,
+    ) -> Iterable[uuid.UUID]:
+        candidates = []
+
+        if included_modules:
+            candidates.append([
+                ids for mod in frozenset(included_modules)
+                if (ids := self._module_to_ids.get(mod)) is not None
+            ])
+
+        if type is not None and type is not so.Object:
+            candidates.append([
+                ids for type_name in _get_schema_class_names(type)
+                if (ids := self._type_to_ids.get(type_name)) is not None
+            ])
+
+        if not candidates:
+            return self._id_to_type.keys()
+
+        # Both indexes yield a superset of the result, pick the smaller one.
+        best = min(candidates, key=lambda maps: sum(len(m) for m in maps))
+        return itertools.chain.from_iterable(m.keys() for m in best)
+
+    @staticmethod
+    def _index_add(
+        index: Index_T,
+        key: Any,
+        obj_id: uuid.UUID,
+    ) -> Index_T:
+        ids = index.get(key)
+        if ids is None:
+            ids = immu.Map(((obj_id, None),))
+        else:
+            ids = ids.set(obj_id, None)
+        return index.set(key, ids)
+
+    @staticmethod
+    def _index_delete(
+        index: Index_T,
+        key: Any,
+        obj_id: uuid.UUID,
+    ) -> Index_T:
+        ids = index[key].delete(obj_id)
+        if ids:
+            return index.set(key, ids)
+        else:
+            return index.delete(key)
+
     def _replace(
         self,
         *,
@@ -537,6 +631,8 @@ class FlatSchema(Schema):
             immu.Map[Tuple[Type[so.Object], sn.Name], uuid.UUID]
         ] = None,
         refs_to: Optional[Refs_T] = None,
+        module_to_ids: Optional[Index_T] = None,
+        type_to_ids: Optional[Index_T] = None,
     ) -> FlatSchema:
         new = FlatSchema.__new__(FlatSchema)
 
@@ -570,6 +666,16 @@ class FlatSchema(Schema):
         else:
             new._refs_to = refs_to
 
+        if module_to_ids is None:
+            new._module_to_ids = self._module_to_ids
+        else:
+            new._module_to_ids = module_to_ids
+
+        if type_to_ids is None:
+            new._type_to_ids = self._type_to_ids
+        else:
+            new._type_to_ids = type_to_ids
+
         new._generation = self._generation + 1
 
         return new
@@ -584,10 +690,12 @@ class FlatSchema(Schema):
         immu.Map[sn.Name, uuid.UUID],
         immu.Map[Tuple[Type[so.Object], sn.Name], FrozenSet[uuid.UUID]],
         immu.Map[Tuple[Type[so.Object], sn.Name], uuid.UUID],
+        Index_T,
     ]:
         name_to_id = self._name_to_id
         shortname_to_id = self._shortname_to_id
         globalname_to_id = self._globalname_to_id
+        module_to_ids = self._module_to_ids
         is_global = not issubclass(sclass, so.QualifiedObject)
 
         has_sn_cache = issubclass(sclass, (s_func.Function, s_oper.Operator))
@@ -597,6 +705,8 @@ class FlatSchema(Schema):
                 globalname_to_id = globalname_to_id.delete((sclass, old_name))
             else:
                 name_to_id = name_to_id.delete(old_name)
+                module_to_ids = self._index_delete(
+                    module_to_ids, old_name.get_module_name(), obj_id)
             if has_sn_cache:
                 old_shortname = sn.shortname_from_fullname(old_name)
                 sn_key = (sclass, old_shortname)
@@ -633,6 +743,8 @@ class FlatSchema(Schema):
                     raise errors.SchemaError(
                         f'{vn} already exists')
                 name_to_id = name_to_id.set(new_name, obj_id)
+                module_to_ids = self._index_add(
+                    module_to_ids, new_name.get_module_name(), obj_id)
 
             if has_sn_cache:
                 new_shortname = sn.shortname_from_fullname(new_name)
@@ -645,7 +757,7 @@ class FlatSchema(Schema):
 
                 shortname_to_id = shortname_to_id.set(sn_key, ids | {obj_id})
 
-        return name_to_id, shortname_to_id, globalname_to_id
+        return name_to_id, shortname_to_id, globalname_to_id, module_to_ids
 
     def update_obj(
         self,
@@ -669,6 +781,7 @@ class FlatSchema(Schema):
         name_to_id = None
         shortname_to_id = None
         globalname_to_id = None
+        module_to_ids = None
         orig_refs = {}
         new_refs = {}
 
@@ -676,7 +789,12 @@ class FlatSchema(Schema):
             field = all_fields[fieldname]
             findex = field.index
             if fieldname == 'name':
-                name_to_id, shortname_to_id, globalname_to_id = (
+                (
+                    name_to_id,
+                    shortname_to_id,
+                    globalname_to_id,
+                    module_to_ids,
+                ) = (
                     self._update_obj_name(
                         obj_id,
                         sclass,
@@ -710,6 +828,7 @@ class FlatSchema(Schema):
         return self._replace(name_to_id=name_to_id,
                              shortname_to_id=shortname_to_id,
                              globalname_to_id=globalname_to_id,
+                             module_to_ids=module_to_ids,
                              id_to_data=id_to_data,
                              refs_to=refs_to)
 
@@ -757,11 +876,15 @@ class FlatSchema(Schema):
         name_to_id = None
         shortname_to_id = None
         globalname_to_id = None
+        module_to_ids = None
         if fieldname == 'name':
             old_name = data[findex]
-            name_to_id, shortname_to_id, globalname_to_id = (
-                self._update_obj_name(obj_id, sclass, old_name, value)
-            )
+            (
+                name_to_id,
+                shortname_to_id,
+                globalname_to_id,
+                module_to_ids,
+            ) = self._update_obj_name(obj_id, sclass, old_name, value)
 
         data_list = list(data)
         data_list[findex] = value
@@ -787,6 +910,7 @@ class FlatSchema(Schema):
             name_to_id=name_to_id,
             shortname_to_id=shortname_to_id,
             globalname_to_id=globalname_to_id,
+            module_to_ids=module_to_ids,
             id_to_data=id_to_data,
             refs_to=refs_to,
         )
@@ -810,13 +934,19 @@ class FlatSchema(Schema):
         name_to_id = None
         shortname_to_id = None
         globalname_to_id = None
+        module_to_ids = None
         orig_value = data[findex]
 
         if orig_value is None:
             return self
 
         if fieldname == 'name':
-            name_to_id, shortname_to_id, globalname_to_id = (
+            (
+                name_to_id,
+                shortname_to_id,
+                globalname_to_id,
+                module_to_ids,
+            ) = (
                 self._update_obj_name(
                     obj_id,
                     sclass,
@@ -844,6 +974,7 @@ class FlatSchema(Schema):
             name_to_id=name_to_id,
             shortname_to_id=shortname_to_id,
             globalname_to_id=globalname_to_id,
+            module_to_ids=module_to_ids,
             id_to_data=id_to_data,
             refs_to=refs_to,
         )
@@ -951,8 +1082,12 @@ class FlatSchema(Schema):
                     new_refs[field.name] = ref
             refs_to = self._update_refs_to(id, sclass, None, new_refs)
 
-        name_to_id, shortname_to_id, globalname_to_id = self._update_obj_name(
-            id, sclass, None, name)
+        (
+            name_to_id,
+            shortname_to_id,
+            globalname_to_id,
+            module_to_ids,
+        ) = self._update_obj_name(id, sclass, None, name)
 
         updates = dict(
             id_to_data=self._id_to_data.set(id, data),
@@ -960,6 +1095,9 @@ class FlatSchema(Schema):
             name_to_id=name_to_id,
             shortname_to_id=shortname_to_id,
             globalname_to_id=globalname_to_id,
+            module_to_ids=module_to_ids,
+            type_to_ids=self._index_add(
+                self._type_to_ids, sclass.__name__, id),
             refs_to=refs_to,
         )
 
@@ -1010,8 +1148,12 @@ class FlatSchema(Schema):
 
         updates = {}
 
-        name_to_id, shortname_to_id, globalname_to_id = self._update_obj_name(
-            obj.id, sclass, name, None)
+        (
+            name_to_id,
+            shortname_to_id,
+            globalname_to_id,
+            module_to_ids,
+        ) = self._update_obj_name(obj.id, sclass, name, None)
 
         object_ref_fields = sclass.get_object_reference_fields()
         if not object_ref_fields:
@@ -1031,6 +1173,9 @@ class FlatSchema(Schema):
             name_to_id=name_to_id,
             shortname_to_id=shortname_to_id,
             globalname_to_id=globalname_to_id,
+            module_to_ids=module_to_ids,
+            type_to_ids=self._index_delete(
+                self._type_to_ids, sclass.__name__, obj.id),
             id_to_data=self._id_to_data.delete(obj.id),
             id_to_type=self._id_to_type.delete(obj.id),
             refs_to=refs_to,
@@ -1459,7 +1604,8 @@ class FlatSchema(Schema):
     ) -> SchemaIterator[so.Object_T]:
         return SchemaIterator[so.Object_T](
             self,
-            self._id_to_type,
+            self._get_object_ids_filtered(
+                type=type, included_modules=included_modules),
             exclude_stdlib=exclude_stdlib,
             exclude_global=exclude_global,
             exclude_internal=exclude_internal,
@@ -1481,11 +1627,145 @@ class FlatSchema(Schema):
     def get_last_migration(self) -> Optional[s_migrations.Migration]:
         return _get_last_migration(self)
 
+    def get_delta(
+        self,
+        base: FlatSchema,
+        *,
+        max_ratio: float = 1.0,
+    ) -> Optional[FlatSchemaDelta]:
+        """Compute the changes that turn *base* into this schema.
+
+        Schema maps are persistent and structurally shared between
+        versions, so unchanged entries are detected by identity.
+        Returns None if the number of changed entries exceeds
+        *max_ratio* times the number of objects in this schema, in which
+        case shipping the full schema is likely cheaper.
+        """
+        max_changes = max_ratio * len(self._id_to_type)
+        num_changes = 0
+        changes = []
+        for attr in _FLAT_SCHEMA_MAPS:
+            old = getattr(base, attr)
+            new = getattr(self, attr)
+            if old is new:
+                continue
+            updates = {}
+            for k, v in new.items():
+                if old.get(k, _MISSING) is not v:
+                    updates[k] = v
+            deletions = tuple(k for k in old.keys() if k not in new)
+            num_changes += len(updates) + len(deletions)
+            if num_changes > max_changes:
+                return None
+            if updates or deletions:
+                changes.append((attr, updates, deletions))
+
+        return FlatSchemaDelta(
+            base_generation=base._generation,
+            generation=self._generation,
+            changes=tuple(changes),
+        )
+
+    def apply_delta(self, delta: FlatSchemaDelta) -> FlatSchema:
+        """Return a new schema with *delta* applied on top of this one."""
+        if delta.base_generation != self._generation:
+            raise errors.SchemaError(
+                f'cannot apply schema delta: expected base generation '
+                f'{delta.base_generation}, got {self._generation}')
+
+        new = FlatSchema.__new__(FlatSchema)
+        for attr in _FLAT_SCHEMA_MAPS:
+            setattr(new, attr, getattr(self, attr))
+
+        for attr, updates, deletions in delta.changes:
+            with getattr(self, attr).mutate() as mm:
+                for k in deletions:
+                    del mm[k]
+                for k, v in updates.items():
+                    mm[k] = v
+                setattr(new, attr, mm.finish())
+
+        new._generation = delta.generation
+        return new
+
+    def get_fingerprint(self) -> bytes:
+        """Return a digest of the objects in this schema.
+
+        Schemas containing the same objects, with the same ids, have
+        equal fingerprints.  Schema version objects are ignored, as
+        they change with every DDL even if the result is the same.
+        """
+        h = hashlib.sha1()
+        for objid in sorted(self._id_to_type):
+            tname = self._id_to_type[objid]
+            if tname in _FINGERPRINT_SKIPPED_TYPES:
+                continue
+            h.update(objid.bytes)
+            h.update(tname.encode())
+            h.update(pickle.dumps(self._id_to_data[objid], -1))
+        return h.digest()
+
+    def get_object_changes(
+        self,
+        old: FlatSchema,
+    ) -> Tuple[Set[uuid.UUID], Set[uuid.UUID], Set[uuid.UUID]]:
+        """Return the ids of the objects that differ from *old*.
+
+        Returns the ids of the created, altered and deleted objects.
+        Objects of both schemas are compared by their field data,
+        which DDL shares between versions for untouched objects.
+        """
+        created = set()
+        altered = set()
+        old_data = old._id_to_data
+        for objid, data in self._id_to_data.items():
+            prev = old_data.get(objid)
+            if prev is None:
+                created.add(objid)
+            elif prev is not data and prev != data:
+                altered.add(objid)
+        deleted = {
+            objid for objid in old_data.keys()
+            if objid not in self._id_to_data
+        }
+        return created, altered, deleted
+
     def __repr__(self) -> str:
         return (
             f'<{type(self).__name__} gen:{self._generation} at {id(self):#x}>')
 
 
+_MISSING = object()
+
+_FINGERPRINT_SKIPPED_TYPES = frozenset({
+    'SchemaVersion',
+    'GlobalSchemaVersion',
+})
+
+_FLAT_SCHEMA_MAPS = (
+    '_id_to_data',
+    '_id_to_type',
+    '_name_to_id',
+    '_shortname_to_id',
+    '_globalname_to_id',
+    '_refs_to',
+    '_module_to_ids',
+    '_type_to_ids',
+)
+
+
+class FlatSchemaDelta(NamedTuple):
+    """Changes between two versions of a :class:`FlatSchema`.
+
+    *changes* is a sequence of ``(map_attr, updates, deletions)`` for
+    every internal map of the schema that differs.
+    """
+
+    base_generation: int
+    generation: int
+    changes: Tuple[Tuple[str, Dict[Any, Any], Tuple[Any, ...]], ...]
+
+
 EMPTY_SCHEMA = FlatSchema()
 
 
@@ -1633,6 +1913,23 @@ class ChainedSchema(Schema):
             self._global_schema._get_object_ids(),
         )
 
+    def _get_object_ids_filtered(
+        self,
+        *,
+        type: Optional[Type[so.Object]] = None,
+        included_modules: Optional[Iterable[sn.Name]] = None,
+    ) -> Iterable[uuid.UUID]:
+        if included_modules is not None:
+            included_modules = frozenset(included_modules)
+        return itertools.chain(
+            self._base_schema._get_object_ids_filtered(
+                type=type, included_modules=included_modules),
+            self._top_schema._get_object_ids_filtered(
+                type=type, included_modules=included_modules),
+            self._global_schema._get_object_ids_filtered(
+                type=type, included_modules=included_modules),
+        )
+
     def get_top_schema(self) -> Schema:
         return self._top_schema
 
@@ -2066,7 +2363,8 @@ class ChainedSchema(Schema):
     ) -> SchemaIterator[so.Object_T]:
         return SchemaIterator[so.Object_T](
             self,
-            self._get_object_ids(),
+            self._get_object_ids_filtered(
+                type=type, included_modules=included_modules),
             exclude_global=exclude_global,
             exclude_stdlib=exclude_stdlib,
             exclude_internal=exclude_internal,
@@ -2091,6 +2389,14 @@ class ChainedSchema(Schema):
         return migration
 
 
+@functools.lru_cache()
+def _get_schema_class_names(type: Type[so.Object]) -> FrozenSet[str]:
+    return frozenset(
+        cls.__name__ for cls in so.ObjectMeta.get_schema_metaclasses()
+        if issubclass(cls, type)
+    )
+
+
 @functools.lru_cache()
 def _get_functions(
     schema: FlatSchema,
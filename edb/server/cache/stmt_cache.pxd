@@ -26,6 +26,7 @@ cdef class StatementsCache:
         object _dict_get
 
     cpdef get(self, key, default)
+    cpdef peek(self, key, default)
     cpdef needs_cleanup(self)
     cpdef cleanup_one(self)
     cpdef resize(self, int maxsize)
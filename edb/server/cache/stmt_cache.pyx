@@ -56,6 +56,10 @@ cdef class StatementsCache:
         self._dict_move_to_end(key)  # last=True
         return o
 
+    cpdef peek(self, key, default):
+        # Like get(), but does not promote the entry.
+        return self._dict_get(key, default)
+
     cpdef needs_cleanup(self):
         return len(self._dict) > self._maxsize
 
@@ -519,7 +519,14 @@ class Compiler:
         prepared_stmt_map: Mapping[str, str],
         current_database: str,
         current_user: str,
+        first_lifted_param: Optional[int] = None,
     ) -> List[dbstate.SQLQueryUnit]:
+        """Translate the SQL statements of *query_str*.
+
+        If *first_lifted_param* is set, the parameters numbered from it
+        up stand for constants lifted out of the query, and the units
+        carry templates to be instantiated with them.
+        """
         state = dbstate.CompilerConnectionState(
             user_schema=user_schema,
             global_schema=global_schema,
@@ -546,7 +553,9 @@ class Compiler:
                 if isinstance(arg, pgast.StringConstant)
             ]
 
-        def translate_query(stmt: pgast.Base) -> pg_codegen.SQLSource:
+        def translate_query(
+            stmt: pgast.Base,
+        ) -> Tuple[pg_codegen.SQLSource, FrozenSet[uuid.UUID]]:
             args = {}
             try:
                 search_path = tx_state.get("search_path")
@@ -560,10 +569,12 @@ class Compiler:
                 current_query=query_str,
                 **args
             )
-            resolved = pg_resolver.resolve(stmt, schema, options)
-            return pg_codegen.generate(
+            resolved, schema_deps = pg_resolver.resolve(
+                stmt, schema, options)
+            source = pg_codegen.generate(
                 resolved, with_translation_data=True
             )
+            return source, schema_deps
 
         def compute_stmt_name(text: str) -> str:
             stmt_hash = hashlib.sha1(text.encode("utf-8"))
@@ -589,7 +600,8 @@ class Compiler:
         stmts = pg_parser.parse(query_str)
         sql_units = []
         for stmt in stmts:
-            orig_text = pg_gen_source(stmt)
+            orig_source = pg_codegen.generate(stmt, pretty=False)
+            orig_text = orig_source.text
 
             if debug.flags.sql_input:
                 debug.header('SQL Input')
@@ -708,7 +720,7 @@ class Compiler:
                 )
             elif isinstance(stmt, pgast.PrepareStmt):
                 # Translate the underlying query.
-                stmt_source = translate_query(stmt.query)
+                stmt_source, schema_deps = translate_query(stmt.query)
                 if stmt.argtypes:
                     param_types = []
                     for pt in stmt.argtypes:
@@ -737,6 +749,7 @@ class Compiler:
                         translation_data=stmt_source.translation_data,
                     ),
                     command_tag=b"PREPARE",
+                    schema_deps=schema_deps,
                 )
             elif isinstance(stmt, pgast.ExecuteStmt):
                 orig_name = stmt.name
@@ -782,11 +795,17 @@ class Compiler:
                 # just ignore
                 unit = unit_ctor(query="DO $$ BEGIN END $$;")
             else:
-                source = translate_query(stmt)
+                source, schema_deps = translate_query(stmt)
                 unit = unit_ctor(
                     query=source.text,
                     translation_data=source.translation_data,
+                    schema_deps=schema_deps,
                 )
+                if first_lifted_param is not None:
+                    unit.query_template = source.get_template(
+                        first_lifted_param)
+                    unit.orig_query_template = orig_source.get_template(
+                        first_lifted_param)
 
             if debug.flags.sql_output:
                 debug.header('SQL Output')
@@ -1424,6 +1443,9 @@ def _get_compile_options(
         ),
         constant_folding=not disable_constant_folding,
         json_parameters=ctx.json_parameters,
+        first_extracted_param=(
+            ctx.source.first_extra() if ctx.source is not None else None
+        ),
         implicit_limit=ctx.implicit_limit,
         bootstrap_mode=ctx.bootstrap_mode,
         apply_query_rewrites=(
@@ -1682,6 +1704,7 @@ def _compile_ql_query(
         cacheable=cacheable,
         has_dml=bool(ir.dml_exprs),
         query_asts=query_asts,
+        schema_deps=frozenset(obj.id for obj in ir.schema_refs),
     )
 
 
@@ -2210,6 +2233,11 @@ def _try_compile(
             unit.in_type_id = comp.in_type_id
 
             unit.cacheable = comp.cacheable
+            if unit.schema_deps is not None:
+                if comp.schema_deps is None:
+                    unit.schema_deps = None
+                else:
+                    unit.schema_deps |= comp.schema_deps
 
             if comp.is_explain:
                 unit.is_explain = True
@@ -2224,6 +2252,7 @@ def _try_compile(
         elif isinstance(comp, dbstate.SimpleQuery):
             unit.sql = comp.sql
             unit.in_type_args = comp.in_type_args
+            unit.schema_deps = None
 
         elif isinstance(comp, dbstate.DDLQuery):
             unit.sql = comp.sql
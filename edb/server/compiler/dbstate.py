@@ -22,6 +22,7 @@ from typing import *  # NoQA
 
 import dataclasses
 import enum
+import hashlib
 import time
 import uuid
 
@@ -107,6 +108,8 @@ class Query(BaseQuery):
     is_explain: bool = False
     query_asts: Any = None
     append_rollback: bool = False
+    # Ids of the user schema objects the query depends on, None if unknown.
+    schema_deps: Optional[FrozenSet[uuid.UUID]] = None
 
 
 @dataclasses.dataclass(frozen=True)
@@ -261,6 +264,11 @@ class QueryUnit:
     # True if it is safe to cache this unit.
     cacheable: bool = False
 
+    # Ids of the schema objects this unit depends on.  A cached unit
+    # must be recompiled after a DDL affects any of them.  None if the
+    # dependencies are unknown, i.e. any DDL invalidates the unit.
+    schema_deps: Optional[FrozenSet[uuid.UUID]] = frozenset()
+
     # If non-None, contains a name of the DB that is about to be
     # created/deleted. If it's the former, the IO process needs to
     # introspect the new db. If it's the later, the server should
@@ -349,6 +357,9 @@ class QueryUnitGroup:
     # True if it is safe to cache this unit.
     cacheable: bool = True
 
+    # Ids of the schema objects any of the query units depend on.
+    schema_deps: Optional[FrozenSet[uuid.UUID]] = frozenset()
+
     # True if any query unit has transaction control commands, like COMMIT,
     # ROLLBACK, START TRANSACTION or SAVEPOINT-related commands
     tx_control: bool = False
@@ -384,6 +395,12 @@ class QueryUnitGroup:
         if not query_unit.cacheable:
             self.cacheable = False
 
+        if self.schema_deps is not None:
+            if query_unit.schema_deps is None:
+                self.schema_deps = None
+            else:
+                self.schema_deps |= query_unit.schema_deps
+
         if query_unit.tx_control:
             self.tx_control = True
 
@@ -401,6 +418,19 @@ class QueryUnitGroup:
 
         self.units.append(query_unit)
 
+    def get_size(self) -> int:
+        """Return an estimate of the memory taken by the group, in bytes.
+
+        Only the SQL text and the type descriptors are accounted for,
+        as they dominate the size of large compiled queries.
+        """
+        return sum(
+            sum(map(len, unit.sql))
+            + len(unit.out_type_data)
+            + len(unit.in_type_data)
+            for unit in self.units
+        )
+
 
 @dataclasses.dataclass(frozen=True, kw_only=True)
 class PreparedStmtOpData:
@@ -441,7 +471,9 @@ class SQLQueryUnit:
     """Translated query text."""
     orig_query: str
     """Original query text before translation."""
-    translation_data: Optional[pgcodegen.TranslationData] = None
+    translation_data: Optional[
+        pgcodegen.TranslationData | pgcodegen.TemplateTranslationData
+    ] = None
     """Translation source map."""
     fe_settings: SQLSettings
     """Frontend-only settings effective during translation of this unit."""
@@ -468,6 +500,49 @@ class SQLQueryUnit:
     command_tag: bytes = b""
     """If frontend_only is True, only issue CommandComplete with this tag."""
 
+    schema_deps: Optional[FrozenSet[uuid.UUID]] = frozenset()
+    """Ids of the schema objects the query depends on, None if unknown."""
+
+    query_template: Optional[pgcodegen.SQLTemplate] = None
+    """Translated query with the constants lifted out of the original
+    query, if the unit must be instantiated with them."""
+    orig_query_template: Optional[pgcodegen.SQLTemplate] = None
+    """Original query with the constants lifted out."""
+
+    def instantiate(
+        self,
+        constants: Sequence[str],
+        source_translation_data: Optional[pgcodegen.TranslationData] = None,
+    ) -> SQLQueryUnit:
+        """Substitute the constants lifted out of the original query.
+
+        *source_translation_data* maps the query the unit was translated
+        from to the original query.
+        """
+        if self.query_template is None:
+            return self
+        assert self.orig_query_template is not None
+        translation_data = None
+        if self.translation_data is not None:
+            translation_data = pgcodegen.TemplateTranslationData(
+                template=self.query_template,
+                values=constants,
+                translation_data=self.translation_data,
+                source_translation_data=source_translation_data,
+            )
+        stmt_hash = hashlib.sha1(self.stmt_name)
+        for constant in constants:
+            stmt_hash.update(b'\0' + constant.encode('utf-8'))
+        return dataclasses.replace(
+            self,
+            query=self.query_template.instantiate(constants),
+            orig_query=self.orig_query_template.instantiate(constants),
+            translation_data=translation_data,
+            stmt_name=f"edb{stmt_hash.hexdigest()}".encode('utf-8'),
+            query_template=None,
+            orig_query_template=None,
+        )
+
 
 SQLSettings = immutables.Map[Optional[str], Optional[str | list[str]]]
 DEFAULT_SQL_SETTINGS: SQLSettings = immutables.Map()
@@ -20,7 +20,9 @@
 from __future__ import annotations
 
 import asyncio
+import collections
 import os
+import pickle
 import socket
 import struct
 import typing
@@ -28,34 +30,136 @@ import typing
 
 _uint64_unpacker = struct.Struct('!Q').unpack
 _uint64_packer = struct.Struct('!Q').pack
+_frame_header = struct.Struct('!BIQ')
+
+# Besides plain pickles, messages can be "framed": a pickle with the
+# binary blobs it carries (pickled schemas, compiler states) moved
+# out-of-band, so that they are neither copied into the pickle on the
+# sending side nor out of it on the receiving side, where they are
+# decoded as zero-copy slices of the message:
+#
+#   uint8   FRAMED_MESSAGE
+#   uint32  number of out-of-band buffers N
+#   uint64  length of the pickle
+#   uint64  length of buffer 1 .. N
+#   pickle, buffer 1 .. N
+#
+# Pickles always start with the PROTO opcode (0x80), so both kinds
+# can be told apart by their first byte.
+FRAMED_MESSAGE = 0x01
+
+RECV_SIZE = 65536
+
+# Smaller blobs are cheaper to copy than to frame separately.
+OUT_OF_BAND_MIN_SIZE = 1024
+
+Payload = typing.Union[bytes, memoryview, typing.Sequence[typing.Any]]
+
+
+def encode_message(obj: typing.Any) -> typing.List[typing.Any]:
+    """Encode *obj* as a framed message, returned as a list of buffers.
+
+    Only the ``pickle.PickleBuffer`` objects within *obj* are sent
+    out-of-band, see :func:`out_of_band`.
+    """
+    buffers: typing.List[pickle.PickleBuffer] = []
+    data = pickle.dumps(obj, 5, buffer_callback=buffers.append)
+    raw = [b.raw() for b in buffers]
+    return [
+        _frame_header.pack(FRAMED_MESSAGE, len(raw), len(data)),
+        *(_uint64_packer(r.nbytes) for r in raw),
+        data,
+        *raw,
+    ]
+
+
+def decode_message(msg: memoryview) -> typing.Any:
+    """Decode a framed message or a plain pickle.
+
+    Out-of-band buffers are decoded as memoryviews of *msg*.
+    """
+    if msg[0] != FRAMED_MESSAGE:
+        return pickle.loads(msg)
+
+    _, nbufs, datalen = _frame_header.unpack_from(msg)
+    offset = _frame_header.size
+    lengths = struct.unpack_from(f'!{nbufs}Q', msg, offset)
+    offset += 8 * nbufs
+    data = msg[offset:offset + datalen]
+    offset += datalen
+    buffers = []
+    for length in lengths:
+        buffers.append(msg[offset:offset + length])
+        offset += length
+    return pickle.loads(data, buffers=buffers)
+
+
+def out_of_band(values: typing.Iterable[typing.Any]) -> typing.Tuple:
+    """Mark the binary blobs in *values* to be sent out-of-band."""
+    return tuple(
+        pickle.PickleBuffer(v)
+        if (
+            isinstance(v, (bytes, memoryview))
+            and memoryview(v).nbytes >= OUT_OF_BAND_MIN_SIZE
+        )
+        else v
+        for v in values
+    )
+
+
+def _payload_parts(payload: Payload) -> typing.Sequence[typing.Any]:
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return (payload,)
+    return payload
 
 
 class MessageStream:
     """Data stream that yields messages."""
 
     def __init__(self):
-        self._buffer = b''
+        self._chunks = collections.deque()
+        self._buffered = 0
         self._curmsg_len = -1
 
     def feed_data(self, data):
-        # TODO: rewrite to avoid buffer copies.
-        self._buffer += data
-        while self._buffer:
+        # Incoming data is kept as a list of chunks, and messages are
+        # either zero-copy slices of a chunk or joined exactly once.
+        self._chunks.append(memoryview(data))
+        self._buffered += len(data)
+        while True:
             if self._curmsg_len == -1:
-                if len(self._buffer) >= 8:
-                    self._curmsg_len = _uint64_unpacker(self._buffer[:8])[0]
-                    self._buffer = self._buffer[8:]
+                if self._buffered >= 8:
+                    self._curmsg_len = _uint64_unpacker(self._take(8))[0]
                 else:
                     return
 
-            if self._curmsg_len > 0 and len(self._buffer) >= self._curmsg_len:
-                msg = self._buffer[:self._curmsg_len]
-                self._buffer = self._buffer[self._curmsg_len:]
+            if self._curmsg_len > 0 and self._buffered >= self._curmsg_len:
+                msg = self._take(self._curmsg_len)
                 self._curmsg_len = -1
                 yield msg
             else:
                 return
 
+    def _take(self, size):
+        self._buffered -= size
+        chunk = self._chunks[0]
+        if len(chunk) > size:
+            self._chunks[0] = chunk[size:]
+            return chunk[:size]
+        elif len(chunk) == size:
+            return self._chunks.popleft()
+
+        parts = []
+        while size:
+            chunk = self._chunks[0]
+            if len(chunk) > size:
+                parts.append(chunk[:size])
+                self._chunks[0] = chunk[size:]
+                break
+            parts.append(self._chunks.popleft())
+            size -= len(chunk)
+        return memoryview(b''.join(parts))
+
 
 class HubProtocol(asyncio.Protocol):
     """The Protocol used on the hub side connecting to workers."""
@@ -73,12 +177,14 @@ class HubProtocol(asyncio.Protocol):
     def connection_made(self, tr):
         self._transport = tr
 
-    def send(self, req_id: int, waiter: asyncio.Future, payload: bytes):
+    def send(self, req_id: int, waiter: asyncio.Future, payload: Payload):
         if req_id in self._resp_waiters:
             raise RuntimeError('FramedProtocol: duplicate request ID')
         self._resp_waiters[req_id] = waiter
+        parts = _payload_parts(payload)
+        length = sum(memoryview(p).nbytes for p in parts)
         self._transport.writelines(
-            (_uint64_packer(len(payload) + 8), _uint64_packer(req_id), payload)
+            (_uint64_packer(length + 8), _uint64_packer(req_id), *parts)
         )
 
     def process_message(self, msg):
@@ -131,7 +237,7 @@ class HubConnection:
     def is_closed(self):
         return self._protocol._closed
 
-    async def request(self, data: bytes) -> bytes:
+    async def request(self, data: Payload) -> memoryview:
         self._req_id_cnt += 1
         req_id = self._req_id_cnt
 
@@ -160,20 +266,22 @@ class WorkerConnection:
         req_id = _uint64_unpacker(msgview[:8])[0]
         return req_id, msgview[8:]
 
-    def reply(self, req_id, payload):
+    def reply(self, req_id, payload: Payload):
+        parts = _payload_parts(payload)
+        length = sum(memoryview(p).nbytes for p in parts)
         self._sock.sendall(
             b"".join(
                 (
-                    _uint64_packer(len(payload) + 8),
+                    _uint64_packer(length + 8),
                     _uint64_packer(req_id),
-                    payload,
+                    *parts,
                 )
             )
         )
 
     def iter_request(self):
         while True:
-            data = b'' if self._sock is None else self._sock.recv(4096)
+            data = b'' if self._sock is None else self._sock.recv(RECV_SIZE)
             if not data:
                 # EOF received - abort
                 self.abort()
@@ -239,8 +347,7 @@ class Server:
         for con in self._pids.values():
             con.abort()
 
-    def kill_outdated_worker(self, current_version):
-        for conn in self._pids.values():
+    def iter_outdated_pids(self, current_version):
+        for pid, conn in self._pids.items():
             if conn._version < current_version and not conn._aborted:
-                conn.abort()
-                break
+                yield pid
@@ -133,8 +133,11 @@ def __sync__(client_id, pickled_schema, invalidation) -> None:
                         else:
                             db_updates = {}
                             if pickled_state.user_schema is not None:
-                                db_updates["user_schema"] = pickle.loads(
-                                    pickled_state.user_schema
+                                db_updates["user_schema"] = (
+                                    state.load_user_schema(
+                                        pickled_state.user_schema,
+                                        db_state.user_schema,
+                                    )
                                 )
                             if pickled_state.reflection_cache is not None:
                                 db_updates["reflection_cache"] = pickle.loads(
@@ -33,9 +33,12 @@ import signal
 import subprocess
 import sys
 import time
+import weakref
 
 import immutables
 
+from edb import errors
+
 from edb.common import debug
 from edb.common import taskgroup
 
@@ -45,6 +48,7 @@ from edb.server import args as srvargs
 from edb.server import dbview
 from edb.server import defines
 from edb.server import metrics
+from edb.server.compiler import enums
 
 from . import amsg
 from . import queue
@@ -53,8 +57,30 @@ from . import state
 
 PROCESS_INITIAL_RESPONSE_TIMEOUT: float = 60.0
 KILL_TIMEOUT: float = 10.0
+# The on-demand pool adds a worker when the 95th percentile of the time
+# compile requests wait for a free worker stays above the target for
+# ADAPTIVE_SCALE_UP_WAIT_TIME seconds, and removes one when it stays
+# below half of the target for ADAPTIVE_SCALE_DOWN_WAIT_TIME seconds
+# and the remaining workers would be no more than
+# ADAPTIVE_SCALE_DOWN_UTILIZATION busy.
+ADAPTIVE_TARGET_WAIT_TIME: float = float(
+    os.getenv('EDGEDB_SERVER_COMPILER_POOL_TARGET_WAIT_TIME', 0.05))
+ADAPTIVE_MIN_POOL_SIZE: int = int(
+    os.getenv('EDGEDB_SERVER_COMPILER_POOL_MIN_SIZE', 1))
 ADAPTIVE_SCALE_UP_WAIT_TIME: float = 3.0
 ADAPTIVE_SCALE_DOWN_WAIT_TIME: float = 60.0
+ADAPTIVE_SCALE_DOWN_UTILIZATION: float = 0.5
+ADAPTIVE_EVAL_INTERVAL: float = 1.0
+ADAPTIVE_SAMPLE_WINDOW: float = 10.0
+# When the number of changed schema entries exceeds this fraction of the
+# schema size, ship the whole schema to the worker instead of a delta.
+SCHEMA_DELTA_MAX_RATIO: float = 0.25
+# Newly attached compiler workers compile up to this many of the most
+# recently used cached queries before they start serving requests, so
+# that their first real compilations do not pay for cold caches.
+WORKER_WARM_UP_QUERIES: int = int(
+    os.getenv('EDGEDB_SERVER_COMPILER_WARM_UP_QUERIES', 50))
+WORKER_WARM_UP_TIMEOUT: float = 10.0
 WORKER_PKG: str = __name__.rpartition('.')[0] + '.'
 
 
@@ -73,6 +99,20 @@ def _pickle_memoized(schema):
     return pickle.dumps(schema, -1)
 
 
+# Deltas are only needed while the workers catch up with the latest
+# schemas; keep few, as every entry pins two schemas.
+@functools.lru_cache(maxsize=8)
+def _pickle_schema_delta_memoized(base_schema, user_schema):
+    # The worker already has `base_schema`, so only send what has
+    # changed since, unless the worker is too far behind.
+    delta = user_schema.get_delta(
+        base_schema, max_ratio=SCHEMA_DELTA_MAX_RATIO)
+    if delta is None:
+        return _pickle_memoized(user_schema)
+    else:
+        return pickle.dumps(delta, -1)
+
+
 class BaseWorker:
 
     _dbs: state.DatabasesState
@@ -110,7 +150,7 @@ class BaseWorker:
 
         data = await self._request(method_name, args)
 
-        status, *data = pickle.loads(data)
+        status, *data = amsg.decode_message(data)
 
         self._last_used = time.monotonic()
 
@@ -132,10 +172,28 @@ class BaseWorker:
             raise exc
 
     async def _request(self, method_name, args):
-        msg = pickle.dumps((method_name, args))
+        # The pickled schemas and states are sent out-of-band.
+        msg = amsg.encode_message((method_name, amsg.out_of_band(args)))
         return await self._con.request(msg)
 
 
+class TxState:
+    """A compiler transaction state held by a local compiler worker.
+
+    The next statements of the transaction are compiled by the same
+    worker.  The state is only pickled when the worker evicts it and
+    sends it back pickled, or when the worker is retired.  If the worker
+    exits unexpectedly, the state is lost and so is the transaction.
+    """
+
+    __slots__ = ('worker', 'state_id', 'pickled', '__weakref__')
+
+    def __init__(self, worker: Worker, state_id: int):
+        self.worker: Optional[Worker] = worker
+        self.state_id = state_id
+        self.pickled: Optional[bytes] = None
+
+
 class Worker(BaseWorker):
     def __init__(self, manager, server, pid, *args):
         super().__init__(*args)
@@ -144,6 +202,76 @@ class Worker(BaseWorker):
         self._last_pickled_state = None
         self._manager = manager
         self._server = server
+        self._acquired_at = None
+        # Transaction states held by the worker process that are still
+        # referenced, and the ones that no longer are, which the worker
+        # is told to drop with the next compile_in_tx call.
+        self._tx_states: Dict[int, weakref.ref[TxState]] = {}
+        self._dropped_tx_states: List[int] = []
+        # Requests waiting for this very worker, see
+        # BaseLocalPool._acquire_owner().
+        self._owner_waiters: Deque[asyncio.Future[bool]] = (
+            collections.deque())
+        self._retiring = False
+
+    def _get_tx_state(
+        self,
+        state_id: Optional[int],
+        spilled: List[Tuple[int, bytes]],
+    ) -> Optional[TxState]:
+        for spilled_id, pickled in spilled:
+            ref = self._tx_states.pop(spilled_id, None)
+            tx_state = ref() if ref is not None else None
+            if tx_state is not None:
+                tx_state.pickled = pickled
+                tx_state.worker = None
+
+        if state_id is None:
+            return None
+        tx_state = TxState(self, state_id)
+        self._tx_states[state_id] = weakref.ref(
+            tx_state,
+            lambda _, state_id=state_id: self._drop_tx_state(state_id),
+        )
+        return tx_state
+
+    def _drop_tx_state(self, state_id: int) -> None:
+        if self._tx_states.pop(state_id, None) is not None:
+            self._dropped_tx_states.append(state_id)
+
+    def _flush_dropped_tx_states(self) -> List[int]:
+        dropped, self._dropped_tx_states = self._dropped_tx_states, []
+        return dropped
+
+    async def _spill_tx_states(self) -> None:
+        # Pickle the live transaction states out of the worker, so that
+        # the transactions can go on with other workers.  The worker must
+        # be acquired.
+        for state_id, ref in list(self._tx_states.items()):
+            tx_state = ref()
+            if tx_state is None or tx_state.worker is not self:
+                continue
+            try:
+                pickled = await self.call('pickle_tx_state', state_id)
+            except state.StateNotFound:
+                continue
+            self._tx_states.pop(state_id, None)
+            tx_state.pickled = pickled
+            tx_state.worker = None
+
+    def _hand_over(self) -> bool:
+        while self._owner_waiters:
+            waiter = self._owner_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return True
+        return False
+
+    def _wake_owner_waiters(self) -> None:
+        waiters, self._owner_waiters = self._owner_waiters, collections.deque()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(False)
 
     async def _attach(self, init_args_pickled: bytes):
         self._manager._stats_spawned += 1
@@ -164,6 +292,7 @@ class Worker(BaseWorker):
         self._closed = True
         self._manager._stats_killed += 1
         self._manager._workers.pop(self._pid, None)
+        self._wake_owner_waiters()
         self._manager._report_worker(self, action="kill")
         try:
             os.kill(self._pid, signal.SIGTERM)
@@ -173,6 +302,10 @@ class Worker(BaseWorker):
 
 class AbstractPool:
     _dbindex: dbview.DatabaseIndex
+    # Whether workers can receive user schema updates as deltas
+    _schema_delta_enabled: bool = True
+    # Whether new workers compile the recent queries of _dbindex first
+    _warm_up_workers: bool = True
 
     def __init__(
         self,
@@ -324,7 +457,8 @@ class AbstractPool:
             }
         else:
             if worker_db.user_schema is not user_schema:
-                preargs.append(_pickle_memoized(user_schema))
+                preargs.append(self._pickle_user_schema(
+                    worker_db.user_schema, user_schema))
                 to_update['user_schema'] = user_schema
             else:
                 preargs.append(None)
@@ -365,6 +499,116 @@ class AbstractPool:
 
         return tuple(preargs), callback
 
+    def _get_warm_up_corpus(self):
+        if WORKER_WARM_UP_QUERIES <= 0 or not self._warm_up_workers:
+            return []
+        corpus = []
+        for db in self._dbindex.iter_dbs():
+            if db.user_schema is None:
+                # Not introspected yet
+                continue
+            for key in db.get_recent_queries(
+                WORKER_WARM_UP_QUERIES - len(corpus)
+            ):
+                corpus.append((db, key))
+            if len(corpus) >= WORKER_WARM_UP_QUERIES:
+                break
+        return corpus
+
+    async def _warm_up_worker(self, worker):
+        corpus = self._get_warm_up_corpus()
+        if not corpus:
+            return
+
+        global_schema = self._dbindex.get_global_schema()
+        system_config = self._dbindex.get_compilation_system_config()
+        started_at = time.monotonic()
+        num_compiled = 0
+        db = None
+        try:
+            async with asyncio.timeout(WORKER_WARM_UP_TIMEOUT):
+                for db, (query_req, modaliases, session_config) in corpus:
+                    if await self._warm_up_query(
+                        worker,
+                        db,
+                        query_req,
+                        modaliases,
+                        session_config,
+                        global_schema,
+                        system_config,
+                    ):
+                        num_compiled += 1
+                db = None
+        except TimeoutError:
+            if db is not None:
+                # The interrupted call may or may not have synced the
+                # state of this database in the worker, so forget it
+                # and send it in full the next time.
+                worker._dbs = worker._dbs.delete(db.name)
+            logger.debug(
+                "timed out warming up compiler worker after %d queries",
+                num_compiled,
+            )
+        else:
+            logger.debug(
+                "warmed up compiler worker with %d queries in %.3f seconds",
+                num_compiled, time.monotonic() - started_at,
+            )
+
+    async def _warm_up_query(
+        self,
+        worker,
+        db,
+        query_req,
+        modaliases,
+        session_config,
+        global_schema,
+        system_config,
+    ) -> bool:
+        preargs, sync_state = await self._compute_compile_preargs(
+            "compile",
+            worker,
+            db.name,
+            db.user_schema,
+            global_schema,
+            db.reflection_cache,
+            db.db_config,
+            system_config,
+        )
+        try:
+            result = await worker.call(
+                *preargs,
+                query_req.source,
+                modaliases,
+                session_config,
+                query_req.output_format,
+                query_req.expect_one,
+                query_req.implicit_limit,
+                query_req.inline_typeids,
+                query_req.inline_typenames,
+                query_req.protocol_version,
+                query_req.inline_objectids,
+                query_req.input_format is enums.InputFormat.JSON,
+                sync_state=sync_state,
+            )
+            self._get_compile_result(worker, result)
+        except Exception:
+            # Warming up is best effort; the query will be compiled
+            # again (and fail properly) when it is actually run.
+            logger.debug(
+                "could not compile a warm-up query in compiler worker",
+                exc_info=True,
+            )
+            return False
+        else:
+            return True
+
+    def _pickle_user_schema(self, worker_schema, user_schema):
+        if self._schema_delta_enabled and worker_schema is not None:
+            return _pickle_schema_delta_memoized(worker_schema, user_schema)
+        else:
+            return _pickle_memoized(user_schema)
+
     async def _acquire_worker(
         self, *, condition=None, weighter=None, **compiler_args
     ):
@@ -402,15 +646,18 @@ class AbstractPool:
                 *compile_args,
                 sync_state=sync_state
             )
-            worker._last_pickled_state = result[1]
-            if len(result) == 2:
-                return *result, 0
-            else:
-                return result
+            return self._get_compile_result(worker, result)
 
         finally:
             self._release_worker(worker)
 
+    def _get_compile_result(self, worker, result):
+        worker._last_pickled_state = result[1]
+        if len(result) == 2:
+            return *result, 0
+        else:
+            return result
+
     async def compile_in_tx(
         self, txid, pickled_state, state_id, *compile_args
     ):
@@ -618,6 +865,9 @@ class BaseLocalPool(
     _worker_mod = "worker"
     _workers_queue: queue.WorkerQueue[Worker]
     _workers: Dict[int, Worker]
+    # Whether the workers keep transaction states and return TxStates
+    # instead of pickled states, see TxState.
+    _worker_keeps_tx_states = True
 
     def __init__(
         self,
@@ -664,6 +914,12 @@ class BaseLocalPool(
             *init_args,
         )
         await worker._attach(init_args_pickled)
+        await self._warm_up_worker(worker)
+        if not self._running:
+            # The pool stopped while the worker was warming up and no
+            # longer knows about it.
+            worker.close()
+            return
         self._report_worker(worker)
 
         self._workers[pid] = worker
@@ -694,7 +950,9 @@ class BaseLocalPool(
 
     def worker_disconnected(self, pid):
         logger.debug("Worker with PID %s disconnected.", pid)
-        self._workers.pop(pid, None)
+        worker = self._workers.pop(pid, None)
+        if worker is not None:
+            worker._wake_owner_waiters()
         metrics.current_compiler_processes.dec()
 
     async def start(self):
@@ -763,7 +1021,10 @@ class BaseLocalPool(
         self._server = None
 
         self._workers_queue = queue.WorkerQueue(self._loop)
+        workers = list(self._workers.values())
         self._workers.clear()
+        for worker in workers:
+            worker._wake_owner_waiters()
 
         await self._stop()
 
@@ -788,6 +1049,7 @@ class BaseLocalPool(
     async def _acquire_worker(
         self, *, condition=None, weighter=None, **compiler_args
     ):
+        started_at = time.monotonic()
         while (
             worker := await self._workers_queue.acquire(
                 condition=condition, weighter=weighter
@@ -795,12 +1057,147 @@ class BaseLocalPool(
         ).get_pid() not in self._workers:
             # The worker was disconnected; skip to the next one.
             pass
+        worker._acquired_at = time.monotonic()
+        self._on_worker_acquired(worker._acquired_at - started_at)
+        return worker
+
+    async def _acquire_owner(self, worker: Worker) -> Optional[Worker]:
+        # Acquire this very worker, waiting for it if it is busy;
+        # return None if the worker has exited.
+        started_at = time.monotonic()
+        while worker.get_pid() in self._workers:
+            if self._workers_queue.take(worker):
+                worker._acquired_at = time.monotonic()
+                break
+
+            waiter = self._loop.create_future()
+            worker._owner_waiters.append(waiter)
+            try:
+                handed_over = await waiter
+            except BaseException:
+                if waiter.done() and not waiter.cancelled():
+                    if waiter.result():
+                        # The worker was handed over to us just before
+                        # we got cancelled.
+                        self._release_worker(worker)
+                else:
+                    waiter.cancel()
+                    try:
+                        worker._owner_waiters.remove(waiter)
+                    except ValueError:
+                        pass
+                raise
+            if handed_over:
+                break
+        else:
+            return None
+
+        self._on_worker_acquired(worker._acquired_at - started_at)
         return worker
 
     def _release_worker(self, worker, *, put_in_front: bool = True):
+        if worker._acquired_at is not None:
+            self._on_worker_released(
+                worker, time.monotonic() - worker._acquired_at)
+            worker._acquired_at = None
         # Skip disconnected workers
         if worker.get_pid() in self._workers:
-            self._workers_queue.release(worker, put_in_front=put_in_front)
+            if worker._hand_over():
+                # A request waiting for this very worker takes it over.
+                worker._acquired_at = time.monotonic()
+            else:
+                self._workers_queue.release(
+                    worker, put_in_front=put_in_front)
+
+    async def _retire_worker(self, worker: Worker) -> None:
+        # Close the worker once it is done with the current request and
+        # the transaction states it holds are moved out of it, so that
+        # the transactions can go on with the other workers.
+        worker._retiring = True
+        if await self._acquire_owner(worker) is None:
+            return
+        try:
+            await worker._spill_tx_states()
+        except Exception:
+            logger.exception(
+                "Could not move the transaction states out of the "
+                "compiler worker with PID %d", worker.get_pid())
+        worker.close()
+
+    def _on_worker_acquired(self, wait_time: float) -> None:
+        metrics.compiler_pool_queue_wait_duration.observe(wait_time)
+
+    def _get_compile_result(self, worker, result):
+        if not self._worker_keeps_tx_states:
+            return super()._get_compile_result(worker, result)
+        units, state_id, spilled = result
+        return units, worker._get_tx_state(state_id, spilled), 0
+
+    async def compile_in_tx(
+        self, txid, pickled_state, state_id, *compile_args
+    ):
+        if not self._worker_keeps_tx_states:
+            return await super().compile_in_tx(
+                txid, pickled_state, state_id, *compile_args)
+
+        tx_state = pickled_state
+        worker = None
+        if isinstance(tx_state, TxState) and tx_state.worker is not None:
+            # Compile with the worker that holds the state, waiting for
+            # it if it is busy: the state cannot be moved out of it
+            # without acquiring it anyway.
+            worker = await self._acquire_owner(tx_state.worker)
+        if worker is None:
+            worker = await self._acquire_worker()
+        try:
+            if not isinstance(tx_state, TxState):
+                state_id = 0
+            elif tx_state.worker is worker:
+                state_id, pickled_state = tx_state.state_id, None
+            elif tx_state.pickled is not None:
+                state_id, pickled_state = 0, tx_state.pickled
+            else:
+                return await self._compile_with_lost_tx_state(
+                    worker, tx_state, compile_args)
+
+            try:
+                units, new_state_id, spilled = await worker.call(
+                    'compile_in_tx',
+                    state_id,
+                    pickled_state,
+                    worker._flush_dropped_tx_states(),
+                    txid,
+                    *compile_args
+                )
+            except state.StateNotFound:
+                raise self._tx_state_lost_error() from None
+            return units, worker._get_tx_state(new_state_id, spilled), 0
+
+        finally:
+            # Put the worker at the end of the queue so that the chance
+            # of reusing it later for the same transaction is higher.
+            self._release_worker(worker, put_in_front=False)
+
+    async def _compile_with_lost_tx_state(self, worker, tx_state, args):
+        # The worker holding the state has exited.  A failed transaction
+        # can still be rolled back, which needs no state; anything else
+        # fails the transaction with a clear error.
+        # See Compiler.compile_in_tx() for the arguments.
+        source = args[0]
+        expect_rollback = args[9] if len(args) > 9 else False
+        if not expect_rollback:
+            raise self._tx_state_lost_error()
+        units, _ = await worker.call('_try_compile_rollback', source)
+        return units, tx_state, 0
+
+    def _tx_state_lost_error(self):
+        return errors.TransactionError(
+            'the compiler process holding the state of the current '
+            'transaction has exited; the transaction must be rolled back'
+        )
+
+    def _on_worker_released(self, worker, busy_time: float) -> None:
+        metrics.compiler_pool_request_duration.observe(busy_time)
 
 
 @srvargs.CompilerPoolMode.Fixed.assign_implementation
@@ -813,7 +1210,13 @@ class FixedPool(BaseLocalPool):
 
     def _worker_attached(self):
         if len(self._workers) > self._pool_size:
-            self._server.kill_outdated_worker(self._template_proc_version)
+            for pid in self._server.iter_outdated_pids(
+                self._template_proc_version
+            ):
+                worker = self._workers.get(pid)
+                if worker is not None and not worker._retiring:
+                    self._loop.create_task(self._retire_worker(worker))
+                    break
 
     def worker_connected(self, pid, version):
         if version < self._template_proc_version:
@@ -885,64 +1288,57 @@ class FixedPool(BaseLocalPool):
 @srvargs.CompilerPoolMode.OnDemand.assign_implementation
 class SimpleAdaptivePool(BaseLocalPool):
     def __init__(self, *, pool_size, **kwargs):
-        super().__init__(pool_size=1, **kwargs)
+        super().__init__(
+            pool_size=max(1, min(ADAPTIVE_MIN_POOL_SIZE, pool_size)),
+            **kwargs,
+        )
         self._worker_transports = {}
         self._expected_num_workers = 0
-        self._scale_up_handle = None
-        self._scale_down_handle = None
         self._max_num_workers = pool_size
+        self._autoscale_handle = None
+
+        # (timestamp, seconds) samples from the last ADAPTIVE_SAMPLE_WINDOW
+        self._wait_samples = collections.deque()
+        self._busy_samples = collections.deque()
+        # When each of the requests still waiting for a worker started
+        # to wait, oldest first.
+        self._waiting_since: Dict[object, float] = {}
+        # When the wait time went above the target, or below the low
+        # watermark; None if it is not there now.
+        self._overloaded_since = None
+        self._underloaded_since = None
 
     async def _start(self):
         async with taskgroup.TaskGroup() as g:
             for _i in range(self._pool_size):
                 g.create_task(self._create_worker())
+        self._schedule_autoscale()
 
     async def _stop(self):
+        if self._autoscale_handle is not None:
+            self._autoscale_handle.cancel()
+            self._autoscale_handle = None
         self._expected_num_workers = 0
         transports, self._worker_transports = self._worker_transports, {}
         for transport in transports.values():
             await transport._wait()
             transport.close()
 
-    async def _acquire_worker(
-        self, *, condition=None, weighter=None, **compiler_args
-    ):
-        if (
-            self._running and
-            self._scale_up_handle is None
-            and self._workers_queue.qsize() == 0
-            and (
-                len(self._workers)
-                == self._expected_num_workers
-                < self._max_num_workers
-            )
-        ):
-            self._scale_up_handle = self._loop.call_later(
-                ADAPTIVE_SCALE_UP_WAIT_TIME,
-                self._maybe_scale_up,
-                self._workers_queue.count_waiters() + 1,
-            )
-        if self._scale_down_handle is not None:
-            self._scale_down_handle.cancel()
-            self._scale_down_handle = None
-        return await super()._acquire_worker(
-            condition=condition, weighter=weighter, **compiler_args
-        )
+    async def _acquire_worker(self, **kwargs):
+        key = object()
+        self._waiting_since[key] = time.monotonic()
+        try:
+            return await super()._acquire_worker(**kwargs)
+        finally:
+            del self._waiting_since[key]
 
-    def _release_worker(self, worker, *, put_in_front: bool = True):
-        if self._scale_down_handle is not None:
-            self._scale_down_handle.cancel()
-            self._scale_down_handle = None
-        super()._release_worker(worker, put_in_front=put_in_front)
-        if (
-            self._running and
-            self._workers_queue.count_waiters() == 0 and
-            len(self._workers) > self._pool_size
-        ):
-            self._scale_down_handle = self._loop.call_later(
-                ADAPTIVE_SCALE_DOWN_WAIT_TIME,
-                self._scale_down,
-            )
+    def _on_worker_acquired(self, wait_time: float) -> None:
+        super()._on_worker_acquired(wait_time)
+        self._wait_samples.append((time.monotonic(), wait_time))
+
+    def _on_worker_released(self, worker, busy_time: float) -> None:
+        super()._on_worker_released(worker, busy_time)
+        self._busy_samples.append((time.monotonic(), busy_time))
 
     def worker_disconnected(self, pid):
         num_workers_before = len(self._workers)
@@ -974,40 +1370,107 @@ class SimpleAdaptivePool(BaseLocalPool):
                     self._worker_transports.pop(pid, None)
 
     async def _create_worker(self):
+        # Creates a single compiler worker process.
+        self._expected_num_workers += 1
         try:
-            # Creates a single compiler worker process.
             transport = await self._create_compiler_process()
-            self._worker_transports[transport.get_pid()] = transport
-            self._expected_num_workers += 1
-        finally:
-            self._scale_up_handle = None
+        except BaseException:
+            self._expected_num_workers -= 1
+            raise
+        self._worker_transports[transport.get_pid()] = transport
+
+    def _schedule_autoscale(self):
+        self._autoscale_handle = self._loop.call_later(
+            ADAPTIVE_EVAL_INTERVAL, self._autoscale)
 
-    def _maybe_scale_up(self, starting_num_waiters):
+    def _autoscale(self):
+        self._autoscale_handle = None
         if not self._running:
             return
-        if self._workers_queue.count_waiters() > starting_num_waiters:
-            logger.info(
-                "Compile requests are queuing up in the past %d seconds, "
-                "spawn a new compiler worker process now.",
-                ADAPTIVE_SCALE_UP_WAIT_TIME,
-            )
-            self._loop.create_task(self._create_worker())
+        try:
+            self._maybe_scale(time.monotonic())
+        finally:
+            self._schedule_autoscale()
+
+    def _get_load(self, now: float) -> Tuple[float, float]:
+        """Return the p95 wait time and the average number of busy workers
+        over the last ADAPTIVE_SAMPLE_WINDOW seconds."""
+        window_start = now - ADAPTIVE_SAMPLE_WINDOW
+        for samples in (self._wait_samples, self._busy_samples):
+            while samples and samples[0][0] < window_start:
+                samples.popleft()
+
+        waits = sorted(wait for _, wait in self._wait_samples)
+        wait_p95 = waits[int(len(waits) * 0.95)] if waits else 0.0
+        if self._waiting_since:
+            # Requests that are still waiting are not sampled yet, but
+            # count with how long the oldest one has waited so far.
+            oldest = next(iter(self._waiting_since.values()))
+            wait_p95 = max(wait_p95, now - oldest)
+
+        busy = sum(busy for _, busy in self._busy_samples)
+        for worker in self._workers.values():
+            if worker._acquired_at is not None:
+                busy += now - max(worker._acquired_at, window_start)
+
+        return wait_p95, busy / ADAPTIVE_SAMPLE_WINDOW
+
+    def _maybe_scale(self, now: float):
+        wait_p95, busy_workers = self._get_load(now)
+        num_workers = self._expected_num_workers
+
+        if wait_p95 > ADAPTIVE_TARGET_WAIT_TIME:
+            self._underloaded_since = None
+            if self._overloaded_since is None:
+                self._overloaded_since = now
+            elif (
+                now - self._overloaded_since >= ADAPTIVE_SCALE_UP_WAIT_TIME
+                and num_workers < self._max_num_workers
+                # Wait for the previous scale-up to complete
+                and len(self._workers) == num_workers
+            ):
+                logger.info(
+                    "Compile requests waited %.3f seconds for a compiler "
+                    "worker (p95) in the past %d seconds, spawn a new "
+                    "compiler worker process now.",
+                    wait_p95, ADAPTIVE_SCALE_UP_WAIT_TIME,
+                )
+                self._overloaded_since = None
+                self._loop.create_task(self._create_worker())
+
+        elif (
+            wait_p95 < ADAPTIVE_TARGET_WAIT_TIME / 2
+            and num_workers > self._pool_size
+            and busy_workers
+            <= (num_workers - 1) * ADAPTIVE_SCALE_DOWN_UTILIZATION
+        ):
+            self._overloaded_since = None
+            if self._underloaded_since is None:
+                self._underloaded_since = now
+            elif now - self._underloaded_since >= ADAPTIVE_SCALE_DOWN_WAIT_TIME:
+                self._underloaded_since = None
+                self._scale_down()
+
         else:
-            self._scale_up_handle = None
+            # Between the watermarks: keep the current size.
+            self._overloaded_since = None
+            self._underloaded_since = None
 
     def _scale_down(self):
-        self._scale_down_handle = None
-        if not self._running or len(self._workers) <= self._pool_size:
+        idle = [
+            w for w in self._workers.values()
+            if w._acquired_at is None and not w._retiring
+        ]
+        if not idle:
             return
+        worker = min(idle, key=lambda w: w._last_used)
         logger.info(
-            "The compiler pool is not used in %d seconds, scaling down to %d.",
-            ADAPTIVE_SCALE_DOWN_WAIT_TIME, self._pool_size,
+            "The compiler pool has been underused in the past %d seconds, "
+            "scaling down to %d.",
+            ADAPTIVE_SCALE_DOWN_WAIT_TIME, self._expected_num_workers - 1,
         )
-        self._expected_num_workers = self._pool_size
-        for worker in sorted(
-            self._workers.values(), key=lambda w: w._last_used
-        )[:-self._pool_size]:
-            worker.close()
+        self._expected_num_workers -= 1
+        self._loop.create_task(self._retire_worker(worker))
 
 
 class RemoteWorker(BaseWorker):
@@ -1030,6 +1493,10 @@ class RemoteWorker(BaseWorker):
 
 @srvargs.CompilerPoolMode.Remote.assign_implementation
 class RemotePool(AbstractPool):
+    # The remote compiler server stores pickled schemas as-is and
+    # forwards them to its workers, so it needs full schemas.
+    _schema_delta_enabled = False
+
     def __init__(self, *, address, pool_size, **kwargs):
         super().__init__(**kwargs)
         self._pool_addr = address
@@ -1277,6 +1744,9 @@ class MultiTenantPool(FixedPool):
     _worker_class = MultiTenantWorker  # type: ignore
     _worker_mod = "multitenant_worker"
     _workers: Dict[int, MultiTenantWorker]  # type: ignore
+    _worker_keeps_tx_states = False
+    # Serves many tenants and has no database index of its own
+    _warm_up_workers = False
 
     def __init__(self, *, cache_size, **kwargs):
         super().__init__(**kwargs)
@@ -1417,6 +1887,7 @@ class MultiTenantPool(FixedPool):
         if tenant_schema is None:
             # make room for the new client in this worker
             worker.maybe_invalidate_last()
+            worker_db = None
             to_update = {
                 "user_schema": user_schema,
                 "reflection_cache": reflection_cache,
@@ -1446,7 +1917,14 @@ class MultiTenantPool(FixedPool):
                 to_update["instance_config"] = system_config
 
         if to_update:
-            pickled = {k: _pickle_memoized(v) for k, v in to_update.items()}
+            pickled = {
+                k: (
+                    self._pickle_user_schema(worker_db.user_schema, v)
+                    if k == "user_schema" and worker_db is not None
+                    else _pickle_memoized(v)
+                )
+                for k, v in to_update.items()
+            }
             if any(f in pickled for f in PickledState._fields):
                 db_state = PickledState(
                     **{f: pickled.pop(f, None) for f in PickledState._fields}
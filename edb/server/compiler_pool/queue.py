@@ -118,6 +118,14 @@ class WorkerQueue(typing.Generic[W]):
             self._queue.append(worker)
         self._wakeup_next_waiter()
 
+    def take(self, worker: W) -> bool:
+        # Take this very worker if it is in the queue.
+        try:
+            self._queue.remove(worker)
+        except ValueError:
+            return False
+        return True
+
     def qsize(self) -> int:
         return len(self._queue)
 
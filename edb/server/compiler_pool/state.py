@@ -17,6 +17,7 @@
 #
 
 
+import pickle
 import typing
 
 import immutables
@@ -51,3 +52,21 @@ class IncompatibleClient(Exception):
 
 
 REUSE_LAST_STATE_MARKER = b'REUSE_LAST_STATE_MARKER'
+
+
+def load_user_schema(
+    pickled: bytes,
+    base: typing.Optional[schema.FlatSchema],
+) -> schema.FlatSchema:
+    """Unpickle a user schema sent by the pool.
+
+    The pool may send a FlatSchemaDelta against the schema the worker
+    already has instead of the full schema; apply it on top of *base*.
+    """
+    user_schema = pickle.loads(pickled)
+    if isinstance(user_schema, schema.FlatSchemaDelta):
+        if base is None:
+            raise FailedStateSync(
+                'received a schema delta without a base schema')
+        user_schema = base.apply_delta(user_schema)
+    return user_schema
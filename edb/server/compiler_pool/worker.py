@@ -20,12 +20,15 @@
 from __future__ import annotations
 from typing import *  # NoQA
 
+import itertools
+import os
 import pickle
 
 import immutables
 
 from edb import edgeql
 from edb import graphql
+from edb.common import lru
 from edb.pgsql import params as pgparams
 from edb.schema import schema as s_schema
 from edb.server import compiler
@@ -41,11 +44,41 @@ DBS: state.DatabasesState = immutables.Map()
 BACKEND_RUNTIME_PARAMS: pgparams.BackendRuntimeParams = \
     pgparams.get_default_runtime_params()
 COMPILER: compiler.Compiler
-LAST_STATE: Optional[compiler.dbstate.CompilerConnectionState] = None
 STD_SCHEMA: s_schema.FlatSchema
 GLOBAL_SCHEMA: s_schema.FlatSchema
 INSTANCE_CONFIG: immutables.Map[str, config.SettingValue]
 
+# The worker keeps the compiler states of the transactions it compiled
+# for, keyed by state id.  The pool sends the next statement of a
+# transaction to the worker that has its state, so that the state is
+# only pickled if it has to be moved to another worker (see
+# pickle_tx_state) or is evicted from here.  Evicted states are pickled
+# and returned to the pool with the next compile result.
+TX_STATES_CACHE_SIZE = int(os.getenv(
+    'EDGEDB_SERVER_COMPILER_TX_STATES_CACHE_SIZE', 32))
+SPILLED_TX_STATES: List[Tuple[int, bytes]] = []
+
+
+def _spill_tx_state(state_id, cstate):
+    SPILLED_TX_STATES.append((state_id, pickle.dumps(cstate, -1)))
+
+
+TX_STATES: lru.LRUMapping = lru.LRUMapping(
+    maxsize=TX_STATES_CACHE_SIZE, on_evict=_spill_tx_state)
+_tx_state_ids = itertools.count(1)
+
+
+def _keep_tx_state(
+    cstate: Optional[compiler.dbstate.CompilerConnectionState],
+) -> Tuple[Optional[int], List[Tuple[int, bytes]]]:
+    state_id = None
+    if cstate is not None:
+        state_id = next(_tx_state_ids)
+        TX_STATES[state_id] = cstate
+    spilled = SPILLED_TX_STATES[:]
+    SPILLED_TX_STATES.clear()
+    return state_id, spilled
+
 
 def __init_worker__(
     init_args_pickled: bytes,
@@ -116,7 +149,8 @@ def __sync__(
             updates = {}
 
             if user_schema is not None:
-                updates['user_schema'] = pickle.loads(user_schema)
+                updates['user_schema'] = state.load_user_schema(
+                    user_schema, db.user_schema)
             if reflection_cache is not None:
                 updates['reflection_cache'] = pickle.loads(reflection_cache)
             if database_config is not None:
@@ -168,24 +202,40 @@ def compile(
         **compile_kwargs
     )
 
-    global LAST_STATE
-    LAST_STATE = cstate
-    pickled_state = None
-    if cstate is not None:
-        pickled_state = pickle.dumps(cstate, -1)
-
-    return units, pickled_state
+    return units, *_keep_tx_state(cstate)
 
 
-def compile_in_tx(cstate, *args, **kwargs):
-    global LAST_STATE
-    if cstate == state.REUSE_LAST_STATE_MARKER:
-        cstate = LAST_STATE
+def compile_in_tx(
+    state_id: int,
+    pickled_state: Optional[bytes],
+    dropped_state_ids: List[int],
+    *args: Any,
+    **kwargs: Any,
+):
+    for dropped_id in dropped_state_ids:
+        TX_STATES.pop(dropped_id, None)
+
+    if pickled_state is None:
+        try:
+            cstate = TX_STATES[state_id]
+        except KeyError:
+            raise state.StateNotFound(
+                f'transaction state {state_id} is not in the worker'
+            ) from None
     else:
-        cstate = pickle.loads(cstate)
+        cstate = pickle.loads(pickled_state)
     units, cstate = COMPILER.compile_in_tx(cstate, *args, **kwargs)
-    LAST_STATE = cstate
-    return units, pickle.dumps(cstate, -1)
+    return units, *_keep_tx_state(cstate)
+
+
+def pickle_tx_state(state_id: int) -> bytes:
+    try:
+        cstate = TX_STATES[state_id]
+    except KeyError:
+        raise state.StateNotFound(
+            f'transaction state {state_id} is not in the worker'
+        ) from None
+    return pickle.dumps(cstate, -1)
 
 
 def compile_notebook(
@@ -315,6 +365,8 @@ def get_handler(methname):
             meth = compile
         elif methname == "compile_in_tx":
             meth = compile_in_tx
+        elif methname == "pickle_tx_state":
+            meth = pickle_tx_state
         elif methname == "compile_notebook":
             meth = compile_notebook
         elif methname == "compile_graphql":
@@ -43,7 +43,7 @@ def worker(sockname, version_serial, get_handler):
     try:
         for req_id, req in con.iter_request():
             try:
-                methname, args = pickle.loads(req)
+                methname, args = amsg.decode_message(req)
                 meth = get_handler(methname)
             except Exception as ex:
                 prepare_exception(ex)
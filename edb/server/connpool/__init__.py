@@ -16,7 +16,7 @@
 # limitations under the License.
 #
 
-from .pool import Pool, _NaivePool  # NoQA
+from .pool import Pool, Snapshot, _NaivePool  # NoQA
 
 
-__all__ = ('Pool',)
+__all__ = ('Pool', 'Snapshot')
@@ -24,6 +24,7 @@ import typing
 import asyncio
 import collections
 import dataclasses
+import math
 import time
 
 from . import rolavg
@@ -34,6 +35,14 @@ MIN_QUERY_TIME_THRESHOLD = 0.001
 MIN_LOG_TIME_THRESHOLD = 1
 CONNECT_FAILURE_RETRIES = 3
 MIN_IDLE_TIME_BEFORE_GC = 120
+# How many of the most recently used idle connections are checked for
+# the one best matching the preference passed to acquire().
+MAX_PREFERRED_CONN_SCAN = 8
+# In the predictive mode, the acquire rate of every block is sampled
+# every PREDICT_INTERVAL seconds, and the last PREDICT_HISTORY samples
+# are averaged.
+PREDICT_INTERVAL = 1.0
+PREDICT_HISTORY = 30
 
 logger = logging.getLogger("edb.server")
 
@@ -54,6 +63,12 @@ class Disconnector(typing.Protocol[CP2]):
         pass
 
 
+class ConnectionPreference(typing.Protocol[CP2]):
+
+    def __call__(self, conn: CP2) -> int:
+        pass
+
+
 class StatsCollector(typing.Protocol):
 
     def __call__(self, stats: Snapshot) -> None:
@@ -91,6 +106,18 @@ class Snapshot:
     successful_disconnects: int
 
 
+@dataclasses.dataclass(frozen=True)
+class BlockPolicy:
+    # How a block is treated when the pool runs at capacity: the quota of
+    # the blocks is proportional to their demand multiplied by the weight,
+    # and a block that needs connections is given at least `reserved` ones.
+    weight: float = 1.0
+    reserved: int = 0
+
+
+DEFAULT_POLICY = BlockPolicy()
+
+
 @dataclasses.dataclass
 class ConnectionState:
     in_use_since: float = 0
@@ -122,6 +149,7 @@ class Block(typing.Generic[C]):
     dbname: str
     conns: typing.Dict[C, ConnectionState]
     quota: int
+    policy: BlockPolicy
     pending_conns: int
     last_connect_timestamp: float
 
@@ -133,6 +161,9 @@ class Block(typing.Generic[C]):
 
     querytime_avg: rolavg.RollingAverage
     nwaiters_avg: rolavg.RollingAverage
+    acquire_rate_avg: rolavg.RollingAverage
+    acquires_since_sample: int
+    predicted_conns: int
 
     _cached_calibrated_demand: float
 
@@ -148,6 +179,7 @@ class Block(typing.Generic[C]):
         self.dbname = dbname
         self.conns = {}
         self.quota = 1
+        self.policy = DEFAULT_POLICY
         self.pending_conns = 0
         self.last_connect_timestamp = 0
 
@@ -161,6 +193,11 @@ class Block(typing.Generic[C]):
 
         self.querytime_avg = rolavg.RollingAverage(history_size=20)
         self.nwaiters_avg = rolavg.RollingAverage(history_size=3)
+        self._cached_calibrated_demand = 0
+        self.acquire_rate_avg = rolavg.RollingAverage(
+            history_size=PREDICT_HISTORY)
+        self.acquires_since_sample = 0
+        self.predicted_conns = 0
 
         self._is_log_batching = False
         self._last_log_timestamp = 0
@@ -202,6 +239,7 @@ class Block(typing.Generic[C]):
 
     def inc_acquire_counter(self) -> None:
         self.conn_acquired_num += 1
+        self.acquires_since_sample += 1
 
     def dec_acquire_counter(self) -> None:
         self.conn_acquired_num -= 1
@@ -226,7 +264,9 @@ class Block(typing.Generic[C]):
 
         return self.conn_stack.popleft()
 
-    async def acquire(self) -> C:
+    async def acquire(
+        self, prefer: typing.Optional[ConnectionPreference[C]] = None
+    ) -> C:
         # There can be a race between a waiter scheduled for to wake up
         # and a connection being stolen (due to quota being enforced,
         # for example).  In which case the waiter might get finally
@@ -271,6 +311,25 @@ class Block(typing.Generic[C]):
                         self._wakeup_next_waiter()
                     raise
 
+            if prefer is not None:
+                # Look for the preferred connection (e.g. one that has the
+                # query prepared) among the most recently used ones; the
+                # more recently used one wins a tie.  Taking it out of the
+                # middle of the stack keeps the stack ordered by
+                # in_stack_since.
+                depth = min(len(self.conn_stack), MAX_PREFERRED_CONN_SCAN)
+                best_score = 0
+                best_index = 0
+                for i in range(1, depth + 1):
+                    score = prefer(self.conn_stack[-i])
+                    if score > best_score:
+                        best_score = score
+                        best_index = i
+                if best_index:
+                    conn = self.conn_stack[-best_index]
+                    del self.conn_stack[-best_index]
+                    return conn
+
             # Yield the most recently used connection from the top of the stack
             return self.conn_stack.pop()
         finally:
@@ -354,6 +413,8 @@ class BasePool(typing.Generic[C]):
     # starving situation when the blocks are fed with connections in a round-
     # robin fashion, see also Pool._tick().
 
+    _policies: typing.Dict[str, BlockPolicy]
+
     _is_starving: bool
     # Indicates if any block is starving for connections, this usually means
     # the number of active blocks is greater than the pool max capacity.
@@ -385,6 +446,7 @@ class BasePool(typing.Generic[C]):
 
         self._blocks = collections.OrderedDict()
         self._is_starving = False
+        self._policies = {}
 
         self._failed_connects = 0
         self._failed_disconnects = 0
@@ -397,6 +459,33 @@ class BasePool(typing.Generic[C]):
     def max_capacity(self) -> int:
         return self._max_capacity
 
+    def set_policy(
+        self,
+        dbname: str,
+        *,
+        weight: float = 1.0,
+        reserved: int = 0,
+    ) -> None:
+        """Set how connections to *dbname* are balanced with other databases.
+
+        When the pool runs at capacity, connections are distributed among
+        the databases in proportion to their demand multiplied by their
+        *weight*, and a database with demand is given at least *reserved*
+        connections.
+        """
+        if weight <= 0:
+            raise ValueError('weight must be positive')
+        if reserved < 0:
+            raise ValueError('reserved must not be negative')
+        policy = BlockPolicy(weight=weight, reserved=reserved)
+        if policy == DEFAULT_POLICY:
+            self._policies.pop(dbname, None)
+        else:
+            self._policies[dbname] = policy
+        block = self._blocks.get(dbname)
+        if block is not None:
+            block.policy = policy
+
     @property
     def current_capacity(self) -> int:
         return self._cur_capacity
@@ -473,6 +562,10 @@ class BasePool(typing.Generic[C]):
             return
         if now == 0:
             now = time.monotonic()
+        if self._current_snapshot is None:
+            # Connections can be opened before the first tick, e.g. by
+            # warm_up().
+            self._capture_snapshot(now=now)
         assert self._current_snapshot is not None
         self._current_snapshot.log.append(
             SnapshotLog(
@@ -483,11 +576,28 @@ class BasePool(typing.Generic[C]):
             )
         )
 
+    def report_stats(self) -> None:
+        """Report the current state of the pool to the stats collector.
+
+        Snapshots are otherwise only reported on ticks, which only run
+        under Mode C/D.
+        """
+        if self._stats_cb is None:
+            return
+        now = time.monotonic()
+        snapshot = self._build_snapshot(now=now)
+        if self._current_snapshot is not None:
+            snapshot.log.extend(self._current_snapshot.log)
+        self._current_snapshot = snapshot
+        self._report_snapshot()
+        self._capture_snapshot(now=now)
+
     def _new_block(self, dbname: str) -> Block[C]:
         assert dbname not in self._blocks
         block: Block[C] = Block(dbname, self._get_loop())
         self._blocks[dbname] = block
         block.quota = 1
+        block.policy = self._policies.get(dbname, DEFAULT_POLICY)
         if self._is_starving:
             self._blocks.move_to_end(dbname, last=False)
         return block
@@ -666,6 +776,8 @@ class Pool(BasePool[C]):
     _to_drop: typing.List[Block[C]]
     _gc_interval: float  # minimum seconds between GC runs
     _gc_requests: int  # number of GC requests
+    _predictive: bool
+    _hpredict: typing.Optional[asyncio.Handle]
 
     def __init__(
         self,
@@ -675,6 +787,7 @@ class Pool(BasePool[C]):
         max_capacity: int,
         stats_collector: typing.Optional[StatsCollector]=None,
         min_idle_time_before_gc: float = MIN_IDLE_TIME_BEFORE_GC,
+        predictive: bool = False,
     ) -> None:
         super().__init__(
             connect=connect,
@@ -693,11 +806,14 @@ class Pool(BasePool[C]):
         self._to_drop = []
         self._gc_interval = min_idle_time_before_gc
         self._gc_requests = 0
+        self._predictive = predictive
+        self._hpredict = None
 
     def _maybe_schedule_tick(self) -> None:
         if self._first_tick:
             self._first_tick = False
-            self._capture_snapshot(now=time.monotonic())
+            if self._current_snapshot is None:
+                self._capture_snapshot(now=time.monotonic())
 
         # Only schedule a tick under Mode C/D, and schedule at most one tick
         # at a time.
@@ -761,7 +877,8 @@ class Pool(BasePool[C]):
 
             demand = (
                 max(nwaiters_avg, nwaiters) *
-                max(block.querytime_avg.avg(), MIN_QUERY_TIME_THRESHOLD)
+                max(block.querytime_avg.avg(), MIN_QUERY_TIME_THRESHOLD) *
+                block.policy.weight
             )
             total_calibrated_demand += demand
             block._cached_calibrated_demand = demand
@@ -805,7 +922,14 @@ class Pool(BasePool[C]):
 
             for block in tuple(self._blocks.values()):
                 nconns = block.count_conns()
-                if nconns == 1:
+                if (
+                    block.policy.reserved and
+                    nconns and
+                    block._cached_calibrated_demand
+                ):
+                    # Reserved connections are kept out of the rotation.
+                    block.quota = min(nconns, block.policy.reserved)
+                elif nconns == 1:
                     if (
                         now - block.last_connect_timestamp <
                             max(self._conntime_avg.avg(),
@@ -869,8 +993,39 @@ class Pool(BasePool[C]):
                 self._log_to_snapshot(
                     dbname=block.dbname, event='set-quota', value=block.quota)
 
+            self._reserve_quota()
             self._maybe_rebalance()
 
+    def _reserve_quota(self) -> None:
+        # Raise the quota of the blocks that need connections up to their
+        # reservation, taking the difference from the blocks with the most
+        # quota above their own reservation (or above 1).
+        deficit = 0
+        for block in self._blocks.values():
+            reserved = block.policy.reserved
+            if (
+                reserved and
+                block.quota < reserved and
+                block._cached_calibrated_demand
+            ):
+                deficit += reserved - block.quota
+                block.quota = reserved
+                self._log_to_snapshot(
+                    dbname=block.dbname, event='set-quota', value=block.quota)
+
+        while deficit:
+            donor = max(
+                self._blocks.values(),
+                key=lambda b: b.quota - max(b.policy.reserved, 1),
+            )
+            if donor.quota <= max(donor.policy.reserved, 1):
+                # The reservations exceed the capacity.
+                break
+            donor.quota -= 1
+            deficit -= 1
+            self._log_to_snapshot(
+                dbname=donor.dbname, event='set-quota', value=donor.quota)
+
     def _maybe_rebalance(self) -> None:
         if self._is_starving:
             return
@@ -899,6 +1054,60 @@ class Pool(BasePool[C]):
                 reverse=True
             )
 
+    def _maybe_schedule_predict(self) -> None:
+        if self._predictive and self._hpredict is None:
+            self._hpredict = self._get_loop().call_later(
+                PREDICT_INTERVAL, self._predict)
+
+    def _predict(self) -> None:
+        # Predictive mode: open connections ahead of the expected load,
+        # so that bursts don't wait for new connections to be established.
+        # By Little's law, the number of connections a block is expected
+        # to use at a time is its acquire rate multiplied by the time a
+        # connection is held.  The prediction also keeps the GC from
+        # closing connections that are expected to be used again soon.
+        self._hpredict = None
+        active = False
+        for block in tuple(self._blocks.values()):
+            block.acquire_rate_avg.add(
+                block.acquires_since_sample / PREDICT_INTERVAL)
+            block.acquires_since_sample = 0
+            rate = block.acquire_rate_avg.avg()
+            if not rate:
+                block.predicted_conns = 0
+                continue
+            active = True
+            block.predicted_conns = math.ceil(
+                rate * max(block.querytime_avg.avg(), MIN_QUERY_TIME_THRESHOLD)
+            )
+            if self._is_starving:
+                # All connections are spoken for already.
+                continue
+            while (
+                block.count_conns() < block.predicted_conns and
+                self._cur_capacity < self._max_capacity
+            ):
+                self._schedule_new_conn(block, 'pre-connected')
+
+        if active:
+            # Keep sampling until the pool has been idle for the whole
+            # history; the next acquire() will restart it otherwise.
+            self._maybe_schedule_predict()
+
+    def warm_up(self, dbname: str, nconns: int) -> None:
+        """Open up to *nconns* connections to *dbname* ahead of demand.
+
+        The connections are established in the background, within the
+        max capacity of the pool, and stay idle until they are acquired
+        or garbage collected.
+        """
+        block = self._get_block(dbname)
+        while (
+            block.count_conns() < nconns and
+            self._cur_capacity < self._max_capacity
+        ):
+            self._schedule_new_conn(block, 'warmed up')
+
     def _should_free_conn(self, from_block: Block[C]) -> bool:
         # First, if we only manage one connection to one PostgreSQL DB --
         # we don't need to bother with rebalancing the pool. So we bail out.
@@ -919,6 +1128,14 @@ class Pool(BasePool[C]):
         if not self._is_starving and from_block_size <= from_block.quota:
             return False
 
+        # We also bail out if the `from_block` block is within its
+        # reservation and has been in need of connections lately.
+        if (
+            from_block_size <= from_block.policy.reserved and
+            from_block.nwaiters_avg.avg()
+        ):
+            return False
+
         # Third, we bail out if:
         #
         # * the pool is starving;
@@ -1017,8 +1234,8 @@ class Pool(BasePool[C]):
             return 'first-conn', to_block
 
         # Find if there are blocks without a single connection.
-        # Find the one that is starving the most.
-        max_need = 0
+        # Find the one that is starving the most, by weighted demand.
+        max_need: float = 0
         for block in self._blocks.values():
             block_size = block.count_conns()
             block_demand = block.count_waiters()
@@ -1026,8 +1243,9 @@ class Pool(BasePool[C]):
             if block_size or not block_demand:
                 continue
 
-            if block_demand > max_need:
-                max_need = block_demand
+            need = block_demand * block.policy.weight
+            if need > max_need:
+                max_need = need
                 to_block = block
 
         if to_block is not None:
@@ -1040,7 +1258,7 @@ class Pool(BasePool[C]):
             block_size = block.count_conns()
             block_quota = block.quota
             if block_quota > block_size:
-                need = block_quota - block_size
+                need = (block_quota - block_size) * block.policy.weight
                 if need > max_need:
                     max_need = need
                     to_block = block
@@ -1050,7 +1268,11 @@ class Pool(BasePool[C]):
 
         return None, None
 
-    async def _acquire(self, dbname: str) -> C:
+    async def _acquire(
+        self,
+        dbname: str,
+        prefer: typing.Optional[ConnectionPreference[C]],
+    ) -> C:
         block = self._get_block(dbname)
 
         room_for_new_conns = self._cur_capacity < self._max_capacity
@@ -1078,7 +1300,7 @@ class Pool(BasePool[C]):
                 # Block has no connections at all, or not enough connections.
                 self._schedule_new_conn(block)
 
-            return await block.acquire()
+            return await block.acquire(prefer)
 
         if not block_nconns:
             # This is a block without any connections.
@@ -1086,15 +1308,15 @@ class Pool(BasePool[C]):
             # reallocated for this block.
             if not self._try_steal_conn(block):
                 self._new_blocks_waitlist[block] = True
-            return await block.acquire()
+            return await block.acquire(prefer)
 
         if block_nconns < block.quota:
             # Let's see if we can steal a connection from some block
             # that's over quota and open a new one.
             self._try_steal_conn(block)
-            return await block.acquire()
+            return await block.acquire(prefer)
 
-        return await block.acquire()
+        return await block.acquire(prefer)
 
     def _run_gc(self) -> None:
         loop = self._get_loop()
@@ -1118,14 +1340,33 @@ class Pool(BasePool[C]):
         # within 1-2 GC intervals.
         only_older_than = time.monotonic() - self._gc_interval
         for block in self._blocks.values():
-            while (conn := block.try_steal(only_older_than)) is not None:
+            # Keep the connections the predictive mode expects to be used.
+            nconns = block.count_conns()
+            while (
+                nconns > block.predicted_conns and
+                (conn := block.try_steal(only_older_than)) is not None
+            ):
                 self._schedule_discard(block, conn)
+                nconns -= 1
 
-    async def acquire(self, dbname: str) -> C:
+    async def acquire(
+        self,
+        dbname: str,
+        *,
+        prefer: typing.Optional[ConnectionPreference[C]] = None,
+    ) -> C:
+        """Acquire a connection to the *dbname* database.
+
+        If *prefer* is given, it scores idle connections, and the one
+        with the highest positive score among the most recently used
+        ones is handed out.  Otherwise, or if no connection scores above
+        zero, the most recently used connection is.
+        """
         self._nacquires += 1
         self._maybe_schedule_tick()
+        self._maybe_schedule_predict()
         try:
-            conn = await self._acquire(dbname)
+            conn = await self._acquire(dbname, prefer)
         finally:
             self._nacquires -= 1
 
@@ -68,6 +68,10 @@ cdef class DatabaseIndex:
         object _factory
         object _default_sysconfig
         object _sys_config_spec
+        object _shared_eql_to_compiled
+        object _query_cache_weight
+
+    cdef _enforce_query_cache_budget(self)
 
 
 cdef class Database:
@@ -75,11 +79,15 @@ cdef class Database:
     cdef:
         object _eql_to_compiled
         object _sql_to_compiled
+        bint _eql_cache_persisted
+        object _schema_fingerprint
+        bint _schema_fingerprint_valid
         DatabaseIndex _index
         object _views
         object _introspection_lock
         object _state_serializers
         object _user_config_spec
+        object _query_cache_weight
 
         readonly str name
         readonly object dbver
@@ -93,8 +101,14 @@ cdef class Database:
     cdef get_user_config_spec(self)
 
     cdef _invalidate_caches(self)
+    cdef _invalidate_dependent_queries(self, old_dbver, affected)
     cdef _clear_state_serializers(self)
     cdef _cache_compiled_query(self, key, query_unit)
+    cdef evict_query_cache_entry(self)
+    cdef _update_query_cache_weight(self)
+    cdef _query_cache_changed(self)
+    cdef _lookup_shared_compiled_query(self, key)
+    cdef _get_schema_fingerprint(self)
     cdef _new_view(self, query_cache, protocol_version)
     cdef _remove_view(self, view)
     cdef _update_backend_ids(self, new_types)
@@ -37,7 +37,7 @@ from edb.common import lru, uuidgen
 from edb import edgeql
 from edb.edgeql import qltypes
 from edb.schema import schema as s_schema
-from edb.server import compiler, defines, config, metrics
+from edb.server import compiler, defines, config, metrics, query_cache
 from edb.server.compiler import dbstate, enums, sertypes
 from edb.pgsql import dbops
 
@@ -71,6 +71,50 @@ cdef next_dbver():
     return VER_COUNTER
 
 
+def _weigh_compiled_query(entry):
+    query_unit_group, _ = entry
+    return query_unit_group.get_size()
+
+
+def _weigh_compiled_sql(entry):
+    sql_units, _ = entry
+    return sum(len(u.query) + len(u.orig_query) for u in sql_units)
+
+
+def _get_sql_schema_deps(sql_units):
+    deps = frozenset()
+    for unit in sql_units:
+        if unit.schema_deps is None:
+            return None
+        deps |= unit.schema_deps
+    return deps
+
+
+def _retag_compiled(cache, old_dbver, new_dbver, affected, get_deps):
+    for key, (compiled, dbver) in list(cache.items()):
+        deps = get_deps(compiled) if dbver == old_dbver else None
+        if deps is None or not deps.isdisjoint(affected):
+            del cache[key]
+        else:
+            cache.replace(key, (compiled, new_dbver))
+
+
+def _on_compiled_query_evicted(key, entry):
+    metrics.query_cache_evictions.inc(1.0, 'edgeql')
+
+
+def _on_compiled_sql_evicted(key, entry):
+    metrics.query_cache_evictions.inc(1.0, 'sql')
+
+
+def _weigh_shared_compiled_query(query_unit_group):
+    return query_unit_group.get_size()
+
+
+def _on_shared_compiled_query_evicted(key, query_unit_group):
+    metrics.query_cache_evictions.inc(1.0, 'edgeql_shared')
+
+
 @cython.final
 cdef class QueryRequestInfo:
 
@@ -127,6 +171,53 @@ cdef class QueryRequestInfo:
             self.inline_objectids == other.inline_objectids
         )
 
+    def __reduce__(self):
+        # Sources hold parser tokens that cannot be pickled, so
+        # the source is re-created from its text on unpickling.
+        return (
+            _restore_query_request_info,
+            (
+                type(self.source),
+                self.source.text(),
+                self.protocol_version,
+                self.output_format,
+                self.input_format,
+                self.expect_one,
+                self.implicit_limit,
+                self.inline_typeids,
+                self.inline_typenames,
+                self.inline_objectids,
+                self.allow_capabilities,
+            ),
+        )
+
+
+def _restore_query_request_info(
+    source_cls,
+    text,
+    protocol_version,
+    output_format,
+    input_format,
+    expect_one,
+    implicit_limit,
+    inline_typeids,
+    inline_typenames,
+    inline_objectids,
+    allow_capabilities,
+):
+    return QueryRequestInfo(
+        source_cls.from_string(text),
+        protocol_version,
+        output_format=output_format,
+        input_format=input_format,
+        expect_one=expect_one,
+        implicit_limit=implicit_limit,
+        inline_typeids=inline_typeids,
+        inline_typenames=inline_typenames,
+        inline_objectids=inline_objectids,
+        allow_capabilities=allow_capabilities,
+    )
+
 
 @cython.final
 cdef class CompiledQuery:
@@ -171,9 +262,23 @@ cdef class Database:
         self._introspection_lock = asyncio.Lock()
 
         self._eql_to_compiled = lru.LRUMapping(
-            maxsize=defines._MAX_QUERIES_CACHE)
+            maxsize=defines._MAX_QUERIES_CACHE,
+            maxweight=query_cache.QUERY_CACHE_DB_MAX_BYTES,
+            weigher=_weigh_compiled_query,
+            on_evict=_on_compiled_query_evicted,
+        )
         self._sql_to_compiled = lru.LRUMapping(
-            maxsize=defines._MAX_QUERIES_CACHE)
+            maxsize=defines._MAX_QUERIES_CACHE,
+            maxweight=query_cache.QUERY_CACHE_DB_MAX_BYTES,
+            weigher=_weigh_compiled_sql,
+            on_evict=_on_compiled_sql_evicted,
+        )
+        self._eql_cache_persisted = True
+        # The weight of the caches as last added to the total of the
+        # index, see _update_query_cache_weight().
+        self._query_cache_weight = 0
+        self._schema_fingerprint = None
+        self._schema_fingerprint_valid = False
 
         self.db_config = db_config
         self.user_schema = user_schema
@@ -204,6 +309,20 @@ cdef class Database:
         if new_schema is None:
             raise AssertionError('new_schema is not supposed to be None')
 
+        affected = None
+        if (
+            self.user_schema is not None
+            and extensions == self.extensions
+            and (db_config is None or db_config == self.db_config)
+        ):
+            affected = query_cache.get_affected_objects(
+                self.user_schema,
+                new_schema,
+                self._index._std_schema,
+                self._index._global_schema,
+            )
+
+        old_dbver = self.dbver
         self.dbver = next_dbver()
 
         self.user_schema = new_schema
@@ -215,7 +334,10 @@ cdef class Database:
             self.reflection_cache = reflection_cache
         if db_config is not None:
             self.db_config = db_config
-        self._invalidate_caches()
+        if affected is None:
+            self._invalidate_caches()
+        else:
+            self._invalidate_dependent_queries(old_dbver, affected)
 
     cdef get_user_config_spec(self):
         if self._user_config_spec is None:
@@ -231,9 +353,30 @@ cdef class Database:
     cdef _invalidate_caches(self):
         self._eql_to_compiled.clear()
         self._sql_to_compiled.clear()
+        self._update_query_cache_weight()
+        self._eql_cache_persisted = False
+        self._schema_fingerprint = None
+        self._schema_fingerprint_valid = False
         # XXX: FIXME: Only invalidate when spec actually changes?
         self._user_config_spec = None
 
+    cdef _invalidate_dependent_queries(self, old_dbver, affected):
+        # Compiled queries that do not depend on any of the *affected*
+        # schema objects stay valid for the new dbver.
+        _retag_compiled(
+            self._eql_to_compiled, old_dbver, self.dbver, affected,
+            lambda compiled: compiled.schema_deps,
+        )
+        _retag_compiled(
+            self._sql_to_compiled, old_dbver, self.dbver, affected,
+            _get_sql_schema_deps,
+        )
+        self._update_query_cache_weight()
+        self._eql_cache_persisted = False
+        self._schema_fingerprint = None
+        self._schema_fingerprint_valid = False
+        self._user_config_spec = None
+
     cdef _clear_state_serializers(self):
         self._state_serializers.clear()
 
@@ -246,6 +389,74 @@ cdef class Database:
             return
 
         self._eql_to_compiled[key] = compiled, self.dbver
+        self._eql_cache_persisted = False
+        self._query_cache_changed()
+
+        shared = self._index._shared_eql_to_compiled
+        if shared is not None:
+            fingerprint = self._get_schema_fingerprint()
+            if fingerprint is not None:
+                shared[fingerprint, key] = compiled
+
+    cdef _lookup_shared_compiled_query(self, key):
+        # Queries compiled by other databases with the same schema
+        # fingerprint are just as valid for this one.
+        shared = self._index._shared_eql_to_compiled
+        if shared is None:
+            return None
+        fingerprint = self._get_schema_fingerprint()
+        if fingerprint is None:
+            return None
+        compiled = shared.get((fingerprint, key))
+        if compiled is not None:
+            self._eql_to_compiled[key] = compiled, self.dbver
+            self._eql_cache_persisted = False
+            self._query_cache_changed()
+        return compiled
+
+    cdef _get_schema_fingerprint(self):
+        # Computed lazily, as only databases that actually compile
+        # queries need it.
+        if not self._schema_fingerprint_valid:
+            self._schema_fingerprint = query_cache.get_schema_fingerprint(
+                self.user_schema, self.db_config)
+            self._schema_fingerprint_valid = True
+        return self._schema_fingerprint
+
+    def get_persistable_query_cache(self):
+        # Only entries compiled against the current schema are worth
+        # persisting; returns None if nothing changed since last time.
+        if self._eql_cache_persisted:
+            return None
+        self._eql_cache_persisted = True
+        return [
+            (key, compiled)
+            for key, (compiled, dbver) in self._eql_to_compiled.items()
+            if dbver == self.dbver
+        ]
+
+    def mark_query_cache_unpersisted(self):
+        # Called when persisting the entries returned by
+        # get_persistable_query_cache() failed, so that it is retried.
+        self._eql_cache_persisted = False
+
+    def get_recent_queries(self, limit):
+        # The keys of the most recently used entries of the compiled
+        # query cache, most recent first, as (QueryRequestInfo,
+        # modaliases, session config) tuples.
+        rv = []
+        for key, (_, dbver) in reversed(self._eql_to_compiled.items()):
+            if len(rv) >= limit:
+                break
+            if dbver == self.dbver:
+                rv.append(key)
+        return rv
+
+    def warm_up_query_cache(self, entries):
+        for key, compiled in entries:
+            if key not in self._eql_to_compiled:
+                self._eql_to_compiled[key] = compiled, self.dbver
+        self._query_cache_changed()
 
     def cache_compiled_sql(self, key, compiled: list[str]):
         existing, dbver = self._sql_to_compiled.get(key, DICTDEFAULT)
@@ -254,13 +465,42 @@ cdef class Database:
             return
 
         self._sql_to_compiled[key] = compiled, self.dbver
+        self._query_cache_changed()
 
     def lookup_compiled_sql(self, key):
         rv, cached_dbver = self._sql_to_compiled.get(key, DICTDEFAULT)
         if rv is not None and cached_dbver != self.dbver:
             rv = None
+        if rv is None:
+            metrics.query_cache_misses.inc(1.0, 'sql')
+        else:
+            metrics.query_cache_hits.inc(1.0, 'sql')
         return rv
 
+    def get_query_cache_weight(self):
+        return self._eql_to_compiled.weight + self._sql_to_compiled.weight
+
+    cdef evict_query_cache_entry(self):
+        # Evict the least recently used entry from the heavier of the
+        # two caches; returns False if both are empty.
+        if self._eql_to_compiled.weight >= self._sql_to_compiled.weight:
+            cache = self._eql_to_compiled
+        else:
+            cache = self._sql_to_compiled
+        if not cache:
+            return False
+        cache.evict()
+        return True
+
+    cdef _update_query_cache_weight(self):
+        weight = self.get_query_cache_weight()
+        self._index._query_cache_weight += weight - self._query_cache_weight
+        self._query_cache_weight = weight
+
+    cdef _query_cache_changed(self):
+        self._update_query_cache_weight()
+        self._index._enforce_query_cache_budget()
+
     cdef _new_view(self, query_cache, protocol_version):
         view = DatabaseConnectionView(
             self, query_cache=query_cache, protocol_version=protocol_version
@@ -790,6 +1030,15 @@ cdef class DatabaseConnectionView:
             if query_unit_group is not None and qu_dbver != self._db.dbver:
                 query_unit_group = None
 
+            if query_unit_group is not None:
+                metrics.query_cache_hits.inc(1.0, 'edgeql')
+            else:
+                query_unit_group = self._db._lookup_shared_compiled_query(key)
+                if query_unit_group is not None:
+                    metrics.query_cache_hits.inc(1.0, 'edgeql_shared')
+                else:
+                    metrics.query_cache_misses.inc(1.0, 'edgeql')
+
         return query_unit_group
 
     cdef tx_error(self):
@@ -1184,12 +1433,56 @@ cdef class DatabaseIndex:
         self._global_schema = global_schema
         self._default_sysconfig = default_sysconfig
         self._sys_config_spec = sys_config_spec
+        # The total weight of the query caches of all databases.
+        self._query_cache_weight = 0
         # TODO: This factory will probably need to become per-db once
         # config spec differs between databases.
         self._factory = sertypes.StateSerializerFactory(
             std_schema, sys_config_spec)
         self.update_sys_config(sys_config)
 
+        if query_cache.SHARED_QUERY_CACHE_SIZE > 0:
+            self._shared_eql_to_compiled = lru.LRUMapping(
+                maxsize=query_cache.SHARED_QUERY_CACHE_SIZE,
+                maxweight=query_cache.SHARED_QUERY_CACHE_MAX_BYTES,
+                weigher=_weigh_shared_compiled_query,
+                on_evict=_on_shared_compiled_query_evicted,
+            )
+        else:
+            self._shared_eql_to_compiled = None
+
+    cdef _enforce_query_cache_budget(self):
+        cdef Database db, heaviest
+
+        budget = query_cache.QUERY_CACHE_TENANT_MAX_BYTES
+        if budget is None:
+            return
+
+        while self._query_cache_weight > budget:
+            # Evict from the database taking the most memory, so that
+            # a single busy database does not flush the caches of all
+            # the others, until it is no longer the heaviest.
+            heaviest = None
+            next_weight = 0
+            for db in self._dbs.values():
+                if heaviest is None:
+                    heaviest = db
+                elif db._query_cache_weight > heaviest._query_cache_weight:
+                    next_weight = heaviest._query_cache_weight
+                    heaviest = db
+                elif db._query_cache_weight > next_weight:
+                    next_weight = db._query_cache_weight
+            if heaviest is None:
+                break
+            db = heaviest
+            while (
+                self._query_cache_weight > budget
+                and db._query_cache_weight >= next_weight
+            ):
+                if not db.evict_query_cache_entry():
+                    return
+                db._update_query_cache_weight()
+
     def count_connections(self, dbname: str):
         try:
             db = self._dbs[dbname]
@@ -1230,6 +1523,8 @@ cdef class DatabaseIndex:
 
     def update_global_schema(self, global_schema):
         self._global_schema = global_schema
+        if self._shared_eql_to_compiled is not None:
+            self._shared_eql_to_compiled.clear()
 
     def register_db(
         self,
@@ -1267,7 +1562,8 @@ cdef class DatabaseIndex:
             self._dbs[dbname] = db
 
     def unregister_db(self, dbname):
-        self._dbs.pop(dbname)
+        cdef Database db = self._dbs.pop(dbname)
+        self._query_cache_weight -= db._query_cache_weight
 
     def iter_dbs(self):
         return iter(self._dbs.values())
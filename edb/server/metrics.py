@@ -32,6 +32,18 @@ current_compiler_processes = registry.new_gauge(
     'Current number of active compiler processes.'
 )
 
+compiler_pool_queue_wait_duration = registry.new_histogram(
+    'compiler_pool_queue_wait_duration',
+    'Time compile requests wait for a free compiler process.',
+    unit=prom.Unit.SECONDS,
+)
+
+compiler_pool_request_duration = registry.new_histogram(
+    'compiler_pool_request_duration',
+    'Time a compiler process is busy serving a compile request.',
+    unit=prom.Unit.SECONDS,
+)
+
 total_backend_connections = registry.new_counter(
     'backend_connections_total',
     'Total number of backend connections established.'
@@ -59,12 +71,103 @@ backend_connection_aborted = registry.new_labeled_counter(
     labels=('pgcode',)
 )
 
+backend_prepared_statements = registry.new_labeled_counter(
+    'backend_prepared_statements_total',
+    'Number of prepared statement lookups on backend connections.',
+    labels=('result',)
+)
+
+backend_connection_affinity = registry.new_labeled_counter(
+    'backend_connection_affinity_total',
+    'Number of backend connection acquisitions preferring a connection '
+    'with the query prepared.',
+    labels=('result',)
+)
+
+backend_state_affinity = registry.new_labeled_counter(
+    'backend_connection_state_affinity_total',
+    'Number of backend connection acquisitions preferring a connection '
+    'with the session state in effect.',
+    labels=('result',)
+)
+
+backend_connection_pipelining = registry.new_labeled_counter(
+    'backend_connection_pipelining_total',
+    'Number of pipelined queries, by whether they shared a backend '
+    'connection with other queries or acquired one.',
+    labels=('result',)
+)
+
 backend_query_duration = registry.new_histogram(
     'backend_query_duration',
     'Time it takes to run a query on a backend connection.',
     unit=prom.Unit.SECONDS,
 )
 
+read_replica_healthy = registry.new_labeled_gauge(
+    'read_replica_healthy',
+    'Whether a read replica is reachable and within the allowed lag.',
+    labels=('replica',)
+)
+
+read_replica_lag = registry.new_labeled_gauge(
+    'read_replica_lag',
+    'Replication lag of a read replica.',
+    unit=prom.Unit.SECONDS,
+    labels=('replica',)
+)
+
+read_replica_queries = registry.new_labeled_counter(
+    'read_replica_queries_total',
+    'Number of read-only queries run on a read replica.',
+    labels=('replica',)
+)
+
+read_replica_fallbacks = registry.new_labeled_counter(
+    'read_replica_fallbacks_total',
+    'Number of read-only queries run on the primary instead of a replica.',
+    labels=('reason',)
+)
+
+backend_connection_acquire_wait_duration = registry.new_labeled_histogram(
+    'backend_connection_acquire_wait_duration',
+    'Time it takes to acquire a backend connection from the pool.',
+    unit=prom.Unit.SECONDS,
+    labels=('tenant', 'database'),
+)
+
+backend_pool_capacity = registry.new_labeled_gauge(
+    'backend_pool_capacity',
+    'Number of connections in the backend connection pool, '
+    'including pending ones.',
+    labels=('tenant',)
+)
+
+backend_pool_connections = registry.new_labeled_gauge(
+    'backend_pool_connections',
+    'Number of pooled backend connections to a database, '
+    'including pending ones.',
+    labels=('tenant', 'database')
+)
+
+backend_pool_quota = registry.new_labeled_gauge(
+    'backend_pool_quota',
+    'Number of backend connections the pool allots to a database.',
+    labels=('tenant', 'database')
+)
+
+backend_pool_waiters = registry.new_labeled_gauge(
+    'backend_pool_waiters',
+    'Number of tasks waiting for a backend connection to a database.',
+    labels=('tenant', 'database')
+)
+
+backend_pool_events = registry.new_labeled_counter(
+    'backend_pool_events_total',
+    'Number of connection events in the backend connection pool.',
+    labels=('tenant', 'database', 'event')
+)
+
 total_client_connections = registry.new_counter(
     'client_connections_total',
     'Total number of clients.'
@@ -92,6 +195,24 @@ edgeql_query_compilation_duration = registry.new_histogram(
     unit=prom.Unit.SECONDS,
 )
 
+query_cache_hits = registry.new_labeled_counter(
+    'query_cache_hits_total',
+    'Number of compiled query cache hits.',
+    labels=('cache',)
+)
+
+query_cache_misses = registry.new_labeled_counter(
+    'query_cache_misses_total',
+    'Number of compiled query cache misses.',
+    labels=('cache',)
+)
+
+query_cache_evictions = registry.new_labeled_counter(
+    'query_cache_evictions_total',
+    'Number of entries evicted from compiled query caches.',
+    labels=('cache',)
+)
+
 background_errors = registry.new_labeled_counter(
     'background_errors_total',
     'Number of unhandled errors in background server routines.',
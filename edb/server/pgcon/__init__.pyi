@@ -56,6 +56,7 @@ async def connect(
     dbname: str,
     backend_params: pg_params.BackendRuntimeParams,
     apply_init_script: bool = True,
+    hot_standby: bool = False,
 ) -> PGConnection:
     ...
 
@@ -114,6 +115,12 @@ class PGConnection:
     def set_stmt_cache_size(self, size: int) -> None:
         ...
 
+    def has_prepared_stmt(self, stmt_name: bytes, dbver: int) -> bool:
+        ...
+
+    def has_state(self, state: bytes) -> bool:
+        ...
+
     def set_server(self, server: object) -> None:
         ...
 
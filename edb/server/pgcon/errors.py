@@ -72,6 +72,9 @@ ERROR_SYNTAX_ERROR = '42601'
 ERROR_DUPLICATE_CURSOR = '42P03'
 ERROR_DUPLICATE_PREPARED_STATEMENT = '42P05'
 ERROR_INVALID_COLUMN_REFERENCE = '42P10'
+ERROR_UNDEFINED_COLUMN = '42703'
+ERROR_UNDEFINED_FUNCTION = '42883'
+ERROR_UNDEFINED_OBJECT = '42704'
 
 ERROR_PROGRAM_LIMIT_EXCEEDED = '54000'
 
@@ -140,6 +140,9 @@ cdef class PGConnection:
 
         object last_state
 
+        readonly int pipeline_depth
+        object pipeline_waiters
+
     cdef before_command(self)
 
     cdef write(self, buf)
@@ -186,3 +189,5 @@ cdef class PGConnection:
     cdef _rewrite_sql_error_response(self, PGMessage action, WriteBuffer buf)
 
     cpdef set_stmt_cache_size(self, int maxsize)
+    cpdef bint has_prepared_stmt(self, bytes stmt_name, int dbver)
+    cpdef bint has_state(self, bytes state)
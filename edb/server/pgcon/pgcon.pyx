@@ -30,6 +30,7 @@ import codecs
 import hashlib
 import json
 import logging
+import os
 import os.path
 import socket
 import ssl as ssl_mod
@@ -89,7 +90,6 @@ from . import errors as pgerror
 include "scram.pyx"
 
 DEF DATA_BUFFER_SIZE = 100_000
-DEF PREP_STMTS_CACHE = 100
 DEF TCP_KEEPIDLE = 24
 DEF TCP_KEEPINTVL = 2
 DEF TCP_KEEPCNT = 3
@@ -111,6 +111,16 @@ cdef object EMPTY_SQL_STATE = b"{}"
 
 cdef object logger = logging.getLogger('edb.server')
 
+# The maximum number of prepared statements kept by a backend connection.
+cdef int PREP_STMTS_CACHE = max(1, int(os.getenv(
+    'EDGEDB_SERVER_PG_PREPARED_STATEMENTS_CACHE_SIZE', 100)))
+
+# When positive, the results of single-statement queries are fetched from
+# Postgres in batches of this many rows as the client takes them, instead
+# of all at once; see _parse_execute().
+cdef int32_t PG_FETCH_SIZE = max(0, int(os.getenv(
+    'EDGEDB_SERVER_PG_FETCH_SIZE', 0)))
+
 # The '_edgecon_state table' is used to store information about
 # the current session. The `type` column is one character, with one
 # of the following values:
@@ -121,6 +131,7 @@ cdef object logger = logging.getLogger('edb.server')
 #   a corresponding Postgres config setting.
 # * 'A': an instance-level config setting from command-line arguments
 # * 'E': an instance-level config setting from environment variable
+
 SETUP_TEMP_TABLE_SCRIPT = '''
         CREATE TEMPORARY TABLE _edgecon_state (
             name text NOT NULL,
@@ -319,6 +330,7 @@ async def connect(
     dbname: str,
     backend_params: pg_params.BackendRuntimeParams,
     apply_init_script: bool = True,
+    hot_standby: bool = False,
 ):
     global INIT_CON_SCRIPT
 
@@ -353,7 +365,7 @@ async def connect(
             # support only SET ROLE)
             await pgcon.sql_execute(f'SET ROLE {pg_qi(sup_role)}'.encode())
 
-    if 'in_hot_standby' in pgcon.parameter_status:
+    if not hot_standby and 'in_hot_standby' in pgcon.parameter_status:
         # in_hot_standby is always present in Postgres 14 and above
         if pgcon.parameter_status['in_hot_standby'] == 'on':
             # Abort if we're connecting to a hot standby
@@ -552,6 +564,12 @@ cdef class PGConnection:
         self.parameter_status = dict()
 
         self.last_parse_prep_stmts = []
+
+        # Requests written to a connection shared by several clients
+        # (see pipelined_parse_execute) that are yet to be read, and
+        # the read turns of all but the first of them.
+        self.pipeline_depth = 0
+        self.pipeline_waiters = deque()
         self.debug = debug.flags.server_proto
 
         self.log_listeners = []
@@ -578,6 +596,14 @@ cdef class PGConnection:
     cpdef set_stmt_cache_size(self, int maxsize):
         self.prep_stmts.resize(maxsize)
 
+    cpdef bint has_prepared_stmt(self, bytes stmt_name, int dbver):
+        return self.prep_stmts.peek(stmt_name, None) == dbver
+
+    cpdef bint has_state(self, bytes state):
+        # Whether the serialized session state *state* is in effect, i.e.
+        # running a query with it doesn't need to restore it first.
+        return self.last_state is not None and self.last_state == state
+
     @property
     def is_ssl(self):
         return self._is_ssl
@@ -751,11 +777,13 @@ cdef class PGConnection:
                 parse = 0
             else:
                 if self.debug:
-                    self.debug_print(f"discarding ps {stmt_name_to_clean!r}")
+                    self.debug_print(f"discarding ps {stmt_name!r}")
                 outbuf.write_buffer(
                     self.make_clean_stmt_message(stmt_name))
                 del self.prep_stmts[stmt_name]
 
+        metrics.backend_prepared_statements.inc(
+            1.0, 'parse' if parse else 'reuse')
         return parse
 
     cdef write_sync(self, WriteBuffer outbuf):
@@ -1101,7 +1129,15 @@ cdef class PGConnection:
         bint use_prep_stmt,
         bytes state,
         int dbver,
+        object read_turn = None,
+        int32_t fetch_size = 0,
     ):
+        # With a *fetch_size*, the rows are fetched from the portal in
+        # batches of that many rows, and the Sync that ends the implicit
+        # transaction, and with it the portal, is only sent once all the
+        # rows are fetched.  Either way, reading from Postgres is paused
+        # while the client cannot keep up with the rows written to it,
+        # unless the connection is shared by pipelined requests.
         cdef:
             WriteBuffer out
             WriteBuffer buf
@@ -1111,6 +1147,7 @@ cdef class PGConnection:
 
             bint parse = 1
             bint state_sync = 0
+            bint synced = 0
 
             bint has_result = query.cardinality is not CARD_NO_RESULT
             bint discard_result = (
@@ -1206,6 +1243,15 @@ cdef class PGConnection:
                 out.write_buffer(buf.end_message())
 
         assert bind_data is not None
+        if (
+            (stmt_name == b'' and msgs_num > 1)
+            or not has_result
+            or discard_result
+            or fe_conn is None
+            or query.append_rollback
+        ):
+            # Only the rows sent to the client are fetched in batches.
+            fetch_size = 0
         if stmt_name == b'' and msgs_num > 1:
             for s in self.last_parse_prep_stmts:
                 buf = WriteBuffer.new_message(b'B')
@@ -1227,7 +1273,7 @@ cdef class PGConnection:
 
             buf = WriteBuffer.new_message(b'E')
             buf.write_bytestring(b'')  # portal name
-            buf.write_int32(0)  # limit: 0 - return all rows
+            buf.write_int32(fetch_size)  # limit: 0 - return all rows
             out.write_buffer(buf.end_message())
 
         if query.append_rollback:
@@ -1255,9 +1301,19 @@ cdef class PGConnection:
             buf.write_int32(0)  # limit: 0 - return all rows
             out.write_buffer(buf.end_message())
 
-        self.write_sync(out)
+        if fetch_size:
+            buf = WriteBuffer.new_message(b'H')
+            out.write_buffer(buf.end_message())
+        else:
+            self.write_sync(out)
+            synced = 1
         self.write(out)
 
+        if read_turn is not None:
+            # The responses to the pipelined requests written before
+            # this one come first.
+            await read_turn
+
         result = None
 
         try:
@@ -1306,6 +1362,7 @@ cdef class PGConnection:
                             if buf.len() >= DATA_BUFFER_SIZE:
                                 fe_conn.write(buf)
                                 buf = None
+                                await self._wait_for_frontend(fe_conn)
 
                     elif mtype == b'C':  ## result
                         # CommandComplete
@@ -1334,7 +1391,24 @@ cdef class PGConnection:
                     elif mtype == b's':  ## result
                         # PortalSuspended
                         self.buffer.discard_message()
-                        break
+                        if not fetch_size:
+                            break
+                        # Pass the batch on and fetch the next one once
+                        # the client has taken it.
+                        if buf is not None:
+                            fe_conn.write(buf)
+                            buf = None
+                        fe_conn.flush()
+                        await self._wait_for_frontend(fe_conn)
+                        out = WriteBuffer.new()
+                        buf = WriteBuffer.new_message(b'E')
+                        buf.write_bytestring(b'')  # portal name
+                        buf.write_int32(fetch_size)
+                        out.write_buffer(buf.end_message())
+                        buf = WriteBuffer.new_message(b'H')
+                        out.write_buffer(buf.end_message())
+                        self.write(out)
+                        buf = None
 
                     elif mtype == b'2':
                         # BindComplete
@@ -1355,10 +1429,38 @@ cdef class PGConnection:
                 finally:
                     self.buffer.finish_message()
         finally:
+            if not synced and self.transport is not None:
+                # Also closes the portal if the rows were not all fetched.
+                out = WriteBuffer.new()
+                self.write_sync(out)
+                self.write(out)
             await self.wait_for_sync()
 
         return result
 
+    async def _wait_for_frontend(
+        self, frontend.AbstractFrontendConnection fe_conn
+    ):
+        waiter = fe_conn.get_write_waiter()
+        if waiter is None or self.transport is None:
+            return
+        if self.pipeline_depth:
+            # The connection is shared by pipelined requests: pausing it
+            # for one slow client would stall all the others, so their
+            # rows are kept in memory instead.  Only queries returning
+            # a bounded number of rows are pipelined, see
+            # execute.has_bounded_result().
+            return
+        # Stop reading so that the rows queue up in Postgres rather than
+        # in memory here.
+        self.transport.pause_reading()
+        try:
+            if not await waiter:
+                raise ConnectionAbortedError
+        finally:
+            if self.transport is not None:
+                self.transport.resume_reading()
+
     async def parse_execute(
         self,
         *,
@@ -1379,11 +1481,73 @@ cdef class PGConnection:
                 use_prep_stmt,
                 state,
                 dbver,
+                fetch_size=PG_FETCH_SIZE,
             )
         finally:
             metrics.backend_query_duration.observe(time.monotonic() - started_at)
             await self.after_command()
 
+    async def pipelined_parse_execute(
+        self,
+        *,
+        query,
+        WriteBuffer bind_data,
+        frontend.AbstractFrontendConnection fe_conn,
+        bytes state,
+        int dbver = 0,
+    ):
+        """Run a query on a connection shared by several clients.
+
+        The request is written right away, after the ones already in
+        flight, and its responses are read after theirs.  Each request
+        restores its own *state* and ends with its own Sync, so an error
+        only fails the request that caused it.  Only single-statement
+        queries in implicit transactions can be pipelined, and they are
+        parsed as unnamed statements.
+
+        Once called, this must not be cancelled: the responses to the
+        request would then be read by the next one.
+        """
+        cdef object read_turn = None
+
+        if self.pipeline_depth:
+            read_turn = self.loop.create_future()
+            self.pipeline_waiters.append(read_turn)
+        else:
+            self.before_command()
+        self.pipeline_depth += 1
+        self.last_state = state
+
+        # The request is written before the first await, i.e. in the
+        # order of the read turns.
+        started_at = time.monotonic()
+        try:
+            return await self._parse_execute(
+                query,
+                fe_conn,
+                bind_data,
+                False,
+                state,
+                dbver,
+                read_turn,
+            )
+        except Exception:
+            # The state restored by a failed request is rolled back
+            # with it, so we no longer know which one is in effect.
+            self.last_state = None
+            raise
+        finally:
+            metrics.backend_query_duration.observe(time.monotonic() - started_at)
+            self.pipeline_depth -= 1
+            if read_turn is not None and not read_turn.done():
+                # Failed before writing the request; the turn to read
+                # stays with the request in front of it.
+                self.pipeline_waiters.remove(read_turn)
+            elif self.pipeline_waiters:
+                self.pipeline_waiters.popleft().set_result(None)
+            else:
+                await self.after_command()
+
     async def sql_fetch(
         self,
         sql: bytes | tuple[bytes, ...],
@@ -2321,17 +2485,22 @@ cdef class PGConnection:
         if er is not None:
             raise er[0](fields=er[1])
 
-    async def dump(self, input_queue, output_queue, fragment_suggested_size):
+    async def dump(self, input_queue, fragment_suggested_size):
+        # *input_queue* is a deque of (block, output_queue) pairs shared
+        # by all connections participating in the dump.  Every block is
+        # dumped into its own output queue, which is terminated with None,
+        # so that the consumer can emit blocks in a stable order no matter
+        # which connection picked them up.
         self.before_command()
         try:
             while True:
                 try:
-                    block = input_queue.pop()
+                    block, output_queue = input_queue.popleft()
                 except IndexError:
-                    await output_queue.put(None)
                     return
 
                 await self._dump(block, output_queue, fragment_suggested_size)
+                await output_queue.put(None)
         finally:
             # In case we errored while the transport was suspended.
             self.transport.resume_reading()
@@ -2732,6 +2901,15 @@ cdef class PGConnection:
             not self.in_tx()
         )
 
+    def can_pipeline(self):
+        # A connection running pipelined requests is neither idle nor
+        # synced, but more requests can still be written behind them.
+        return (
+            self.connected and
+            self.cancel_fut is None and
+            not self.in_tx()
+        )
+
     cdef before_command(self):
         if not self.connected:
             raise RuntimeError(
@@ -0,0 +1,269 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2024-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Read replicas of the backend Postgres cluster.
+
+Read-only queries outside of transactions can be served by streaming
+replicas of the backend cluster, configured with a comma-separated list
+of DSNs in EDGEDB_SERVER_READ_REPLICA_DSNS.  Connection parameters that
+a DSN leaves out, e.g. the user and password, are taken from the
+primary.  Every replica has its own pool of backend connections of at
+most EDGEDB_SERVER_READ_REPLICA_MAX_CONNECTIONS connections.
+
+The replication lag of every replica is checked every
+EDGEDB_SERVER_READ_REPLICA_CHECK_INTERVAL seconds.  Queries go to the
+primary while a replica cannot be reached or lags behind by more than
+EDGEDB_SERVER_READ_REPLICA_MAX_LAG seconds, and also until the replica
+has replayed the last schema change, so that it has the tables that the
+queries compiled for the new schema use.
+"""
+
+from __future__ import annotations
+from typing import *
+
+import asyncio
+import logging
+import os
+import time
+
+from . import connpool
+from . import defines
+from . import metrics
+from . import pgcon
+from . import pgconnparams
+
+if TYPE_CHECKING:
+    from . import tenant as edbtenant
+
+
+READ_REPLICA_DSNS = [
+    dsn.strip()
+    for dsn in os.getenv('EDGEDB_SERVER_READ_REPLICA_DSNS', '').split(',')
+    if dsn.strip()
+]
+READ_REPLICA_MAX_CONNECTIONS = int(os.getenv(
+    'EDGEDB_SERVER_READ_REPLICA_MAX_CONNECTIONS', 20
+))
+READ_REPLICA_MAX_LAG = float(os.getenv(
+    'EDGEDB_SERVER_READ_REPLICA_MAX_LAG', 5
+))
+READ_REPLICA_CHECK_INTERVAL = float(os.getenv(
+    'EDGEDB_SERVER_READ_REPLICA_CHECK_INTERVAL', 1
+))
+
+# The replay timestamp stands still while the primary is idle, so a
+# replica that has replayed everything it received is not lagging.
+# NULL, i.e. unusable, if the server is not a replica at all or has not
+# replayed anything yet.  The replay position comes along.
+LAG_QUERY = b'''
+    SELECT
+        (CASE
+            WHEN NOT pg_is_in_recovery() THEN NULL
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+                THEN 0
+            ELSE extract(
+                epoch FROM now() - pg_last_xact_replay_timestamp())
+        END)::text,
+        pg_last_wal_replay_lsn()::text
+'''
+
+# The current WAL position on the primary.
+CURRENT_LSN_QUERY = b'SELECT pg_current_wal_lsn()::text'
+
+logger = logging.getLogger("edb.server")
+
+
+def parse_lsn(lsn: str) -> int:
+    """Convert a Postgres WAL position, e.g. '16/B374D848', to an int."""
+    hi, sep, lo = lsn.partition('/')
+    if not sep:
+        raise ValueError(f'invalid WAL position: {lsn!r}')
+    return (int(hi, 16) << 32) | int(lo, 16)
+
+
+class ReadReplica:
+    """A streaming replica with its own pool of backend connections.
+
+    Replica connections run queries with the default session state
+    only: the connection init script cannot create its temporary tables
+    on a hot standby.
+    """
+
+    _tenant: edbtenant.Tenant
+    _addr: Tuple[str, int]
+    _params: pgconnparams.ConnectionParameters
+    _pool: connpool.Pool
+    _check_conn: pgcon.PGConnection | None
+    _lag: float | None
+    _replay_lsn: int
+
+    def __init__(self, dsn: str, tenant: edbtenant.Tenant) -> None:
+        addrs, params = pgconnparams.parse_dsn(dsn)
+        if len(addrs) > 1:
+            raise ValueError(
+                'multiple hosts in read replica DSN are not supported')
+        self._tenant = tenant
+        self._addr = addrs[0]
+        self._params = params
+        self._name = '{}:{}'.format(*self._addr)
+        self._pool = connpool.Pool(
+            connect=self._pg_connect,
+            disconnect=self._pg_disconnect,
+            max_capacity=READ_REPLICA_MAX_CONNECTIONS,
+        )
+        self._check_conn = None
+        self._lag = None
+        self._replay_lsn = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def lag(self) -> float | None:
+        return self._lag
+
+    @property
+    def replay_lsn(self) -> int:
+        return self._replay_lsn
+
+    def is_available(self, min_lsn: int = 0) -> bool:
+        """Whether queries can be routed to the replica.
+
+        *min_lsn* is the WAL position on the primary that the replica
+        must have replayed, see Tenant.on_schema_change().
+        """
+        return (
+            self._lag is not None
+            and self._lag <= READ_REPLICA_MAX_LAG
+            and self._replay_lsn >= min_lsn
+        )
+
+    def get_connection_spec(self) -> Dict[str, Any]:
+        spec = dict(self._tenant.get_pgaddr())
+        spec['host'], spec['port'] = self._addr
+        for k in ('user', 'password', 'database', 'ssl', 'sslmode'):
+            v = getattr(self._params, k)
+            if v is not None:
+                spec[k] = v
+        # Serializable transactions cannot run on a hot standby.
+        spec['server_settings'] = {
+            **spec.get('server_settings', {}),
+            'default_transaction_isolation': 'repeatable read',
+        }
+        return spec
+
+    async def _pg_connect(self, dbname: str) -> pgcon.PGConnection:
+        tenant = self._tenant
+        if tenant.get_backend_runtime_params().has_create_database:
+            pg_dbname = tenant.get_pg_dbname(dbname)
+        else:
+            pg_dbname = tenant.get_pg_dbname(defines.EDGEDB_SUPERUSER_DB)
+        rv = await pgcon.connect(
+            self.get_connection_spec(),
+            pg_dbname,
+            tenant.get_backend_runtime_params(),
+            apply_init_script=False,
+            hot_standby=True,
+        )
+        stmt_cache_size = tenant.server.stmt_cache_size
+        if stmt_cache_size is not None:
+            rv.set_stmt_cache_size(stmt_cache_size)
+        return rv
+
+    async def _pg_disconnect(self, conn: pgcon.PGConnection) -> None:
+        conn.terminate()
+
+    async def acquire(self, dbname: str) -> pgcon.PGConnection:
+        conn = await self._pool.acquire(dbname)
+        if not conn.is_healthy():
+            self._pool.release(dbname, conn, discard=True)
+            raise ConnectionError(
+                f'acquired an unhealthy connection to read replica '
+                f'{self._name}')
+        return conn
+
+    def release(
+        self,
+        dbname: str,
+        conn: pgcon.PGConnection,
+        *,
+        discard: bool = False,
+    ) -> None:
+        if not conn.is_healthy():
+            discard = True
+        self._pool.release(dbname, conn, discard=discard)
+
+    def mark_unavailable(self) -> None:
+        """Stop routing queries to the replica until the next check."""
+        self._set_lag(None)
+
+    async def monitor(self) -> None:
+        while True:
+            started_at = time.monotonic()
+            try:
+                lag, replay_lsn = await self._check_lag()
+            except Exception:
+                if self._lag is not None:
+                    logger.warning(
+                        'could not check the lag of read replica %s',
+                        self._name, exc_info=True,
+                    )
+                lag, replay_lsn = None, 0
+            self._replay_lsn = replay_lsn
+            self._set_lag(lag)
+            await asyncio.sleep(max(
+                0, READ_REPLICA_CHECK_INTERVAL - time.monotonic() + started_at
+            ))
+
+    async def _check_lag(self) -> Tuple[float | None, int]:
+        if self._check_conn is None or not self._check_conn.is_healthy():
+            if self._check_conn is not None:
+                self._check_conn.terminate()
+                self._check_conn = None
+            self._check_conn = await self._pg_connect(
+                defines.EDGEDB_SYSTEM_DB)
+        try:
+            (lag, replay_lsn), = await self._check_conn.sql_fetch(LAG_QUERY)
+        except Exception:
+            self._check_conn.terminate()
+            self._check_conn = None
+            raise
+        if lag is None or replay_lsn is None:
+            return None, 0
+        return (
+            max(float(lag.decode('utf-8')), 0.0),
+            parse_lsn(replay_lsn.decode('utf-8')),
+        )
+
+    def _set_lag(self, lag: float | None) -> None:
+        if (lag is None) != (self._lag is None):
+            if lag is None:
+                logger.warning('read replica %s is unavailable', self._name)
+            else:
+                logger.info('read replica %s is available', self._name)
+        self._lag = lag
+        metrics.read_replica_healthy.set(
+            float(self.is_available()), self._name)
+        if lag is not None:
+            metrics.read_replica_lag.set(lag, self._name)
+
+    def close(self) -> None:
+        if self._check_conn is not None:
+            self._check_conn.terminate()
+            self._check_conn = None
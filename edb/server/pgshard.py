@@ -0,0 +1,254 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2024-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Databases spread over several backend Postgres clusters.
+
+Besides the backend cluster of the tenant, the "home" cluster, user
+databases can be placed on additional backend clusters ("shards"),
+configured with a comma-separated list of DSNs in
+EDGEDB_SERVER_BACKEND_SHARD_DSNS.  Every shard must be bootstrapped by
+the same EdgeDB version for the same tenant id as the home cluster.
+Shard DSNs can use any of the HA backend schemes of the main backend DSN.
+
+The system database and the instance-wide metadata always stay on the
+home cluster.  Existing databases are found by listing the databases of
+every cluster; a database that exists on several clusters, e.g. the
+default database of a bootstrapped shard, is used on the cluster that
+EDGEDB_SERVER_BACKEND_SHARD_MAP places it on, or else on the first one
+it was found on, the home cluster first.  Likewise, the databases of
+the global schema are merged from the system databases of all clusters.
+
+New databases are placed by EDGEDB_SERVER_BACKEND_SHARD_MAP, a JSON
+object mapping database names to shard numbers (0 is the home cluster,
+1 the first shard DSN and so on), or else by the hash of their name.
+Databases created from a template, e.g. branches, are placed on the
+cluster of their template.
+
+Every shard has its own pool of at most
+EDGEDB_SERVER_BACKEND_SHARD_MAX_CONNECTIONS backend connections,
+by default as many as the shard cluster accepts.
+"""
+
+from __future__ import annotations
+from typing import *
+
+import contextlib
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import time
+
+from . import connpool
+from . import defines
+from . import metrics
+from . import pgcluster
+from . import pgcon
+
+if TYPE_CHECKING:
+    from . import tenant as edbtenant
+
+
+BACKEND_SHARD_DSNS = [
+    dsn.strip()
+    for dsn in os.getenv('EDGEDB_SERVER_BACKEND_SHARD_DSNS', '').split(',')
+    if dsn.strip()
+]
+BACKEND_SHARD_MAP: Dict[str, int] = json.loads(
+    os.getenv('EDGEDB_SERVER_BACKEND_SHARD_MAP') or '{}'
+)
+BACKEND_SHARD_MAX_CONNECTIONS = int(os.getenv(
+    'EDGEDB_SERVER_BACKEND_SHARD_MAX_CONNECTIONS', 0
+))
+
+# The shard number of the home cluster.
+HOME = 0
+
+logger = logging.getLogger("edb.server")
+
+
+def get_placement(dbname: str, nshards: int) -> int:
+    """Return the shard number a new database *dbname* is placed on.
+
+    *nshards* is the number of clusters including the home cluster.
+    """
+    if dbname in defines.EDGEDB_SPECIAL_DBS or nshards == 1:
+        return HOME
+    try:
+        return BACKEND_SHARD_MAP[dbname]
+    except KeyError:
+        pass
+    # Python's hash() of strings is randomized per process, while all
+    # servers of the tenant must agree on the placement.
+    digest = hashlib.blake2b(dbname.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % nshards
+
+
+def get_existing_placement(dbname: str, found_on: List[int]) -> int:
+    """Return the shard number an existing database *dbname* is used on.
+
+    *found_on* lists the shard numbers of the clusters the database
+    exists on, the home cluster first.
+    """
+    number = BACKEND_SHARD_MAP.get(dbname)
+    return number if number in found_on else found_on[0]
+
+
+class Shard:
+    """An additional backend cluster with its own connection pool.
+
+    Connections to shards are not tied to the tenant: the system
+    database connection, adaptive HA and the Postgres availability
+    state of the tenant are about the home cluster only.
+    """
+
+    _tenant: edbtenant.Tenant
+    _cluster: pgcluster.BaseCluster
+    _pool: connpool.Pool
+    _ha_master_serial: int
+
+    def __init__(
+        self,
+        number: int,
+        cluster: pgcluster.BaseCluster,
+        tenant: edbtenant.Tenant,
+        *,
+        max_capacity: int,
+    ) -> None:
+        self._number = number
+        self._cluster = cluster
+        self._tenant = tenant
+        self._pool = connpool.Pool(
+            connect=self._pg_connect,
+            disconnect=self._pg_disconnect,
+            # 1 connection is reserved for listing and creating databases
+            max_capacity=max_capacity - 1,
+        )
+        # Increase-only counter to reject outdated attempts to connect
+        self._ha_master_serial = 0
+
+    @property
+    def number(self) -> int:
+        return self._number
+
+    @property
+    def pool(self) -> connpool.Pool:
+        return self._pool
+
+    def get_pgaddr(self) -> Dict[str, Any]:
+        return self._cluster.get_connection_spec()
+
+    async def _pg_connect(self, dbname: str) -> pgcon.PGConnection:
+        ha_serial = self._ha_master_serial
+        tenant = self._tenant
+        if tenant.get_backend_runtime_params().has_create_database:
+            pg_dbname = tenant.get_pg_dbname(dbname)
+        else:
+            pg_dbname = tenant.get_pg_dbname(defines.EDGEDB_SUPERUSER_DB)
+        started_at = time.monotonic()
+        try:
+            rv = await pgcon.connect(
+                self.get_pgaddr(),
+                pg_dbname,
+                self._cluster.get_runtime_params(),
+            )
+            stmt_cache_size = tenant.server.stmt_cache_size
+            if stmt_cache_size is not None:
+                rv.set_stmt_cache_size(stmt_cache_size)
+        except Exception:
+            metrics.backend_connection_establishment_errors.inc()
+            raise
+        finally:
+            metrics.backend_connection_establishment_latency.observe(
+                time.monotonic() - started_at
+            )
+        if ha_serial == self._ha_master_serial:
+            metrics.total_backend_connections.inc()
+            metrics.current_backend_connections.inc()
+            return rv
+        else:
+            rv.terminate()
+            raise ConnectionError("connected to outdated Postgres master")
+
+    async def _pg_disconnect(self, conn: pgcon.PGConnection) -> None:
+        metrics.current_backend_connections.dec()
+        conn.terminate()
+
+    @contextlib.asynccontextmanager
+    async def direct_pgcon(
+        self,
+        dbname: str,
+    ) -> AsyncGenerator[pgcon.PGConnection, None]:
+        conn = None
+        try:
+            conn = await self._pg_connect(dbname)
+            yield conn
+        finally:
+            if conn is not None:
+                await self._pg_disconnect(conn)
+
+    async def get_dbnames(self) -> List[str]:
+        async with self.direct_pgcon(defines.EDGEDB_SYSTEM_DB) as conn:
+            return await self._tenant.server.get_dbnames(conn)
+
+    def on_switch_over(self) -> None:
+        logger.info('backend shard %d switched over', self._number)
+        # Bumping this serial counter will "cancel" all pending connections
+        # to the old master.
+        self._ha_master_serial += 1
+
+        if self._tenant.accept_new_tasks:
+            self._tenant.create_task(
+                self._pool.prune_all_connections(),
+                interruptable=True,
+            )
+
+    async def start_watching(self) -> None:
+        await self._cluster.start_watching(self.on_switch_over)
+
+    def stop_watching(self) -> None:
+        self._cluster.stop_watching()
+
+
+async def create_shard(
+    number: int,
+    dsn: str,
+    tenant: edbtenant.Tenant,
+    *,
+    server_settings: Mapping[str, str],
+) -> Shard:
+    cluster = await pgcluster.get_remote_pg_cluster(
+        dsn, tenant_id=tenant.tenant_id)
+    conn_params = cluster.get_connection_params()
+    cluster.set_connection_params(dataclasses.replace(
+        conn_params,
+        server_settings={**conn_params.server_settings, **server_settings},
+    ))
+
+    max_capacity = BACKEND_SHARD_MAX_CONNECTIONS
+    if not max_capacity:
+        instance_params = cluster.get_runtime_params().instance_params
+        max_capacity = (
+            instance_params.max_connections
+            - instance_params.reserved_connections
+        )
+        logger.info(
+            f'Detected {max_capacity} backend connections available '
+            f'on backend shard {number}.')
+    return Shard(number, cluster, tenant, max_capacity=max_capacity)
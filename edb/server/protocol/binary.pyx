@@ -21,6 +21,7 @@ import base64
 import collections
 import json
 import logging
+import os
 import time
 import statistics
 import traceback
@@ -72,6 +73,8 @@ from edb.server.pgcon cimport pgcon
 from edb.server.pgcon import errors as pgerror
 from edb.server import metrics
 
+from edb.pgsql.common import quote_literal as pg_ql
+
 from edb.schema import objects as s_obj
 
 from edb import errors
@@ -96,6 +99,28 @@ cdef object FMT_JSON = compiler.OutputFormat.JSON
 cdef object FMT_JSON_ELEMENTS = compiler.OutputFormat.JSON_ELEMENTS
 cdef object FMT_NONE = compiler.OutputFormat.NONE
 
+# The number of backend connections used to copy out data blocks
+# during DUMP.  Additional connections import the snapshot of the
+# main dump transaction with SET TRANSACTION SNAPSHOT.
+cdef int DUMP_PARALLELISM = max(
+    1, int(os.getenv('EDGEDB_SERVER_DUMP_PARALLELISM', 1)))
+cdef double DUMP_WORKER_ACQUIRE_TIMEOUT = 0.5
+
+# When greater than 1, RESTORE drops plain (non-unique, non-constraint)
+# indexes of the restored tables before loading data and rebuilds them
+# afterwards with up to this many Postgres processes per index build.
+cdef int RESTORE_DEFERRED_INDEX_WORKERS = max(
+    1, int(os.getenv('EDGEDB_SERVER_RESTORE_DEFERRED_INDEX_WORKERS', 1)))
+
+# Errors of queries on a read replica that are retried on the primary:
+# the ones a replica that missed a schema change fails with.
+cdef tuple REPLICA_FALLBACK_ERRORS = (
+    pgerror.ERROR_UNDEFINED_TABLE,
+    pgerror.ERROR_UNDEFINED_COLUMN,
+    pgerror.ERROR_UNDEFINED_FUNCTION,
+    pgerror.ERROR_UNDEFINED_OBJECT,
+)
+
 cdef tuple DUMP_VER_MIN = (0, 7)
 cdef tuple DUMP_VER_MAX = edbdef.CURRENT_PROTOCOL
 
@@ -116,6 +141,11 @@ DEF SERVER_HEADER_CAPABILITIES = 0x1001
 DEF ALL_CAPABILITIES = 0xFFFFFFFFFFFFFFFF
 
 
+def _release_abandoned_pgcon(tenant, dbname, fut):
+    if not fut.cancelled() and fut.exception() is None:
+        tenant.release_pgcon(dbname, fut.result())
+
+
 def parse_capabilities_header(value: bytes) -> uint64_t:
     if len(value) != 8:
         raise errors.BinaryProtocolError(
@@ -315,12 +345,11 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.write(buf)
 
         if self.server.in_dev_mode():
-            pgaddr = dict(self.tenant.get_pgaddr())
+            dbname = self.get_dbview().dbname
+            pgaddr = dict(self.tenant.get_pgaddr(dbname))
             if pgaddr.get('password'):
                 pgaddr['password'] = '********'
-            pgaddr['database'] = self.tenant.get_pg_dbname(
-                self.get_dbview().dbname
-            )
+            pgaddr['database'] = self.tenant.get_pg_dbname(dbname)
             pgaddr.pop('ssl', None)
             if 'sslmode' in pgaddr:
                 pgaddr['sslmode'] = pgaddr['sslmode'].name
@@ -580,7 +609,10 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             raise ConnectionAbortedError
 
         dbv = self.get_dbview()
-        conn = await self.get_pgcon()
+        if dbv.in_tx():
+            conn = await self.get_pgcon()
+        else:
+            conn = await self.get_pgcon(state=dbv.serialize_state())
 
         try:
             await execute.execute_script(
@@ -781,13 +813,46 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         compiled: dbview.CompiledQuery,
         bind_args: bytes,
         use_prep_stmt: bint,
+        int64_t implicit_limit,
     ):
         cdef:
             dbview.DatabaseConnectionView dbv
             pgcon.PGConnection conn
+            bint started = False
 
         dbv = self.get_dbview()
-        conn = await self.get_pgcon()
+        query_unit = compiled.query_unit_group[0]
+        if execute.is_read_only(dbv, query_unit):
+            if (
+                self.tenant.has_read_replicas(dbv.dbname)
+                and dbv.serialize_state() is dbview.DEFAULT_STATE
+            ):
+                # Started once here, as the query may fall back to the
+                # primary after it was tried on a replica.
+                dbv.start(query_unit)
+                started = True
+                if await self._execute_on_replica(
+                    dbv, compiled, bind_args, use_prep_stmt
+                ):
+                    return
+            if (
+                self.tenant.is_pipelining_enabled()
+                and execute.has_bounded_result(query_unit, implicit_limit)
+            ):
+                await self._execute_pipelined(
+                    dbv, compiled, bind_args, skip_start=started)
+                return
+
+        if use_prep_stmt and query_unit.sql_hash:
+            prepared_stmt = (query_unit.sql_hash, dbv.dbver)
+        else:
+            prepared_stmt = None
+        if dbv.in_tx():
+            # The transaction is pinned to its backend connection.
+            conn = await self.get_pgcon(prepared_stmt)
+        else:
+            conn = await self.get_pgcon(
+                prepared_stmt, dbv.serialize_state())
         try:
             await execute.execute(
                 conn,
@@ -796,11 +861,11 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 bind_args,
                 fe_conn=self,
                 use_prep_stmt=use_prep_stmt,
+                skip_start=started,
             )
         finally:
             self.maybe_release_pgcon(conn)
 
-        query_unit = compiled.query_unit_group[0]
         if query_unit.config_requires_restart:
             self.write_log(
                 EdgeSeverity.EDGE_SEVERITY_NOTICE,
@@ -808,6 +873,88 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 'server restart is required for the configuration '
                 'change to take effect')
 
+    async def _execute_on_replica(
+        self,
+        dbview.DatabaseConnectionView dbv,
+        compiled: dbview.CompiledQuery,
+        bind_args: bytes,
+        use_prep_stmt: bint,
+    ) -> bint:
+        # Returns False if the query should run on the primary instead.
+        replica = self.tenant.get_read_replica()
+        if replica is None:
+            return False
+
+        try:
+            conn = await replica.acquire(self.dbname)
+        except Exception:
+            logger.warning(
+                'could not connect to read replica %s', replica.name,
+                exc_info=True)
+            replica.mark_unavailable()
+            metrics.read_replica_fallbacks.inc(1.0, 'error')
+            return False
+
+        try:
+            await execute.execute(
+                conn,
+                dbv,
+                compiled,
+                bind_args,
+                fe_conn=self,
+                use_prep_stmt=use_prep_stmt,
+                skip_start=True,
+            )
+        except pgerror.BackendError as ex:
+            # The replica has not caught up with a schema change made
+            # elsewhere yet, or the query needs the session state tables
+            # that replica connections don't have.  Either way it fails
+            # when it is planned, before returning any rows.
+            if ex.get_field('C') not in REPLICA_FALLBACK_ERRORS:
+                raise
+            metrics.read_replica_fallbacks.inc(1.0, 'error')
+            return False
+        finally:
+            replica.release(self.dbname, conn)
+        return True
+
+    async def _execute_pipelined(
+        self,
+        dbview.DatabaseConnectionView dbv,
+        compiled: dbview.CompiledQuery,
+        bind_args: bytes,
+        *,
+        skip_start: bint = False,
+    ):
+        # A pipelined query cannot be abandoned halfway, as its results
+        # would be read by the next query on the backend connection, so
+        # it is run to completion even if this connection is lost.
+        await asyncio.shield(
+            self._run_pipelined(dbv, compiled, bind_args, skip_start))
+
+    async def _run_pipelined(
+        self,
+        dbview.DatabaseConnectionView dbv,
+        compiled: dbview.CompiledQuery,
+        bind_args: bytes,
+        bint skip_start,
+    ):
+        # The backend connection is shared with other clients, so it is
+        # not pinned to this one.
+        conn = await self.tenant.acquire_pipelined_pgcon(self.dbname)
+        try:
+            await execute.execute(
+                conn,
+                dbv,
+                compiled,
+                bind_args,
+                fe_conn=self,
+                skip_start=skip_start,
+                pipelined=True,
+            )
+        finally:
+            self.tenant.release_pipelined_pgcon(self.dbname, conn)
+
     cdef dbview.QueryRequestInfo parse_execute_request(self):
         cdef:
             uint64_t allow_capabilities = 0
@@ -986,7 +1133,8 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 len(query_unit_group) == 1
                 and bool(query_unit_group[0].sql_hash)
             )
-            await self._execute(compiled, args, use_prep)
+            await self._execute(
+                compiled, args, use_prep, query_req.implicit_limit)
 
         if self._cancelled:
             raise ConnectionAbortedError
@@ -1326,6 +1474,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         dbname = _dbview.dbname
         tenant = self.tenant
         pgcon = await tenant.acquire_pgcon(dbname)
+        extra_pgcons = []
         self._in_dump_restore = True
         try:
             # To avoid having races, we want to:
@@ -1335,8 +1484,8 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             #   2. in the compiler process we connect to that transaction
             #      and re-introspect the schema in it.
             #
-            #   3. all dump worker pg connection would work on the same
-            #      connection.
+            #   3. all dump worker pg connections import the snapshot
+            #      of that transaction.
             #
             # This guarantees that every pg connection and the compiler work
             # with the same DB state.
@@ -1413,28 +1562,36 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             self._transport.write(memoryview(msg_buf.end_message()))
             self.flush()
 
-            blocks_queue = collections.deque(blocks)
-            output_queue = asyncio.Queue(maxsize=2)
-
-            async with taskgroup.TaskGroup() as g:
-                g.create_task(pgcon.dump(
-                    blocks_queue,
-                    output_queue,
-                    DUMP_BLOCK_SIZE,
-                ))
+            # Blocks are emitted in the same order as they are picked up
+            # by the dump connections, and the fragments of every block
+            # are never interleaved with those of other blocks.
+            blocks_queue = collections.deque(
+                (block, asyncio.Queue(maxsize=2)) for block in reversed(blocks)
+            )
+            output_queues = [q for _, q in blocks_queue]
 
-                nstops = 0
-                while True:
-                    if self._cancelled:
-                        raise ConnectionAbortedError
+            if len(blocks) > 1 and DUMP_PARALLELISM > 1:
+                await self._acquire_dump_workers(
+                    dbname, pgcon, min(DUMP_PARALLELISM, len(blocks)) - 1,
+                    extra_pgcons,
+                )
 
-                    out = await output_queue.get()
-                    if out is None:
-                        nstops += 1
-                        if nstops == 1:
-                            # we only have one worker right now
+            async with taskgroup.TaskGroup() as g:
+                for worker_pgcon in [pgcon, *extra_pgcons]:
+                    g.create_task(worker_pgcon.dump(
+                        blocks_queue,
+                        DUMP_BLOCK_SIZE,
+                    ))
+
+                for output_queue in output_queues:
+                    while True:
+                        if self._cancelled:
+                            raise ConnectionAbortedError
+
+                        out = await output_queue.get()
+                        if out is None:
                             break
-                    else:
+
                         block, block_num, data = out
 
                         msg_buf = WriteBuffer.new_message(b'=')
@@ -1456,10 +1613,14 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                         if self._write_waiter:
                             await self._write_waiter
 
+            for worker_pgcon in extra_pgcons:
+                await worker_pgcon.sql_execute(b"ROLLBACK;")
             await pgcon.sql_execute(b"ROLLBACK;")
 
         finally:
             self._in_dump_restore = False
+            for worker_pgcon in extra_pgcons:
+                tenant.release_pgcon(dbname, worker_pgcon)
             tenant.release_pgcon(dbname, pgcon)
 
         msg_buf = WriteBuffer.new_message(b'C')
@@ -1471,6 +1632,52 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.write(msg_buf.end_message())
         self.flush()
 
+    async def _acquire_dump_workers(
+        self, dbname, pgcon, max_workers, extra_pgcons
+    ):
+        # Export the snapshot of the main dump transaction and make
+        # additional backend connections import it, so that all of them
+        # see exactly the same data.  Connections are acquired
+        # opportunistically: if the pool cannot give us one quickly we
+        # proceed with what we have rather than risk starving (or
+        # deadlocking with) other clients.
+        tenant = self.tenant
+        snapshot_id = await pgcon.sql_fetch_val(
+            b'SELECT pg_export_snapshot()')
+
+        for _ in range(max_workers):
+            # Not asyncio.wait_for(), which may lose a connection that
+            # is acquired just as the timeout hits.
+            acquire = asyncio.ensure_future(tenant.acquire_pgcon(dbname))
+            try:
+                done, _ = await asyncio.wait(
+                    [acquire], timeout=DUMP_WORKER_ACQUIRE_TIMEOUT)
+            finally:
+                if not acquire.done():
+                    acquire.cancel()
+                    # The pool may still hand out the connection.
+                    acquire.add_done_callback(
+                        lambda fut: _release_abandoned_pgcon(
+                            tenant, dbname, fut))
+            if not done:
+                break
+
+            worker_pgcon = acquire.result()
+            extra_pgcons.append(worker_pgcon)
+            await worker_pgcon.sql_execute(
+                b'''START TRANSACTION
+                        ISOLATION LEVEL REPEATABLE READ
+                        READ ONLY;
+
+                    SET TRANSACTION SNAPSHOT '''
+                + pg_ql(snapshot_id.decode()).encode() +
+                b''';
+
+                    SET LOCAL idle_in_transaction_session_timeout = 0;
+                    SET LOCAL statement_timeout = 0;
+                ''',
+            )
+
     async def _execute_utility_stmt(self, eql: str, pgcon):
         cdef dbview.DatabaseConnectionView _dbview
 
@@ -1649,6 +1856,11 @@ cdef class EdgeConnection(frontend.FrontendConnection):
 
             await pgcon.sql_execute(disable_trigger_q.encode())
 
+            deferred_indexes = []
+            if RESTORE_DEFERRED_INDEX_WORKERS > 1 and tables:
+                deferred_indexes = await self._defer_restore_indexes(
+                    pgcon, tables)
+
             # Send "RestoreReadyMessage"
             msg = WriteBuffer.new_message(b'+')
             msg.write_int16(0)  # no headers
@@ -1703,6 +1915,13 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 else:
                     self.fallthrough()
 
+            if deferred_indexes:
+                await pgcon.sql_execute((
+                    f'SET LOCAL max_parallel_maintenance_workers = '
+                    f'{RESTORE_DEFERRED_INDEX_WORKERS - 1}'.encode(),
+                    *deferred_indexes,
+                ))
+
             await pgcon.sql_execute(enable_trigger_q.encode())
 
         except Exception:
@@ -1735,6 +1954,53 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.write(msg.end_message())
         self.flush()
 
+    async def _defer_restore_indexes(self, pgcon, tables):
+        # Maintaining indexes row by row while COPY-ing data in is much
+        # slower than building them once the data is there, and the
+        # latter can use parallel maintenance workers.  Only plain
+        # indexes are deferred: unique indexes and indexes backing
+        # constraints stay in place so that the data is still validated
+        # as it is loaded.  Returns the statements recreating the
+        # dropped indexes along with their comments, which carry the
+        # metadata of the schema indexes.
+        table_oids = ', '.join(f'{pg_ql(t)}::regclass' for t in tables)
+        indexes = await pgcon.sql_fetch_val(
+            f'''
+                SELECT
+                    json_agg(json_build_array(
+                        i.indexrelid::regclass::text,
+                        pg_get_indexdef(i.indexrelid),
+                        obj_description(i.indexrelid, 'pg_class')
+                    ))
+                FROM
+                    pg_index i
+                WHERE
+                    i.indrelid = ANY(ARRAY[{table_oids}])
+                    AND NOT i.indisunique
+                    AND NOT EXISTS (
+                        SELECT FROM pg_constraint c
+                        WHERE c.conindid = i.indexrelid
+                    )
+            '''.encode(),
+        )
+        if not indexes:
+            return []
+
+        indexes = json.loads(indexes)
+        if not indexes:
+            return []
+
+        await pgcon.sql_execute(
+            ''.join(f'DROP INDEX {name};' for name, _, _ in indexes).encode()
+        )
+        stmts = []
+        for name, indexdef, comment in indexes:
+            stmts.append(indexdef.encode())
+            if comment is not None:
+                stmts.append(
+                    f'COMMENT ON INDEX {name} IS {pg_ql(comment)}'.encode())
+        return stmts
+
     def _build_type_id_map_for_restore_mending(self, restore_block):
         type_map = {}
         descriptor_stack = []
@@ -48,6 +48,46 @@ from edb.server.pgcon import errors as pgerror
 cdef object FMT_NONE = compiler.OutputFormat.NONE
 
 
+def is_read_only(dbview.DatabaseConnectionView dbv, query_unit) -> bool:
+    """Whether *query_unit* is a read-only query outside of transactions.
+
+    Such queries can run on a backend connection shared with other
+    clients (see PGConnection.pipelined_parse_execute) or on a read
+    replica.
+    """
+    return (
+        not dbv.in_tx()
+        and not query_unit.capabilities
+        and query_unit.is_transactional
+        and len(query_unit.sql) == 1
+        and not query_unit.tx_id
+        and not query_unit.tx_rollback
+        and not query_unit.append_rollback
+        and not query_unit.needs_readback
+        and not query_unit.is_explain
+        and not query_unit.system_config
+        and not query_unit.config_ops
+        and not query_unit.ddl_stmt_id
+        and not query_unit.create_db
+        and not query_unit.drop_db
+    )
+
+
+def has_bounded_result(query_unit, implicit_limit: int) -> bool:
+    """Whether *query_unit* returns a bounded number of rows.
+
+    A query on a backend connection shared with other clients is read
+    without backpressure from its client (see
+    PGConnection._wait_for_frontend), so only such queries are run
+    there.
+    """
+    return implicit_limit > 0 or query_unit.cardinality in (
+        compiler.Cardinality.NO_RESULT,
+        compiler.Cardinality.AT_MOST_ONE,
+        compiler.Cardinality.ONE,
+    )
+
+
 # TODO: can we merge execute and execute_script?
 async def execute(
     be_conn: pgcon.PGConnection,
@@ -58,8 +98,12 @@ async def execute(
     fe_conn: frontend.AbstractFrontendConnection = None,
     use_prep_stmt: bint = False,
     # HACK: A hook from the notebook ext, telling us to skip dbview.start
-    # so that it can handle things differently.
+    # so that it can handle things differently.  Also used when the
+    # query has been started already, see EdgeConnection._execute().
     skip_start: bint = False,
+    # Run the query on a backend connection shared with other clients,
+    # see is_read_only().
+    pipelined: bint = False,
 ):
     cdef:
         bytes state = None, orig_state = None
@@ -77,12 +121,21 @@ async def execute(
     data = None
 
     try:
-        if be_conn.last_state == state:
+        if pipelined:
+            # Other clients' queries run on the connection in between,
+            # so the state is always restored.
+            pass
+        elif be_conn.last_state == state:
             # the current status in be_conn is in sync with dbview, skip the
             # state restoring
             state = None
         if not skip_start:
             dbv.start(query_unit)
+        if query_unit.create_db:
+            tenant.on_before_create_db(
+                query_unit.create_db,
+                query_unit.create_db_template,
+            )
         if query_unit.create_db_template:
             await tenant.on_before_create_db_from_template(
                 query_unit.create_db_template,
@@ -96,7 +149,16 @@ async def execute(
             config_ops = query_unit.config_ops
 
             if query_unit.sql:
-                if query_unit.ddl_stmt_id:
+                target_db = query_unit.create_db or query_unit.drop_db
+                if (
+                    target_db
+                    and not tenant.is_same_backend(target_db, dbv.dbname)
+                ):
+                    # The database is placed on another backend cluster,
+                    # see edb.server.pgshard.
+                    async with tenant.direct_sys_pgcon(target_db) as conn:
+                        await conn.run_ddl(query_unit)
+                elif query_unit.ddl_stmt_id:
                     ddl_ret = await be_conn.run_ddl(query_unit, state)
                     if ddl_ret and ddl_ret['new_types']:
                         new_types = ddl_ret['new_types']
@@ -111,14 +173,23 @@ async def execute(
                     read_data = (
                         query_unit.needs_readback or query_unit.is_explain)
 
-                    data = await be_conn.parse_execute(
-                        query=query_unit,
-                        fe_conn=fe_conn if not read_data else None,
-                        bind_data=bound_args_buf,
-                        use_prep_stmt=use_prep_stmt,
-                        state=state,
-                        dbver=dbv.dbver,
-                    )
+                    if pipelined:
+                        data = await be_conn.pipelined_parse_execute(
+                            query=query_unit,
+                            fe_conn=fe_conn,
+                            bind_data=bound_args_buf,
+                            state=state,
+                            dbver=dbv.dbver,
+                        )
+                    else:
+                        data = await be_conn.parse_execute(
+                            query=query_unit,
+                            fe_conn=fe_conn if not read_data else None,
+                            bind_data=bound_args_buf,
+                            use_prep_stmt=use_prep_stmt,
+                            state=state,
+                            dbver=dbv.dbver,
+                        )
 
                     if query_unit.needs_readback and data:
                         config_ops = [
@@ -175,7 +246,10 @@ async def execute(
             dbv.set_state_serializer(state_serializer)
         if side_effects:
             signal_side_effects(dbv, side_effects)
-        if not dbv.in_tx() and not query_unit.tx_rollback:
+        if pipelined:
+            # The connection keeps track of its state itself.
+            pass
+        elif not dbv.in_tx() and not query_unit.tx_rollback:
             state = dbv.serialize_state()
             if state is not orig_state:
                 # In 3 cases the state is changed:
@@ -415,6 +489,7 @@ def signal_side_effects(dbv, side_effects):
         return
 
     if side_effects & dbview.SideEffects.SchemaChanges:
+        tenant.on_schema_change()
         tenant.create_task(
             tenant.signal_sysevent(
                 'schema-changes',
@@ -477,8 +552,15 @@ async def parse_execute_json(
         protocol_version=edbdef.CURRENT_PROTOCOL,
     )
 
+    # Queries that differ only in their literals share a compiled
+    # query, the extracted literals are bound as extra arguments.
+    if debug.flags.edgeql_disable_normalization:
+        source = edgeql.Source.from_string(query)
+    else:
+        source = edgeql.NormalizedSource.from_string(query)
+
     query_req = dbview.QueryRequestInfo(
-        edgeql.Source.from_string(query),
+        source,
         protocol_version=edbdef.CURRENT_PROTOCOL,
         input_format=compiler.InputFormat.JSON,
         output_format=output_format,
@@ -41,6 +41,12 @@ cdef class AbstractFrontendConnection:
     cdef flush(self):
         raise NotImplementedError
 
+    cdef get_write_waiter(self):
+        # Returns a future to wait for before writing more, if the client
+        # is not keeping up with the data written to it.  The future
+        # result is False if the client has disconnected.
+        return None
+
 
 cdef class FrontendConnection(AbstractFrontendConnection):
 
@@ -105,7 +111,11 @@ cdef class FrontendConnection(AbstractFrontendConnection):
             # fail all tests if this ever happens.
             self.abort_pinned_pgcon()
 
-    async def get_pgcon(self) -> pgcon.PGConnection:
+    async def get_pgcon(
+        self,
+        prepared_stmt: tuple | None = None,
+        state: bytes | None = None,
+    ) -> pgcon.PGConnection:
         if self._cancelled or self._pgcon_released_in_connection_lost:
             raise RuntimeError(
                 'cannot acquire a pgconn; the connection is closed')
@@ -122,7 +132,8 @@ cdef class FrontendConnection(AbstractFrontendConnection):
                 return self._pinned_pgcon
             if self._pinned_pgcon is not None:
                 raise RuntimeError('there is already a pinned pgcon')
-            conn = await self.tenant.acquire_pgcon(self.dbname)
+            conn = await self.tenant.acquire_pgcon(
+                self.dbname, prepared_stmt=prepared_stmt, state=state)
             self._pinned_pgcon = conn
             conn.pinned_by = self
             return conn
@@ -206,6 +217,11 @@ cdef class FrontendConnection(AbstractFrontendConnection):
             self._write_buf = None
             self._transport.write(memoryview(buf))
 
+    cdef get_write_waiter(self):
+        if self._write_waiter is None or self._write_waiter.done():
+            return None
+        return self._write_waiter
+
     def pause_writing(self):
         if self._write_waiter and not self._write_waiter.done():
             return
@@ -479,6 +495,10 @@ cdef class FrontendConnection(AbstractFrontendConnection):
             # We're parsing the protocol. We can abort that.
             self._msg_take_waiter.cancel()
 
+        if self._write_waiter is not None and not self._write_waiter.done():
+            # Wake up whoever waits to write more, see get_write_waiter().
+            self._write_waiter.set_result(False)
+
         if (
             self._main_task is not None
             and not self._main_task.done()
@@ -35,6 +35,7 @@ from libc.stdint cimport int32_t, int16_t, uint32_t
 
 from edb import errors
 from edb.common import debug
+from edb.pgsql import normalize as pg_normalize
 from edb.pgsql.parser import exceptions as parser_errors
 from edb.server import args as srvargs
 from edb.server import defines
@@ -1400,8 +1401,51 @@ cdef class PgConnection(frontend.FrontendConnection):
             result = self.database.lookup_compiled_sql(key)
             if result is not None:
                 return result
+
+        if debug.flags.sql_disable_normalization:
+            source = None
+        else:
+            source = pg_normalize.normalize(query_str)
+        result = None
+        if source is not None:
+            # Queries differing only in their constants share the
+            # translation, which is instantiated with the constants.
+            shape_key = (source.cache_key(), fe_settings, source.first_param)
+            template = None
+            if not ignore_cache:
+                template = self.database.lookup_compiled_sql(shape_key)
+            if template is None:
+                try:
+                    template = await self._compile(
+                        source.text, dbv, source.first_param)
+                except (
+                    errors.QueryError,
+                    errors.UnsupportedFeatureError,
+                    parser_errors.PSqlParseError,
+                    parser_errors.PSqlUnsupportedError,
+                ):
+                    # Compile the original query to report the error
+                    # with its positions.
+                    template = None
+                else:
+                    self.database.cache_compiled_sql(shape_key, template)
+            if template is not None:
+                result = [
+                    unit.instantiate(
+                        source.constants, source.translation_data)
+                    for unit in template
+                ]
+        if result is None:
+            result = await self._compile(query_str, dbv, None)
+
+        self.database.cache_compiled_sql(key, result)
+        if self.debug:
+            self.debug_print("Compile result", result)
+        return result
+
+    async def _compile(self, query_str, ConnectionView dbv, first_param):
         compiler_pool = self.server.get_compiler_pool()
-        result = await compiler_pool.compile_sql(
+        return await compiler_pool.compile_sql(
             self.dbname,
             self.database.user_schema,
             self.database._index._global_schema,
@@ -1413,12 +1457,9 @@ cdef class PgConnection(frontend.FrontendConnection):
             self.sql_prepared_stmts_map,
             self.dbname,
             self.username,
+            first_param,
             client_id=self.tenant.client_id,
         )
-        self.database.cache_compiled_sql(key, result)
-        if self.debug:
-            self.debug_print("Compile result", result)
-        return result
 
     def _validate_prepare_stmt(self, qu):
         assert qu.prepare is not None
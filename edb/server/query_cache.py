@@ -0,0 +1,263 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2023-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Settings and persistence of per-database compiled query caches.
+
+Compiled queries are cached per database in memory.  Besides the
+entry count limit, the caches are bounded by the estimated size of
+the compiled queries: EDGEDB_SERVER_QUERY_CACHE_DB_MAX_BYTES limits
+each database and EDGEDB_SERVER_QUERY_CACHE_TENANT_MAX_BYTES limits
+all databases of a tenant together (0 means no limit).
+
+Databases with identical user schemas and database configuration, e.g.
+branches or databases restored from the same dump, additionally share
+compiled EdgeQL queries through a cache keyed by the fingerprint of
+their schema.  Its size is set with EDGEDB_SERVER_SHARED_QUERY_CACHE_SIZE
+(entries, 0 disables sharing) and EDGEDB_SERVER_SHARED_QUERY_CACHE_MAX_BYTES.
+
+When enabled with the EDGEDB_SERVER_PERSISTENT_QUERY_CACHE_DIR environment
+variable, the compiled query cache of every database is periodically
+written to a local file and used to warm the in-memory cache when the
+database is introspected after a server restart.
+
+Every file is tagged with a version key made of the on-disk format
+version, the catalog version and the versions of the user and global
+schemas.  Files with a different version key are discarded, so entries
+never outlive a DDL or a catalog upgrade.
+
+A DDL invalidates only the compiled queries that depend on the schema
+objects it affects, see get_affected_objects(); the compiled queries
+carry the ids of the schema objects they were compiled against.
+"""
+
+from __future__ import annotations
+from typing import *
+
+import hashlib
+import logging
+import os
+import pathlib
+import pickle
+import tempfile
+import uuid
+
+from edb.schema import modules as s_mod
+from edb.schema import name as sn
+from edb.schema import objects as s_obj
+from edb.schema import objtypes as s_objtypes
+from edb.schema import pointers as s_pointers
+from edb.schema import referencing as s_ref
+from edb.schema import schema as s_schema
+from edb.schema import types as s_types
+from edb.schema import version as s_ver
+
+from . import defines
+
+
+QUERY_CACHE_DB_MAX_BYTES = int(os.getenv(
+    'EDGEDB_SERVER_QUERY_CACHE_DB_MAX_BYTES', 64 * 1024 * 1024
+)) or None
+QUERY_CACHE_TENANT_MAX_BYTES = int(os.getenv(
+    'EDGEDB_SERVER_QUERY_CACHE_TENANT_MAX_BYTES', 0
+)) or None
+
+SHARED_QUERY_CACHE_SIZE = int(os.getenv(
+    'EDGEDB_SERVER_SHARED_QUERY_CACHE_SIZE', 10 * defines._MAX_QUERIES_CACHE
+))
+SHARED_QUERY_CACHE_MAX_BYTES = int(os.getenv(
+    'EDGEDB_SERVER_SHARED_QUERY_CACHE_MAX_BYTES', 256 * 1024 * 1024
+)) or None
+
+QUERY_CACHE_DIR = os.getenv('EDGEDB_SERVER_PERSISTENT_QUERY_CACHE_DIR')
+QUERY_CACHE_SAVE_INTERVAL = float(os.getenv(
+    'EDGEDB_SERVER_PERSISTENT_QUERY_CACHE_SAVE_INTERVAL', 60
+))
+
+# Bump when the layout of the cache file or of the cached objects changes.
+FORMAT_VERSION = 2
+
+logger = logging.getLogger("edb.server")
+
+VersionKey = Tuple[int, int, str, str]
+
+
+def get_version_key(user_schema, global_schema) -> VersionKey:
+    user_ver = user_schema.get_global(
+        s_ver.SchemaVersion, '__schema_version__')
+    global_ver = global_schema.get_global(
+        s_ver.GlobalSchemaVersion, '__global_schema_version__')
+    return (
+        FORMAT_VERSION,
+        defines.EDGEDB_CATALOG_VERSION,
+        str(user_ver.get_version(user_schema)),
+        str(global_ver.get_version(global_schema)),
+    )
+
+
+def get_schema_fingerprint(user_schema, db_config) -> Optional[bytes]:
+    """Return a key identifying what queries are compiled against.
+
+    Returns None if the schema cannot be fingerprinted.
+    """
+    if not isinstance(user_schema, s_schema.FlatSchema):
+        return None
+    h = hashlib.sha1(user_schema.get_fingerprint())
+    h.update(pickle.dumps(sorted(db_config.items()), -1))
+    return h.digest()
+
+
+def get_affected_objects(
+    old_schema,
+    new_schema,
+    std_schema,
+    global_schema,
+) -> Optional[FrozenSet[uuid.UUID]]:
+    """Return the ids of the schema objects affected by a schema change.
+
+    Compiled queries that depend on none of them remain valid for
+    *new_schema*.  Returns None if all compiled queries are invalid.
+    """
+    if not (
+        isinstance(old_schema, s_schema.FlatSchema)
+        and isinstance(new_schema, s_schema.FlatSchema)
+    ):
+        return None
+    created, altered, deleted = new_schema.get_object_changes(old_schema)
+    old = s_schema.ChainedSchema(std_schema, old_schema, global_schema)
+    new = s_schema.ChainedSchema(std_schema, new_schema, global_schema)
+
+    for objid in created:
+        obj = new.get_by_id(objid)
+        if (
+            isinstance(obj, s_obj.QualifiedObject)
+            and not isinstance(obj, s_ref.ReferencedObject)
+            and _is_name_taken(old, obj.get_shortname(new).name)
+        ):
+            # The new object may take over a name that existing queries
+            # resolve to an object in another module, e.g. in std.
+            return None
+
+    # Changes to a pointer, a constraint, an annotation etc. affect the
+    # object they belong to, and changes to an object type or a pointer
+    # affect its ancestors: e.g. queries over a type see the access
+    # policies of its subtypes, and DML on it covers them.  Queries do
+    # not record the scalar and collection types they use, so changes
+    # to those affect what refers to them: the pointers targeting them,
+    # their casts, their subtypes and the collections of them.
+    affected = created | altered | deleted
+    todo = list(affected)
+    while todo:
+        objid = todo.pop()
+        schema = new if new.has_object(objid) else old
+        obj = schema.get_by_id(objid)
+        related: List[uuid.UUID] = []
+        if isinstance(obj, s_ref.ReferencedObject):
+            subject = obj.get_subject(schema)
+            if subject is not None:
+                related.append(subject.id)
+        if isinstance(obj, (s_objtypes.ObjectType, s_pointers.Pointer)):
+            related.extend(obj.get_ancestors(schema).ids(schema))
+        elif isinstance(obj, s_types.Type) and old.has_object(objid):
+            related.extend(
+                ref.id for ref in old.get_referrers(old.get_by_id(objid)))
+        for relid in related:
+            if relid not in affected:
+                affected.add(relid)
+                todo.append(relid)
+
+    return frozenset(affected)
+
+
+def _is_name_taken(schema: s_schema.Schema, name: str) -> bool:
+    for module in schema.get_objects(type=s_mod.Module):
+        qname = sn.QualName(str(module.get_name(schema)), name)
+        if (
+            schema.get(qname, default=None) is not None
+            or schema.get_functions(qname, default=())
+        ):
+            return True
+    return False
+
+
+class PersistentQueryCache:
+    """Stores compiled query cache entries in a local directory."""
+
+    def __init__(self, cache_dir: pathlib.Path, instance_name: str) -> None:
+        # Multiple tenants may share the directory, and database names
+        # are not necessarily valid file names.
+        self._dir = cache_dir / _hash_name(instance_name)
+
+    def _get_path(self, dbname: str) -> pathlib.Path:
+        return self._dir / f'{_hash_name(dbname)}.pickle'
+
+    def load(
+        self,
+        dbname: str,
+        version_key: VersionKey,
+    ) -> List[Tuple[Any, Any]]:
+        path = self._get_path(dbname)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, entries = pickle.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception:
+            logger.warning(
+                'could not load persisted query cache of database %r',
+                dbname, exc_info=True,
+            )
+            self.discard(dbname)
+            return []
+
+        if stored_key != version_key:
+            self.discard(dbname)
+            return []
+
+        return entries
+
+    def save(
+        self,
+        dbname: str,
+        version_key: VersionKey,
+        entries: List[Tuple[Any, Any]],
+    ) -> None:
+        if not entries:
+            self.discard(dbname)
+            return
+
+        self._dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename so that a crash never
+        # leaves a truncated cache behind.
+        fd, tmp = tempfile.mkstemp(dir=self._dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((version_key, entries), f, -1)
+            os.replace(tmp, self._get_path(dbname))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def discard(self, dbname: str) -> None:
+        try:
+            self._get_path(dbname).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _hash_name(name: str) -> str:
+    return hashlib.sha1(name.encode('utf-8')).hexdigest()
@@ -457,8 +457,15 @@ class BaseServer:
     async def introspect_global_schema(
         self, conn: pgcon.PGConnection
     ) -> s_schema.Schema:
-        intro_query = self._global_intro_query
-        json_data = await conn.sql_fetch_val(intro_query)
+        json_data = await self.introspect_global_schema_json(conn)
+        return self.parse_global_schema(json_data)
+
+    async def introspect_global_schema_json(
+        self, conn: pgcon.PGConnection
+    ) -> bytes:
+        return await conn.sql_fetch_val(self._global_intro_query)
+
+    def parse_global_schema(self, json_data: str | bytes) -> s_schema.Schema:
         return s_refl.parse_into(
             base_schema=self._std_schema,
             schema=s_schema.EMPTY_SCHEMA,
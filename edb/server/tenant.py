@@ -24,6 +24,7 @@ import contextlib
 import functools
 import json
 import logging
+import os
 import pathlib
 import struct
 import sys
@@ -43,6 +44,9 @@ from . import dbview
 from . import defines
 from . import metrics
 from . import pgcon
+from . import pgreplica
+from . import pgshard
+from . import query_cache
 from .compiler_pool import pool as compiler_pool
 from .ha import adaptive as adaptive_ha
 from .ha import base as ha_base
@@ -57,6 +61,52 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger("edb.server")
 
+# When acquiring a backend connection to run a prepared statement, prefer
+# an idle connection that has the statement prepared already.
+PREPARED_STMT_AFFINITY = os.getenv(
+    'EDGEDB_SERVER_PG_PREPARED_STATEMENT_AFFINITY', '1') == '1'
+# When acquiring a backend connection for a client with a session state,
+# prefer an idle connection that has the same state in effect already.
+SESSION_STATE_AFFINITY = os.getenv(
+    'EDGEDB_SERVER_PG_SESSION_STATE_AFFINITY', '1') == '1'
+# When greater than 1, up to this many read-only queries of different
+# clients run on one backend connection at a time, see
+# acquire_pipelined_pgcon().
+PG_PIPELINE_DEPTH = int(os.getenv('EDGEDB_SERVER_PG_PIPELINE_DEPTH', 1))
+# Number of backend connections opened to every database at startup,
+# before any client asks for them.
+PG_POOL_WARM_UP_CONNS = int(os.getenv(
+    'EDGEDB_SERVER_BACKEND_POOL_WARM_UP_CONNECTIONS', 0))
+# Open backend connections ahead of the load expected from the recent
+# acquire rate of every database, see connpool.Pool._predict().
+PG_POOL_PREDICTIVE = os.getenv(
+    'EDGEDB_SERVER_BACKEND_POOL_PREDICTIVE', '0') == '1'
+# A JSON object mapping database names to their backend connection pool
+# policies, e.g. {"main": {"weight": 2, "reserved": 10}}; see
+# connpool.Pool.set_policy().
+PG_POOL_POLICIES = os.getenv('EDGEDB_SERVER_BACKEND_POOL_POLICIES')
+# How often the backend connection pool stats are exported as metrics
+# when the pool is not busy enough to report them itself, in seconds.
+PG_POOL_STATS_INTERVAL = float(os.getenv(
+    'EDGEDB_SERVER_BACKEND_POOL_STATS_INTERVAL', 10))
+
+
+def _score_pgcon(
+    conn: pgcon.PGConnection,
+    *,
+    prepared_stmt: tuple[bytes, int] | None,
+    state: bytes | None,
+) -> int:
+    # Restoring a session state takes several statements and rewrites a
+    # temporary table, so a matching state weighs more than a prepared
+    # statement.
+    score = 0
+    if state is not None and conn.has_state(state):
+        score += 2
+    if prepared_stmt is not None and conn.has_prepared_stmt(*prepared_stmt):
+        score += 1
+    return score
+
 
 class RoleDescriptor(TypedDict):
     superuser: bool
@@ -88,6 +138,10 @@ class Tenant(ha_base.ClusterProtocol):
     _suggested_client_pool_size: int
     _pg_pool: connpool.Pool
     _pg_unavailable_msg: str | None
+    _read_replicas: list[pgreplica.ReadReplica]
+    _shards: list[pgshard.Shard]
+    # The shard numbers of the existing databases, see _get_dbnames().
+    _db_shards: dict[str, int]
 
     _ha_master_serial: int
     _backend_adaptive_ha: adaptive_ha.AdaptiveHASupport | None
@@ -106,6 +160,8 @@ class Tenant(ha_base.ClusterProtocol):
     _jwt_revocation_list_file: pathlib.Path | None
     _jwt_revocation_list: frozenset[str] | None
 
+    _query_cache_store: query_cache.PersistentQueryCache | None
+
     def __init__(
         self,
         cluster: pgcluster.BaseCluster,
@@ -155,8 +211,31 @@ class Tenant(ha_base.ClusterProtocol):
             disconnect=self._pg_disconnect,
             # 1 connection is reserved for the system DB
             max_capacity=max_backend_connections - 1,
+            stats_collector=self._on_pg_pool_stats,
+            predictive=PG_POOL_PREDICTIVE,
         )
+        self._pg_pool_reported_dbs: set[str] = set()
+        if PG_POOL_POLICIES:
+            for dbname, policy in json.loads(PG_POOL_POLICIES).items():
+                self._pg_pool.set_policy(dbname, **policy)
         self._pg_unavailable_msg = None
+        # Backend connections shared by pipelined queries, per database,
+        # with the number of queries using them.
+        self._pipelined_pgcons: dict[
+            str, dict[pgcon.PGConnection, int]] = {}
+        self._read_replicas = [
+            pgreplica.ReadReplica(dsn, self)
+            for dsn in pgreplica.READ_REPLICA_DSNS
+        ]
+        self._next_read_replica = 0
+        # The WAL position on the primary after the last schema change
+        # known here, and the number of those being fetched; replicas are
+        # only used once they have replayed up to it.
+        self._ddl_lsn = 0
+        self._ddl_lsn_pending = 0
+        # Shards are connected to in init().
+        self._shards = []
+        self._db_shards = {}
         self._block_new_connections = set()
         self._report_config_data = {}
 
@@ -170,6 +249,12 @@ class Tenant(ha_base.ClusterProtocol):
         self._jwt_revocation_list_file = jwt_revocation_list_file
         self._jwt_revocation_list = None
 
+        if query_cache.QUERY_CACHE_DIR:
+            self._query_cache_store = query_cache.PersistentQueryCache(
+                pathlib.Path(query_cache.QUERY_CACHE_DIR), instance_name)
+        else:
+            self._query_cache_store = None
+
     def set_server(self, server: edbserver.BaseServer) -> None:
         self._server = server
         self.__loop = server.get_loop()
@@ -200,11 +285,76 @@ class Tenant(ha_base.ClusterProtocol):
                 call_on_switch_over=False
             )
 
+    def _on_pg_pool_stats(self, stats: connpool.Snapshot) -> None:
+        name = self._instance_name
+        metrics.backend_pool_capacity.set(stats.capacity, name)
+        reported_dbs = set()
+        for block in stats.blocks:
+            reported_dbs.add(block.dbname)
+            metrics.backend_pool_connections.set(
+                block.nconns + block.npending, name, block.dbname)
+            metrics.backend_pool_quota.set(block.quota, name, block.dbname)
+            metrics.backend_pool_waiters.set(
+                block.nwaiters, name, block.dbname)
+        for dbname in self._pg_pool_reported_dbs - reported_dbs:
+            # The pool dropped the block of an unused database.
+            metrics.backend_pool_connections.set(0, name, dbname)
+            metrics.backend_pool_quota.set(0, name, dbname)
+            metrics.backend_pool_waiters.set(0, name, dbname)
+        self._pg_pool_reported_dbs = reported_dbs
+        for entry in stats.log:
+            if entry.event not in ('set-quota', 'reset-quota'):
+                metrics.backend_pool_events.inc(
+                    1.0, name, entry.dbname, entry.event)
+
     def get_active_pgcon_num(self) -> int:
-        return (
-            self._pg_pool.current_capacity - self._pg_pool.get_pending_conns()
+        return sum(
+            pool.current_capacity - pool.get_pending_conns()
+            for pool in self._iter_pg_pools()
         )
 
+    def _iter_pg_pools(self) -> Iterator[connpool.Pool]:
+        yield self._pg_pool
+        for shard in self._shards:
+            yield shard.pool
+
+    def _get_shard(self, dbname: str) -> pgshard.Shard | None:
+        """Return the shard *dbname* is placed on, None for home."""
+        if not self._shards:
+            return None
+        number = self._db_shards.get(dbname)
+        if number is None:
+            number = pgshard.get_placement(dbname, len(self._shards) + 1)
+        if number == pgshard.HOME:
+            return None
+        return self._shards[number - 1]
+
+    def _get_pg_pool(self, dbname: str) -> connpool.Pool:
+        shard = self._get_shard(dbname)
+        return self._pg_pool if shard is None else shard.pool
+
+    def is_same_backend(self, dbname: str, other_dbname: str) -> bool:
+        """Whether the two databases are placed on the same cluster."""
+        return self._get_shard(dbname) is self._get_shard(other_dbname)
+
+    async def _init_shards(self) -> None:
+        nshards = len(pgshard.BACKEND_SHARD_DSNS) + 1
+        for dbname, number in pgshard.BACKEND_SHARD_MAP.items():
+            if not 0 <= number < nshards:
+                raise errors.ConfigurationError(
+                    f"database {dbname!r} is mapped to backend shard "
+                    f"{number}, but there are only {nshards} backend "
+                    f"clusters"
+                )
+        server_settings = self._cluster.get_connection_params().server_settings
+        for number, dsn in enumerate(pgshard.BACKEND_SHARD_DSNS, 1):
+            shard = await pgshard.create_shard(
+                number, dsn, self, server_settings=server_settings)
+            if PG_POOL_POLICIES:
+                for dbname, policy in json.loads(PG_POOL_POLICIES).items():
+                    shard.pool.set_policy(dbname, **policy)
+            self._shards.append(shard)
+
     @property
     def client_id(self) -> int:
         return self._cluster.get_client_id()
@@ -224,7 +374,15 @@ class Tenant(ha_base.ClusterProtocol):
     def get_pg_dbname(self, dbname: str) -> str:
         return self._cluster.get_db_name(dbname)
 
-    def get_pgaddr(self) -> Dict[str, Any]:
+    def get_pgaddr(self, dbname: str | None = None) -> Dict[str, Any]:
+        """Return the address of the cluster *dbname* is placed on.
+
+        The home cluster if *dbname* is None.
+        """
+        if dbname is not None:
+            shard = self._get_shard(dbname)
+            if shard is not None:
+                return shard.get_pgaddr()
         return self._cluster.get_connection_spec()
 
     @functools.lru_cache
@@ -299,6 +457,8 @@ class Tenant(ha_base.ClusterProtocol):
         self._sys_pgcon_reconnect_evt = asyncio.Event()
 
     async def init(self) -> None:
+        await self._init_shards()
+
         async with self.use_sys_pgcon() as syscon:
             result = await syscon.sql_fetch_val(
                 b"""\
@@ -352,10 +512,30 @@ class Tenant(ha_base.ClusterProtocol):
         await self._task_group.__aenter__()
         self._accept_new_tasks = True
         await self._cluster.start_watching(self.on_switch_over)
+        for shard in self._shards:
+            await shard.start_watching()
+        if self._query_cache_store is not None:
+            self.create_task(
+                self._persist_query_caches_loop(), interruptable=True)
+        self.create_task(self._report_pg_pool_stats_loop(), interruptable=True)
+        for replica in self._read_replicas:
+            self.create_task(replica.monitor(), interruptable=True)
+        if self._read_replicas:
+            # The replicas may not have replayed the schema we start with.
+            self.on_schema_change()
 
     def start_running(self) -> None:
         self._running = True
         self._accepting_connections = True
+        if PG_POOL_WARM_UP_CONNS:
+            self._warm_up_pg_pool()
+
+    def _warm_up_pg_pool(self) -> None:
+        assert self._dbindex is not None
+        for db in self._dbindex.iter_dbs():
+            if self.is_database_connectable(db.name):
+                self._get_pg_pool(db.name).warm_up(
+                    db.name, PG_POOL_WARM_UP_CONNS)
 
     def stop_accepting_connections(self) -> None:
         self._accepting_connections = False
@@ -392,8 +572,14 @@ class Tenant(ha_base.ClusterProtocol):
         self._running = False
         self._accept_new_tasks = False
         self._cluster.stop_watching()
+        for shard in self._shards:
+            shard.stop_watching()
+        for replica in self._read_replicas:
+            replica.close()
 
     async def wait_stopped(self) -> None:
+        if self._query_cache_store is not None:
+            await self._persist_query_caches()
         if self._task_group is not None:
             tg = self._task_group
             self._task_group = None
@@ -447,6 +633,12 @@ class Tenant(ha_base.ClusterProtocol):
         self,
         dbname: str,
     ) -> AsyncGenerator[pgcon.PGConnection, None]:
+        shard = self._get_shard(dbname)
+        if shard is not None:
+            async with shard.direct_pgcon(dbname) as conn:
+                yield conn
+            return
+
         conn = None
         try:
             conn = await self._pg_connect(dbname)
@@ -455,6 +647,24 @@ class Tenant(ha_base.ClusterProtocol):
             if conn is not None:
                 await self._pg_disconnect(conn)
 
+    @contextlib.asynccontextmanager
+    async def direct_sys_pgcon(
+        self,
+        dbname: str,
+    ) -> AsyncGenerator[pgcon.PGConnection, None]:
+        """Connect to the system database of the cluster of *dbname*.
+
+        For running CREATE and DROP DATABASE on the backend cluster that
+        the database is placed on.
+        """
+        shard = self._get_shard(dbname)
+        if shard is None:
+            async with self.direct_pgcon(defines.EDGEDB_SYSTEM_DB) as conn:
+                yield conn
+        else:
+            async with shard.direct_pgcon(defines.EDGEDB_SYSTEM_DB) as conn:
+                yield conn
+
     @contextlib.asynccontextmanager
     async def use_sys_pgcon(self) -> AsyncGenerator[pgcon.PGConnection, None]:
         if not self._initing and not self._running:
@@ -483,8 +693,9 @@ class Tenant(ha_base.ClusterProtocol):
             self._sys_pgcon_waiter.release()
 
     def set_stmt_cache_size(self, size: int) -> None:
-        for conn in self._pg_pool.iterate_connections():
-            conn.set_stmt_cache_size(size)
+        for pool in self._iter_pg_pools():
+            for conn in pool.iterate_connections():
+                conn.set_stmt_cache_size(size)
 
     def on_sys_pgcon_parameter_status_updated(
         self,
@@ -623,19 +834,53 @@ class Tenant(ha_base.ClusterProtocol):
         if msg is None or self._pg_unavailable_msg is None:
             self._pg_unavailable_msg = msg
 
-    async def acquire_pgcon(self, dbname: str) -> pgcon.PGConnection:
+    async def acquire_pgcon(
+        self,
+        dbname: str,
+        *,
+        prepared_stmt: tuple[bytes, int] | None = None,
+        state: bytes | None = None,
+    ) -> pgcon.PGConnection:
+        """Acquire a backend connection to *dbname*.
+
+        *prepared_stmt* is the (name, dbver) of the prepared statement
+        the connection is going to run, if any, and *state* the
+        serialized session state it is going to run with.
+        """
         if self._pg_unavailable_msg is not None:
             raise errors.BackendUnavailableError(
                 "Postgres is not available: " + self._pg_unavailable_msg
             )
 
-        for _ in range(self._pg_pool.max_capacity):
-            conn = await self._pg_pool.acquire(dbname)
+        if not PREPARED_STMT_AFFINITY:
+            prepared_stmt = None
+        if not SESSION_STATE_AFFINITY:
+            state = None
+        prefer: Callable[[pgcon.PGConnection], int] | None = None
+        if prepared_stmt is not None or state is not None:
+            prefer = functools.partial(
+                _score_pgcon, prepared_stmt=prepared_stmt, state=state)
+
+        pool = self._get_pg_pool(dbname)
+        for _ in range(pool.max_capacity):
+            started_at = time.monotonic()
+            conn = await pool.acquire(dbname, prefer=prefer)
+            metrics.backend_connection_acquire_wait_duration.observe(
+                time.monotonic() - started_at, self._instance_name, dbname)
             if conn.is_healthy():
+                if prepared_stmt is not None:
+                    metrics.backend_connection_affinity.inc(
+                        1.0,
+                        'hit' if conn.has_prepared_stmt(*prepared_stmt)
+                        else 'miss',
+                    )
+                if state is not None:
+                    metrics.backend_state_affinity.inc(
+                        1.0, 'hit' if conn.has_state(state) else 'miss')
                 return conn
             else:
                 logger.warning("Acquired an unhealthy pgcon; discard now.")
-                self._pg_pool.release(dbname, conn, discard=True)
+                pool.release(dbname, conn, discard=True)
         else:
             # This is unlikely to happen, but we defer to the caller to retry
             # when it does happen
@@ -656,11 +901,105 @@ class Tenant(ha_base.ClusterProtocol):
                 logger.warning("Released an unhealthy pgcon; discard now.")
             discard = True
         try:
-            self._pg_pool.release(dbname, conn, discard=discard)
+            self._get_pg_pool(dbname).release(dbname, conn, discard=discard)
         except Exception:
             metrics.background_errors.inc(1.0, "release_pgcon")
             raise
 
+    def is_pipelining_enabled(self) -> bool:
+        return PG_PIPELINE_DEPTH > 1
+
+    async def acquire_pipelined_pgcon(
+        self, dbname: str
+    ) -> pgcon.PGConnection:
+        """Acquire a backend connection shared with other clients.
+
+        The connection may only be used with
+        PGConnection.pipelined_parse_execute() and must be returned with
+        release_pipelined_pgcon().  A connection already shared by fewer
+        than PG_PIPELINE_DEPTH queries is preferred to taking a new one
+        from the pool, so that waiting for a free connection is avoided.
+        """
+        conns = self._pipelined_pgcons.get(dbname)
+        if conns:
+            for conn, users in conns.items():
+                if users < PG_PIPELINE_DEPTH and conn.can_pipeline():
+                    conns[conn] = users + 1
+                    metrics.backend_connection_pipelining.inc(1.0, 'shared')
+                    return conn
+
+        conn = await self.acquire_pgcon(dbname)
+        metrics.backend_connection_pipelining.inc(1.0, 'acquired')
+        self._pipelined_pgcons.setdefault(dbname, {})[conn] = 1
+        return conn
+
+    def release_pipelined_pgcon(
+        self, dbname: str, conn: pgcon.PGConnection
+    ) -> None:
+        conns = self._pipelined_pgcons[dbname]
+        users = conns[conn] - 1
+        if users:
+            conns[conn] = users
+            return
+
+        # The last query using the connection is done with it.
+        del conns[conn]
+        if not conns:
+            del self._pipelined_pgcons[dbname]
+        self.release_pgcon(dbname, conn)
+
+    def has_read_replicas(self, dbname: str) -> bool:
+        # Read replicas replicate the home cluster only.
+        return bool(self._read_replicas) and self._get_shard(dbname) is None
+
+    def get_read_replica(self) -> pgreplica.ReadReplica | None:
+        """Pick a read replica to run a read-only query on.
+
+        Replicas are used in turns; the ones that cannot be reached or
+        lag behind too much are skipped.  Returns None if the query
+        should run on the primary.
+        """
+        if self._ddl_lsn_pending:
+            metrics.read_replica_fallbacks.inc(1.0, 'ddl')
+            return None
+        replicas = self._read_replicas
+        for i in range(len(replicas)):
+            replica = replicas[(self._next_read_replica + i) % len(replicas)]
+            if replica.is_available(self._ddl_lsn):
+                self._next_read_replica = (
+                    self._next_read_replica + i + 1) % len(replicas)
+                metrics.read_replica_queries.inc(1.0, replica.name)
+                return replica
+        metrics.read_replica_fallbacks.inc(1.0, 'unavailable')
+        return None
+
+    def on_schema_change(self) -> None:
+        """Record that the schema has changed, for the read replicas.
+
+        Queries compiled for the new schema may use tables that a replica
+        does not have until it has replayed the change, so queries stay
+        on the primary until the replicas have replayed the WAL up to the
+        current position.
+        """
+        if not self._read_replicas or not self._accept_new_tasks:
+            return
+
+        self._ddl_lsn_pending += 1
+
+        async def task():
+            try:
+                async with self.use_sys_pgcon() as con:
+                    lsn = await con.sql_fetch_val(pgreplica.CURRENT_LSN_QUERY)
+                self._ddl_lsn = max(
+                    self._ddl_lsn, pgreplica.parse_lsn(lsn.decode('utf-8')))
+            except Exception:
+                metrics.background_errors.inc(1.0, "fetch_ddl_lsn")
+                raise
+            finally:
+                self._ddl_lsn_pending -= 1
+
+        self.create_task(task(), interruptable=False)
+
     def allow_database_connections(self, dbname: str) -> None:
         self._block_new_connections.discard(dbname)
 
@@ -681,7 +1020,8 @@ class Tenant(ha_base.ClusterProtocol):
             self._block_new_connections.add(dbname)
 
             # Prune our inactive connections.
-            await self._pg_pool.prune_inactive_connections(dbname)
+            await self._get_pg_pool(dbname).prune_inactive_connections(
+                dbname)
 
             # Signal adjacent servers to prune their connections to this
             # database.
@@ -700,18 +1040,22 @@ class Tenant(ha_base.ClusterProtocol):
                     await self._pg_ensure_database_not_connected(dbname)
 
     async def _pg_ensure_database_not_connected(self, dbname: str) -> None:
-        async with self.use_sys_pgcon() as pgcon:
-            conns = await pgcon.sql_fetch_col(
-                b"""
-                SELECT
-                    pid
-                FROM
-                    pg_stat_activity
-                WHERE
-                    datname = $1
-                """,
-                args=[dbname.encode("utf-8")],
-            )
+        query = b"""
+            SELECT
+                pid
+            FROM
+                pg_stat_activity
+            WHERE
+                datname = $1
+        """
+        args = [dbname.encode("utf-8")]
+        shard = self._get_shard(dbname)
+        if shard is None:
+            async with self.use_sys_pgcon() as pgcon:
+                conns = await pgcon.sql_fetch_col(query, args=args)
+        else:
+            async with shard.direct_pgcon(defines.EDGEDB_SYSTEM_DB) as pgcon:
+                conns = await pgcon.sql_fetch_col(query, args=args)
 
         if conns:
             raise errors.ExecutionError(
@@ -853,6 +1197,71 @@ class Tenant(ha_base.ClusterProtocol):
         finally:
             self.release_pgcon(dbname, conn)
 
+        await self._warm_up_query_cache(dbname)
+
+    async def _warm_up_query_cache(self, dbname: str) -> None:
+        if self._query_cache_store is None:
+            return
+        assert self._dbindex is not None
+        db = self._dbindex.get_db(dbname)
+        global_schema = self._dbindex.get_global_schema()
+        version_key = query_cache.get_version_key(
+            db.user_schema, global_schema)
+        # Unpickling a large cache takes a while, keep it off the loop.
+        entries = await self.__loop.run_in_executor(
+            None, self._query_cache_store.load, dbname, version_key)
+        if (
+            entries
+            and self._dbindex.maybe_get_db(dbname) is db
+            and query_cache.get_version_key(
+                db.user_schema, self._dbindex.get_global_schema()
+            ) == version_key
+        ):
+            db.warm_up_query_cache(entries)
+            logger.info(
+                "loaded %d compiled queries for database '%s' from "
+                "the persistent query cache", len(entries), dbname,
+            )
+
+    async def _persist_query_caches(self) -> None:
+        assert self._query_cache_store is not None
+        if self._dbindex is None:
+            return
+        global_schema = self._dbindex.get_global_schema()
+        for db in list(self._dbindex.iter_dbs()):
+            if db.user_schema is None:
+                continue
+            entries = db.get_persistable_query_cache()
+            if entries is None:
+                continue
+            try:
+                # Pickling and writing the cache is slow, do it in a
+                # thread so that clients are not stalled.
+                await self.__loop.run_in_executor(
+                    None,
+                    self._query_cache_store.save,
+                    db.name,
+                    query_cache.get_version_key(db.user_schema, global_schema),
+                    entries,
+                )
+            except Exception:
+                db.mark_query_cache_unpersisted()
+                metrics.background_errors.inc(1.0, "persist_query_cache")
+                logger.exception(
+                    "could not persist the query cache of database '%s'",
+                    db.name,
+                )
+
+    async def _report_pg_pool_stats_loop(self) -> None:
+        while True:
+            await asyncio.sleep(PG_POOL_STATS_INTERVAL)
+            self._pg_pool.report_stats()
+
+    async def _persist_query_caches_loop(self) -> None:
+        while True:
+            await asyncio.sleep(query_cache.QUERY_CACHE_SAVE_INTERVAL)
+            await self._persist_query_caches()
+
     async def _early_introspect_db(self, dbname: str) -> None:
         """We need to always introspect the extensions for each database.
 
@@ -882,9 +1291,35 @@ class Tenant(ha_base.ClusterProtocol):
         finally:
             self.release_pgcon(dbname, conn)
 
-    async def _introspect_dbs(self) -> None:
+    async def _get_dbnames(self) -> list[str]:
+        """List the databases of all backend clusters.
+
+        Also records which cluster every database is placed on.
+        """
         async with self.use_sys_pgcon() as syscon:
             dbnames = await self._server.get_dbnames(syscon)
+        if not self._shards:
+            return dbnames
+
+        found: dict[str, list[int]] = {
+            dbname: [pgshard.HOME] for dbname in dbnames
+        }
+        for shard in self._shards:
+            for dbname in await shard.get_dbnames():
+                found.setdefault(dbname, []).append(shard.number)
+        self._place_existing_dbs(found)
+        return list(found)
+
+    def _place_existing_dbs(self, found: dict[str, list[int]]) -> None:
+        # *found* maps database names to the clusters they exist on.
+        # Merged, so that the placement of the databases being created,
+        # recorded by on_before_create_db(), is kept.
+        for dbname, numbers in found.items():
+            self._db_shards[dbname] = pgshard.get_existing_placement(
+                dbname, numbers)
+
+    async def _introspect_dbs(self) -> None:
+        dbnames = await self._get_dbnames()
 
         async with taskgroup.TaskGroup(name="introspect DB extensions") as g:
             for dbname in dbnames:
@@ -935,7 +1370,46 @@ class Tenant(ha_base.ClusterProtocol):
             return await self._server.introspect_global_schema(conn)
         else:
             async with self.use_sys_pgcon() as syscon:
-                return await self._server.introspect_global_schema(syscon)
+                return await self._introspect_all_global_schema(syscon)
+
+    async def _introspect_all_global_schema(
+        self,
+        syscon: pgcon.PGConnection,
+    ) -> s_schema.Schema:
+        """Introspect the global schema of all backend clusters.
+
+        The global objects come from the home cluster, except for the
+        databases placed on shards, which are only known to the system
+        database of their shard.
+        """
+        json_data = await self._server.introspect_global_schema_json(syscon)
+        if not self._shards:
+            return self._server.parse_global_schema(json_data)
+
+        entries = []
+        databases: dict[str, dict[int, Any]] = {}
+        for entry in json.loads(json_data):
+            if entry['_tname'] == 'sys::Database':
+                databases[entry['name__internal']] = {pgshard.HOME: entry}
+            else:
+                entries.append(entry)
+        for shard in self._shards:
+            async with shard.direct_pgcon(defines.EDGEDB_SYSTEM_DB) as conn:
+                shard_data = await self._server.introspect_global_schema_json(
+                    conn)
+            for entry in json.loads(shard_data):
+                if entry['_tname'] == 'sys::Database':
+                    found = databases.setdefault(entry['name__internal'], {})
+                    found[shard.number] = entry
+
+        # A database existing on several clusters, e.g. the default
+        # database of every bootstrapped shard, is the one of the
+        # cluster it is used on.
+        self._place_existing_dbs(
+            {dbname: list(found) for dbname, found in databases.items()})
+        for dbname, found in databases.items():
+            entries.append(found[self._db_shards[dbname]])
+        return self._server.parse_global_schema(json.dumps(entries))
 
     async def _reintrospect_global_schema(self) -> None:
         if not self._initing and not self._running:
@@ -945,7 +1419,8 @@ class Tenant(ha_base.ClusterProtocol):
             )
             return
         async with self.use_sys_pgcon() as syscon:
-            new_global_schema = await self.introspect_global_schema(syscon)
+            new_global_schema = await self._introspect_all_global_schema(
+                syscon)
             assert self._dbindex is not None
             self._dbindex.update_global_schema(new_global_schema)
             await self._fetch_roles(syscon)
@@ -1112,6 +1587,26 @@ class Tenant(ha_base.ClusterProtocol):
 
         await self.ensure_database_not_connected(dbname)
 
+    def on_before_create_db(
+        self, dbname: str, template: str | None
+    ) -> None:
+        if not self._shards:
+            return
+        if template is None:
+            number = pgshard.get_placement(dbname, len(self._shards) + 1)
+        else:
+            # Postgres copies the template within a cluster only.
+            shard = self._get_shard(template)
+            number = pgshard.HOME if shard is None else shard.number
+            mapped = pgshard.BACKEND_SHARD_MAP.get(dbname, number)
+            if mapped != number:
+                raise errors.ExecutionError(
+                    f"cannot create database {dbname!r} on backend shard "
+                    f"{mapped} from template database {template!r} on "
+                    f"backend shard {number}"
+                )
+        self._db_shards[dbname] = number
+
     async def on_before_create_db_from_template(
         self, dbname: str, current_dbname: str
     ) -> None:
@@ -1129,6 +1624,9 @@ class Tenant(ha_base.ClusterProtocol):
             if self._dbindex.has_db(dbname):
                 self._dbindex.unregister_db(dbname)
             self._block_new_connections.discard(dbname)
+            self._db_shards.pop(dbname, None)
+            if self._query_cache_store is not None:
+                self._query_cache_store.discard(dbname)
         except Exception:
             metrics.background_errors.inc(1.0, "on_after_drop_db")
             raise
@@ -1193,7 +1691,8 @@ class Tenant(ha_base.ClusterProtocol):
 
         async def task():
             try:
-                await self._pg_pool.prune_inactive_connections(dbname)
+                await self._get_pg_pool(dbname).prune_inactive_connections(
+                    dbname)
             except Exception:
                 metrics.background_errors.inc(1.0, "remote_db_quarantine")
                 raise
@@ -1206,6 +1705,8 @@ class Tenant(ha_base.ClusterProtocol):
 
         # Triggered by a postgres notification event 'schema-changes'
         # on the __edgedb_sysevent__ channel
+        self.on_schema_change()
+
         async def task():
             try:
                 await self.introspect_db(dbname)
@@ -1222,8 +1723,7 @@ class Tenant(ha_base.ClusterProtocol):
         # Triggered by a postgres notification event 'database-changes'
         # on the __edgedb_sysevent__ channel
         async def task():
-            async with self.use_sys_pgcon() as syscon:
-                dbnames = set(await self._server.get_dbnames(syscon))
+            dbnames = set(await self._get_dbnames())
 
             tg = taskgroup.TaskGroup(name="new database introspection")
             async with tg as g:
@@ -1320,6 +1820,16 @@ class Tenant(ha_base.ClusterProtocol):
                 k: v for k, v in self.get_pgaddr().items() if k not in ["ssl"]
             },
             pg_pool=self._pg_pool._build_snapshot(now=time.monotonic()),
+            pg_shards=[
+                dict(
+                    pg_addr={
+                        k: v for k, v in shard.get_pgaddr().items()
+                        if k not in ["ssl"]
+                    },
+                    pg_pool=shard.pool._build_snapshot(now=time.monotonic()),
+                )
+                for shard in self._shards
+            ],
         )
 
         def serialize_config(cfg):
@@ -685,6 +685,13 @@ class ClusterTestCase(BaseHTTPTestCase):
         host, port = conargs['host'], conargs['port']
         return _fetch_metrics(host, port)
 
+    @classmethod
+    def fetch_server_info(cls) -> dict[str, Any]:
+        assert cls.cluster is not None
+        conargs = cls.cluster.get_connect_args()
+        host, port = conargs['host'], conargs['port']
+        return _fetch_server_info(host, port)
+
     @classmethod
     def get_connect_args(
         cls,
@@ -71,3 +71,66 @@ class TestLRU(unittest.TestCase):
 
         l[k4] = l[k4]
         self.assertEqual(list(l), [k1, k5, k4])
+
+    def test_lru_items_no_promotion(self):
+        l = lru.LRUMapping(maxsize=3)  # noqa
+
+        k1 = Key('1')
+        k2 = Key('2')
+
+        l[k1] = '1'
+        l[k2] = '2'
+
+        self.assertEqual(list(l.items()), [(k1, '1'), (k2, '2')])
+        self.assertEqual(list(l), [k1, k2])
+
+    def test_lru_replace_no_promotion(self):
+        l = lru.LRUMapping(maxsize=3, maxweight=10, weigher=len)  # noqa
+
+        l['a'] = 'xxx'
+        l['b'] = 'xx'
+
+        l.replace('a', 'x')
+        self.assertEqual(list(l.items()), [('a', 'x'), ('b', 'xx')])
+        self.assertEqual(l.weight, 3)
+
+        with self.assertRaises(KeyError):
+            l.replace('c', 'x')
+        self.assertNotIn('c', l)
+
+    def test_lru_weighted(self):
+        evicted = []
+        l = lru.LRUMapping(  # noqa
+            maxsize=10,
+            maxweight=10,
+            weigher=len,
+            on_evict=lambda k, v: evicted.append(k),
+        )
+
+        l['a'] = 'xxx'
+        l['b'] = 'xxxx'
+        l['c'] = 'xxx'
+        self.assertEqual(l.weight, 10)
+        self.assertEqual(list(l), ['a', 'b', 'c'])
+
+        self.assertEqual(l['a'], 'xxx')
+        l['d'] = 'xx'
+        self.assertEqual(list(l), ['c', 'a', 'd'])
+        self.assertEqual(evicted, ['b'])
+        self.assertEqual(l.weight, 8)
+
+        l['a'] = 'x'
+        self.assertEqual(l.weight, 6)
+
+        del l['c']
+        self.assertEqual(l.weight, 3)
+
+        # An entry heavier than maxweight evicts everything else,
+        # but is kept itself.
+        l['e'] = 'x' * 20
+        self.assertEqual(list(l), ['e'])
+        self.assertEqual(evicted, ['b', 'd', 'a'])
+        self.assertEqual(l.weight, 20)
+
+        l.clear()
+        self.assertEqual(l.weight, 0)
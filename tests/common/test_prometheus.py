@@ -358,3 +358,51 @@ class TestPrometheusClient(unittest.TestCase):
         pmc_r = run_pmc()
         emc_r = run_emc()
         self.assertEqual(pmc_r, emc_r)
+
+    def test_prometheus_08(self):
+
+        def run_pmc():
+            registry = PMC.Registry()
+
+            test_hist = PMC.Histogram(
+                'test_labeled_hist_seconds', 'A test labeled histogram',
+                labelnames=['h1'], registry=registry)
+
+            r1 = PMC.generate(registry)
+
+            test_hist.labels('spam').observe(0.22)
+            test_hist.labels('spam').observe(2.0)
+
+            r2 = PMC.generate(registry)
+
+            test_hist.labels('ham"').observe(-1)
+
+            r3 = PMC.generate(registry)
+
+            return [r1, r2, r3]
+
+        def run_emc():
+            r = EP.Registry()
+
+            test_hist = r.new_labeled_histogram(
+                'test_labeled_hist', 'A test labeled histogram',
+                unit=prom.Unit.SECONDS,
+                labels=('h1',)
+            )
+
+            r1 = r.generate()
+
+            test_hist.observe(0.22, 'spam')
+            test_hist.observe(2.0, 'spam')
+
+            r2 = r.generate()
+
+            test_hist.observe(-1, 'ham"')
+
+            r3 = r.generate()
+
+            return [r1, r2, r3]
+
+        pmc_r = run_pmc()
+        emc_r = run_emc()
+        self.assertEqual(pmc_r, emc_r)
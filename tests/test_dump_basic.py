@@ -16,11 +16,14 @@
 # limitations under the License.
 #
 
+import asyncio
 import hashlib
 import os
 import random
 import tempfile
 
+import edgedb
+
 from edb.testbase import server as tb
 
 
@@ -118,3 +121,81 @@ class TestDumpBasics(tb.DatabaseTestCase, tb.CLITestCaseMixin):
         finally:
             await con2.aclose()
             await tb.drop_db(self.con, restored_dbname)
+
+    async def test_dump_parallel_01(self):
+        if not self.has_create_database:
+            self.skipTest('create database is not supported by the backend')
+
+        # Dump over several backend connections and restore with the
+        # plain indexes built after the data is loaded.
+        env = {
+            'EDGEDB_SERVER_DUMP_PARALLELISM': '4',
+            'EDGEDB_SERVER_RESTORE_DEFERRED_INDEX_WORKERS': '4',
+        }
+        async with tb.start_edgedb_server(env=env) as sd:
+            con = await sd.connect()
+            try:
+                await con.execute('CREATE DATABASE dump_parallel')
+                await con.execute('CREATE DATABASE dump_parallel_restored')
+            finally:
+                await con.aclose()
+
+            con = await sd.connect(database='dump_parallel')
+            try:
+                for i in range(4):
+                    await con.execute(f'''
+                        CREATE TYPE default::T{i} {{
+                            CREATE REQUIRED PROPERTY idx -> int64 {{
+                                CREATE CONSTRAINT exclusive;
+                            }};
+                            CREATE PROPERTY name -> str;
+                            CREATE INDEX ON (.name);
+                        }};
+                        FOR x IN range_unpack(range(0, 1000))
+                        UNION (INSERT default::T{i} {{
+                            idx := x,
+                            name := <str>x,
+                        }});
+                    ''')
+            finally:
+                await con.aclose()
+
+            conn_args = sd.get_connect_args()
+            with tempfile.NamedTemporaryFile() as f:
+                await asyncio.to_thread(
+                    self.run_cli_on_connection, conn_args,
+                    '-d', 'dump_parallel', 'dump', f.name,
+                )
+                await asyncio.to_thread(
+                    self.run_cli_on_connection, conn_args,
+                    '-d', 'dump_parallel_restored', 'restore', f.name,
+                )
+
+            con = await sd.connect(database='dump_parallel_restored')
+            try:
+                for i in range(4):
+                    r = await con.query_single(f'''
+                        SELECT (
+                            count := count(default::T{i}),
+                            sum := sum(default::T{i}.idx),
+                            names := count(DISTINCT default::T{i}.name),
+                        )
+                    ''')
+                    self.assertEqual(
+                        (r.count, r.sum, r.names), (1000, 499500, 1000))
+                self.assertEqual(
+                    await con.query('''
+                        SELECT count(
+                            schema::ObjectType.indexes
+                            FILTER schema::ObjectType.name LIKE 'default::T%'
+                        )
+                    '''),
+                    [4],
+                )
+                # The exclusive constraints were not dropped.
+                with self.assertRaises(edgedb.ConstraintViolationError):
+                    await con.execute('''
+                        INSERT default::T0 { idx := 0 }
+                    ''')
+            finally:
+                await con.aclose()
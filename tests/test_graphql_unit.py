@@ -0,0 +1,267 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2024-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import os
+import pathlib
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+import graphql as gql
+
+from edb import graphql
+from edb.graphql import compiler as gql_compiler
+from edb.graphql import types as gql_types
+from edb.schema import schema as s_schema
+from edb.testbase import lang as tb
+
+
+class TestGraphQLCoreSchema(tb.BaseSchemaTest):
+    SCHEMA_DEFAULT = os.path.join(os.path.dirname(__file__), 'schemas',
+                                  'graphql.esdl')
+
+    SCHEMA_OTHER = os.path.join(os.path.dirname(__file__), 'schemas',
+                                'graphql_other.esdl')
+
+    QUERIES = [
+        r'''
+            query {
+                User {
+                    name
+                    groups {
+                        name
+                    }
+                }
+            }
+        ''',
+        r'''
+            query {
+                User(filter: {groups: {settings: {value: {eq: "blue"}}}}) {
+                    name
+                    profile {
+                        value
+                        owner_user {
+                            name
+                        }
+                    }
+                }
+            }
+        ''',
+        r'''
+            query {
+                other__Foo(order: {color: {dir: ASC}}) {
+                    color
+                }
+            }
+        ''',
+        r'''
+            query {
+                User {
+                    name
+                    missing
+                }
+            }
+        ''',
+    ]
+
+    def _get_eager_schema(self):
+        # The GraphQL schema that collects all of its types upfront.
+        lazy = graphql.GQLCoreSchema(self.schema).graphql_schema
+        return gql.GraphQLSchema(
+            query=lazy.query_type,
+            mutation=lazy.mutation_type,
+            types=lazy._types,
+            assume_valid=True,
+        )
+
+    def _validate(self, schema, query):
+        return [
+            error.message
+            for error in gql.validate(schema, gql.parse(query))
+        ]
+
+    def _introspect(self, schema, *, sort_types=False):
+        result = gql.graphql_sync(schema, gql.get_introspection_query())
+        self.assertIsNone(result.errors)
+        if sort_types:
+            result.data['__schema']['types'].sort(key=lambda t: t['name'])
+        return result.data
+
+    def test_graphql_schema_lazy_01(self):
+        lazy = graphql.GQLCoreSchema(self.schema).graphql_schema
+        eager = self._get_eager_schema()
+
+        # Validating queries only resolves the types they refer to, which
+        # may or may not complete the type map.
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self._validate(lazy, query),
+                    self._validate(eager, query),
+                )
+
+        self.assertEqual(gql.print_schema(lazy), gql.print_schema(eager))
+        self.assertEqual(self._introspect(lazy), self._introspect(eager))
+
+    def test_graphql_schema_lazy_02(self):
+        # Introspection lists all the types before any is resolved.
+        lazy = graphql.GQLCoreSchema(self.schema).graphql_schema
+        eager = self._get_eager_schema()
+
+        self.assertEqual(self._introspect(lazy), self._introspect(eager))
+        self.assertEqual(gql.print_schema(lazy), gql.print_schema(eager))
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self._validate(lazy, query),
+                    self._validate(eager, query),
+                )
+
+    def test_graphql_schema_sdl_01(self):
+        # A schema built from the SDL of another one is equivalent to it.
+        sdl = graphql.GQLCoreSchema(self.schema).get_sdl()
+        loaded = graphql.GQLCoreSchema(self.schema, sdl=sdl).graphql_schema
+        eager = self._get_eager_schema()
+
+        # The custom scalars are not in the SDL, so they are listed
+        # first by the loaded schema.
+        self.assertEqual(
+            self._introspect(loaded, sort_types=True),
+            self._introspect(eager, sort_types=True),
+        )
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self._validate(loaded, query),
+                    self._validate(eager, query),
+                )
+
+        # The custom scalars keep their coercion.
+        for name, scalar in gql_types.CUSTOM_SCALARS.items():
+            with self.subTest(name=name):
+                loaded_scalar = loaded.get_type(name)
+                self.assertIs(loaded_scalar.serialize, scalar.serialize)
+                self.assertIs(loaded_scalar.parse_value, scalar.parse_value)
+                self.assertIs(
+                    loaded_scalar.parse_literal, scalar.parse_literal)
+
+    def test_graphql_schema_sdl_02(self):
+        # A schema built from SDL only resolves the fields of the types
+        # a query refers to.
+        sdl = graphql.GQLCoreSchema(self.schema).get_sdl()
+        loaded = graphql.GQLCoreSchema(self.schema, sdl=sdl).graphql_schema
+        self.assertEqual(self._validate(loaded, self.QUERIES[0]), [])
+
+        # The fields of a type are a cached property once resolved.
+        self.assertIn('fields', vars(loaded.get_type('User')))
+        self.assertNotIn('fields', vars(loaded.get_type('other__Foo')))
+
+    def test_graphql_schema_sdl_cache(self):
+        # The first worker to build a schema produces its SDL in the
+        # background, and the schema is then built from it.
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(gql_compiler._get_gqlcore.cache_clear)
+        gql_compiler._get_gqlcore.cache_clear()
+        # The test schema is not split into std, user and global ones.
+        schemas = (s_schema.EMPTY_SCHEMA, self.schema, s_schema.EMPTY_SCHEMA)
+
+        with unittest.mock.patch.object(
+            gql_compiler, 'GRAPHQL_SCHEMA_CACHE_DIR', tmp.name,
+        ), unittest.mock.patch.object(
+            gql_compiler, '_get_version_key', return_value='v1',
+        ):
+            built = gql_compiler._get_gqlcore(*schemas)
+            self.assertIsNone(built._sdl)
+            for thread in threading.enumerate():
+                if thread.name == 'graphql-sdl':
+                    thread.join()
+
+            gql_compiler._get_gqlcore.cache_clear()
+            loaded = gql_compiler._get_gqlcore(*schemas)
+            self.assertIsNot(loaded, built)
+            self.assertEqual(loaded._sdl, built.get_sdl())
+            # The claim on producing the SDL is released.
+            self.assertEqual(
+                [p.suffix for p in pathlib.Path(tmp.name).iterdir()],
+                ['.graphql'],
+            )
+
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self._validate(loaded.graphql_schema, query),
+                    self._validate(built.graphql_schema, query),
+                )
+
+
+class TestGraphQLSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = pathlib.Path(tmp.name) / 'graphql'
+
+    def test_graphql_schema_cache_save_load(self):
+        self.assertIsNone(gql_compiler._load_sdl(self.cache_dir, 'v1'))
+
+        gql_compiler._save_sdl(self.cache_dir, 'v1', 'type Foo')
+        gql_compiler._save_sdl(self.cache_dir, 'v2', 'type Bar')
+        self.assertEqual(
+            gql_compiler._load_sdl(self.cache_dir, 'v1'), 'type Foo')
+        self.assertEqual(
+            gql_compiler._load_sdl(self.cache_dir, 'v2'), 'type Bar')
+        self.assertIsNone(gql_compiler._load_sdl(self.cache_dir, 'v3'))
+
+        # No temporary files are left behind.
+        self.assertEqual(
+            sorted(p.suffix for p in self.cache_dir.iterdir()),
+            ['.graphql', '.graphql'],
+        )
+
+    def test_graphql_schema_cache_version_mismatch(self):
+        # A file written for another version key is not used.
+        path = gql_compiler._get_sdl_path(self.cache_dir, 'v1')
+        self.cache_dir.mkdir()
+        path.write_text('# v0\ntype Foo', encoding='utf-8')
+        self.assertIsNone(gql_compiler._load_sdl(self.cache_dir, 'v1'))
+
+    def test_graphql_schema_cache_prune(self):
+        def save(key, mtime):
+            gql_compiler._save_sdl(self.cache_dir, key, f'# {key}')
+            path = gql_compiler._get_sdl_path(self.cache_dir, key)
+            os.utime(path, (mtime, mtime))
+
+        with unittest.mock.patch.object(
+            gql_compiler, 'GRAPHQL_SCHEMA_CACHE_SIZE', 2,
+        ):
+            save('v1', 1000)
+            save('v2', 2000)
+            # Loading marks v1 as the most recently used.
+            self.assertIsNotNone(gql_compiler._load_sdl(self.cache_dir, 'v1'))
+            save('v3', 3000)
+
+            self.assertIsNotNone(gql_compiler._load_sdl(self.cache_dir, 'v1'))
+            self.assertIsNone(gql_compiler._load_sdl(self.cache_dir, 'v2'))
+            self.assertIsNotNone(gql_compiler._load_sdl(self.cache_dir, 'v3'))
+
+            # Pruning keeps at most the configured number of files.
+            save('v4', 4000)
+            self.assertEqual(len(list(self.cache_dir.glob('*.graphql'))), 2)
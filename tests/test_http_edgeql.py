@@ -18,6 +18,7 @@
 
 
 import os
+import uuid
 
 import edgedb
 
@@ -268,6 +269,56 @@ class TestHttpEdgeQL(tb.EdgeQLTestCase):
             )
         )
 
+    def test_http_edgeql_query_14(self):
+        # Literals are extracted into arguments of their own type,
+        # alongside the JSON variables.
+        for i in range(3):
+            self.assert_edgeql_query_result(
+                f'''
+                    SELECT (
+                        <int64>$x + {i},
+                        <str>$y ++ 'z{i}',
+                        {i}.5,
+                        {i}n,
+                    )
+                ''',
+                [[i + 10, f'yz{i}', i + 0.5, i]],
+                variables={'x': 10, 'y': 'y'},
+            )
+
+        for i in range(3):
+            self.assert_edgeql_query_result(
+                f'''SELECT {i}; SELECT 'x{i}';''',
+                [f'x{i}'],
+            )
+
+        with self.assertRaisesRegex(
+                edgedb.QueryError,
+                r'do not accept positional parameters'):
+            self.edgeql_query(
+                r'''SELECT <int64>$0 + 1''',
+                variables={'0': 1},
+            )
+
+    def test_http_edgeql_query_15(self):
+        # Queries that differ only in their literals share a compiled
+        # query, so they add a single entry to the query cache of the
+        # database.  Tests of other classes use other databases.
+        N = 20
+
+        def cache_size():
+            databases = self.fetch_server_info()['databases']
+            return databases[self.get_database_name()]['query_cache_size']
+
+        name = f'x_{uuid.uuid4().hex}'
+        orig_size = cache_size()
+        for i in range(N):
+            self.assert_edgeql_query_result(
+                f'''WITH {name} := {i} SELECT {name} + 1''',
+                [i + 1],
+            )
+        self.assertEqual(cache_size() - orig_size, 1)
+
     def test_http_edgeql_query_globals_01(self):
         Q = r'''select GlobalTest { gstr, garray, gid, gdef, gdef2 }'''
 
@@ -728,3 +728,85 @@ class TestServerCancellation(tb.TestCase):
             except Exception:
                 await con.aclose()
                 raise
+
+
+class TestServerFetchSize(tb.TestCase):
+
+    async def test_proto_fetch_size_slow_reader(self):
+        # The rows of a query are fetched from Postgres in batches and
+        # sent to a client that reads them slowly: all of them arrive,
+        # followed by the Sync that ends the implicit transaction.
+        N = 20000
+        async with tb.start_edgedb_server(
+            env={'EDGEDB_SERVER_PG_FETCH_SIZE': '100'},
+        ) as sd:
+            con = await sd.connect_test_protocol()
+            try:
+                await con.send(
+                    protocol.Execute(
+                        annotations=[],
+                        allowed_capabilities=protocol.Capability.ALL,
+                        compilation_flags=protocol.CompilationFlag(0),
+                        implicit_limit=0,
+                        # The rows are large enough to fill up the socket
+                        # buffers.
+                        command_text=(
+                            f"select str_repeat('x', 1000) ++ ' ' "
+                            f"++ <str>range_unpack(range(0, {N}))"
+                        ),
+                        output_format=protocol.OutputFormat.BINARY,
+                        expected_cardinality=protocol.Cardinality.MANY,
+                        input_typedesc_id=b'\0' * 16,
+                        output_typedesc_id=b'\0' * 16,
+                        state_typedesc_id=b'\0' * 16,
+                        arguments=b'',
+                        state_data=b'',
+                    ),
+                    protocol.Sync(),
+                )
+                await con.recv_match(protocol.CommandDataDescription)
+
+                values = set()
+                while True:
+                    msg = await con.recv()
+                    if not isinstance(msg, protocol.Data):
+                        break
+                    values.add(int(msg.data[0].data.split(b' ')[1]))
+                    if len(values) % 1000 == 0:
+                        # Let the server run into the backpressure.
+                        await asyncio.sleep(0.1)
+
+                self.assertIsInstance(msg, protocol.CommandComplete)
+                self.assertEqual(values, set(range(N)))
+                await con.recv_match(
+                    protocol.ReadyForCommand,
+                    transaction_state=(
+                        protocol.TransactionState.NOT_IN_TRANSACTION),
+                )
+
+                # The backend connection was left synced.
+                await con.send(
+                    protocol.Execute(
+                        annotations=[],
+                        allowed_capabilities=protocol.Capability.ALL,
+                        compilation_flags=protocol.CompilationFlag(0),
+                        implicit_limit=0,
+                        command_text='select 42',
+                        output_format=protocol.OutputFormat.NONE,
+                        expected_cardinality=protocol.Cardinality.MANY,
+                        input_typedesc_id=b'\0' * 16,
+                        output_typedesc_id=b'\0' * 16,
+                        state_typedesc_id=b'\0' * 16,
+                        arguments=b'',
+                        state_data=b'',
+                    ),
+                    protocol.Sync(),
+                )
+                await con.recv_match(protocol.CommandComplete, status='SELECT')
+                await con.recv_match(
+                    protocol.ReadyForCommand,
+                    transaction_state=(
+                        protocol.TransactionState.NOT_IN_TRANSACTION),
+                )
+            finally:
+                await con.aclose()
@@ -20,6 +20,8 @@
 from __future__ import annotations
 from typing import *
 
+import copy
+import pickle
 import re
 
 from edb import errors
@@ -35,13 +37,13 @@ from edb.schema import links as s_links
 from edb.schema import name as s_name
 from edb.schema import objtypes as s_objtypes
 from edb.schema import properties as s_props
+from edb.schema import schema as s_schema
+
+from edb.server import query_cache
 
 from edb.testbase import lang as tb
 from edb.tools import test
 
-if TYPE_CHECKING:
-    from edb.schema import schema as s_schema
-
 
 class TestSchema(tb.BaseSchemaLoadTest):
     DEFAULT_MODULE = 'test'
@@ -2270,6 +2272,112 @@ class TestSchema(tb.BaseSchemaLoadTest):
         }
         """
 
+    def test_schema_flat_delta_01(self):
+        schema = tb._load_std_schema()
+        schema = self.run_ddl(schema, '''
+            CREATE MODULE default;
+            CREATE TYPE default::Foo {
+                CREATE PROPERTY bar -> str;
+            };
+            CREATE TYPE default::Spam;
+        ''')
+
+        new_schema = self.run_ddl(schema, '''
+            ALTER TYPE default::Foo {
+                CREATE PROPERTY baz -> int64;
+            };
+            DROP TYPE default::Spam;
+        ''')
+
+        delta = new_schema.get_delta(schema)
+        self.assertIsNotNone(delta)
+        self.assertEqual(delta.base_generation, schema._generation)
+
+        # The delta must survive the trip to a compiler worker.
+        base = pickle.loads(pickle.dumps(schema, -1))
+        delta = pickle.loads(pickle.dumps(delta, -1))
+        patched = base.apply_delta(delta)
+
+        self.assertEqual(patched._generation, new_schema._generation)
+        self.assertEqual(patched._id_to_data, new_schema._id_to_data)
+        self.assertEqual(patched._id_to_type, new_schema._id_to_type)
+        self.assertEqual(patched._name_to_id, new_schema._name_to_id)
+        self.assertEqual(patched._refs_to, new_schema._refs_to)
+        self.assertIsNotNone(patched.get('default::Foo', None))
+        self.assertIsNone(patched.get('default::Spam', None))
+
+        with self.assertRaisesRegex(
+            errors.SchemaError, 'expected base generation'
+        ):
+            new_schema.apply_delta(delta)
+
+    def test_schema_flat_fingerprint_01(self):
+        schema = tb._load_std_schema()
+        schema = self.run_ddl(schema, '''
+            CREATE MODULE default;
+            CREATE TYPE default::Foo {
+                CREATE PROPERTY bar -> str;
+            };
+        ''')
+
+        unpickled = pickle.loads(pickle.dumps(schema, -1))
+        self.assertEqual(
+            schema.get_fingerprint(), unpickled.get_fingerprint())
+
+        new_schema = self.run_ddl(schema, '''
+            ALTER TYPE default::Foo {
+                CREATE PROPERTY baz -> int64;
+            };
+        ''')
+        self.assertNotEqual(
+            schema.get_fingerprint(), new_schema.get_fingerprint())
+
+    def test_schema_flat_delta_02(self):
+        schema = tb._load_std_schema()
+        new_schema = self.run_ddl(schema, '''
+            CREATE MODULE default;
+            CREATE TYPE default::Foo;
+        ''')
+
+        self.assertIsNone(new_schema.get_delta(schema, max_ratio=0))
+
+    def test_schema_get_objects_index_01(self):
+        schema = tb._load_std_schema()
+        schema = self.run_ddl(schema, '''
+            CREATE MODULE default;
+            CREATE MODULE other;
+            CREATE TYPE default::Foo;
+            CREATE TYPE default::Bar;
+            CREATE TYPE other::Baz;
+            ALTER TYPE default::Bar RENAME TO other::Bar;
+            DROP TYPE default::Foo;
+        ''')
+
+        def names(**kwargs):
+            return {
+                str(o.get_name(schema))
+                for o in schema.get_objects(
+                    type=s_objtypes.ObjectType, **kwargs)
+            }
+
+        self.assertEqual(
+            names(included_modules=[s_name.UnqualName('other')]),
+            {'other::Bar', 'other::Baz'},
+        )
+        self.assertEqual(
+            names(included_modules=[s_name.UnqualName('default')]),
+            set(),
+        )
+        self.assertTrue(
+            {'other::Bar', 'other::Baz'} < names(),
+        )
+
+        # Indexes maintained incrementally must match freshly built ones.
+        rebuilt = copy.copy(schema)
+        rebuilt._build_indexes()
+        self.assertEqual(rebuilt._module_to_ids, schema._module_to_ids)
+        self.assertEqual(rebuilt._type_to_ids, schema._type_to_ids)
+
 
 class TestGetMigration(tb.BaseSchemaLoadTest):
     """Test migration deparse consistency.
@@ -9936,3 +10044,173 @@ class TestCreateMigration(tb.BaseSchemaTest):
                 }};
             '''
         )
+
+
+class TestSchemaChanges(tb.BaseSchemaTest):
+
+    BASE_DDL = '''
+        CREATE MODULE default;
+        CREATE MODULE other;
+        CREATE SCALAR TYPE default::Status EXTENDING enum<A, B>;
+        CREATE SCALAR TYPE default::Code EXTENDING std::str;
+        CREATE TYPE default::Foo {
+            CREATE PROPERTY name -> std::str;
+            CREATE PROPERTY status -> default::Status;
+        };
+        CREATE TYPE default::SubFoo EXTENDING default::Foo;
+        CREATE TYPE default::Bar {
+            CREATE PROPERTY val -> std::int64;
+            CREATE PROPERTY codes -> array<default::Code>;
+        };
+    '''
+
+    QUERY = 'SELECT Foo { name }'
+
+    def _get_schema_deps(self, schema, query):
+        ir = qlcompiler.compile_ast_to_ir(
+            qlparser.parse_query(query),
+            schema,
+            options=qlcompiler.CompilerOptions(
+                modaliases={None: 'default'},
+            ),
+        )
+        return frozenset(obj.id for obj in ir.schema_refs)
+
+    def _get_affected(self, old_schema, new_schema):
+        # The test schemas include std, so it is not chained separately.
+        return query_cache.get_affected_objects(
+            old_schema,
+            new_schema,
+            s_schema.EMPTY_SCHEMA,
+            s_schema.EMPTY_SCHEMA,
+        )
+
+    def _assert_query_affected(self, ddl, affected, query=QUERY):
+        old_schema = self.run_ddl(self.schema, self.BASE_DDL)
+        deps = self._get_schema_deps(old_schema, query)
+        foo = old_schema.get('default::Foo')
+        self.assertIn(foo.id, deps)
+
+        new_schema = self.run_ddl(old_schema, ddl)
+        result = self._get_affected(old_schema, new_schema)
+        if affected:
+            self.assertTrue(result is None or not deps.isdisjoint(result))
+        else:
+            self.assertIsNotNone(result)
+            self.assertTrue(deps.isdisjoint(result))
+        return result
+
+    def test_schema_changes_objects(self):
+        old_schema = self.run_ddl(self.schema, self.BASE_DDL)
+        new_schema = self.run_ddl(old_schema, '''
+            CREATE TYPE default::Baz;
+            ALTER TYPE default::Foo {
+                ALTER PROPERTY name SET readonly := true;
+            };
+            DROP TYPE default::Bar;
+        ''')
+
+        created, altered, deleted = new_schema.get_object_changes(old_schema)
+        self.assertFalse(created & altered)
+        self.assertFalse((created | altered) & deleted)
+
+        baz = new_schema.get('default::Baz')
+        self.assertIn(baz.id, created)
+
+        foo = new_schema.get('default::Foo')
+        name = foo.getptr(new_schema, s_name.UnqualName('name'))
+        self.assertIn(name.id, altered)
+        subfoo = new_schema.get('default::SubFoo')
+        self.assertIn(
+            subfoo.getptr(new_schema, s_name.UnqualName('name')).id,
+            altered,
+        )
+
+        bar = old_schema.get('default::Bar')
+        self.assertIn(bar.id, deleted)
+        self.assertIn(
+            bar.getptr(old_schema, s_name.UnqualName('val')).id,
+            deleted,
+        )
+
+        # Objects untouched by the DDL are not reported.
+        changed = created | altered | deleted
+        self.assertNotIn(old_schema.get('std::str').id, changed)
+
+        self.assertEqual(
+            new_schema.get_object_changes(new_schema),
+            (set(), set(), set()),
+        )
+
+    def test_schema_changes_unrelated_annotation(self):
+        affected = self._assert_query_affected('''
+            ALTER TYPE default::Bar {
+                CREATE ANNOTATION std::title := 'bar';
+            };
+        ''', affected=False)
+
+        old_schema = self.run_ddl(self.schema, self.BASE_DDL)
+        self.assertIn(old_schema.get('default::Bar').id, affected)
+
+    def test_schema_changes_altered_pointer(self):
+        self._assert_query_affected('''
+            ALTER TYPE default::Foo {
+                ALTER PROPERTY name SET readonly := true;
+            };
+        ''', affected=True)
+
+    def test_schema_changes_enum(self):
+        # Queries record the pointers to the scalar types they use, not
+        # the types themselves.
+        query = 'SELECT Foo { status }'
+        old_schema = self.run_ddl(self.schema, self.BASE_DDL)
+        status = old_schema.get('default::Status')
+        self.assertNotIn(
+            status.id, self._get_schema_deps(old_schema, query))
+
+        affected = self._assert_query_affected('''
+            ALTER SCALAR TYPE default::Status EXTENDING enum<A, B, C>;
+        ''', affected=True, query=query)
+        self.assertIn(status.id, affected)
+
+    def test_schema_changes_scalar(self):
+        # A change to a scalar type affects the types with pointers to
+        # collections of it, and only them.
+        affected = self._assert_query_affected('''
+            ALTER SCALAR TYPE default::Code {
+                CREATE CONSTRAINT std::max_len_value(10);
+            };
+        ''', affected=False)
+
+        old_schema = self.run_ddl(self.schema, self.BASE_DDL)
+        self.assertIn(old_schema.get('default::Code').id, affected)
+        self.assertIn(old_schema.get('default::Bar').id, affected)
+        self.assertFalse(
+            self._get_schema_deps(old_schema, 'SELECT Bar { codes }')
+            .isdisjoint(affected)
+        )
+
+    def test_schema_changes_subtype_access_policy(self):
+        self._assert_query_affected('''
+            ALTER TYPE default::SubFoo {
+                CREATE ACCESS POLICY hide_all ALLOW SELECT USING (false);
+            };
+        ''', affected=True)
+
+    def test_schema_changes_shadowing_name(self):
+        # A function shadowing std::len may change what existing
+        # queries resolve to, so all of them are invalidated.
+        affected = self._assert_query_affected('''
+            CREATE FUNCTION default::len(s: std::str) -> std::int64
+                USING (1);
+        ''', affected=True)
+        self.assertIsNone(affected)
+
+        # So does a type with the name of a type in another module.
+        old_schema = self.run_ddl(self.schema, self.BASE_DDL)
+        new_schema = self.run_ddl(old_schema, 'CREATE TYPE other::Foo;')
+        self.assertIsNone(self._get_affected(old_schema, new_schema))
+
+        # A new name is not.
+        new_schema = self.run_ddl(old_schema, 'CREATE TYPE other::Baz;')
+        self.assertIsNotNone(self._get_affected(old_schema, new_schema))
@@ -21,20 +21,24 @@ import contextlib
 import os
 import pickle
 import signal
+import struct
 import subprocess
 import sys
 import tempfile
 import time
+import types
 import unittest.mock
 
 import immutables
 
 from edb import edgeql
+from edb import errors
 from edb.testbase import lang as tb
 from edb.testbase import server as tbs
 from edb.server import args as edbargs
 from edb.server import compiler as edbcompiler
 from edb.server import config
+from edb.server.compiler import dbstate
 from edb.server.compiler_pool import amsg
 from edb.server.compiler_pool import pool
 from edb.server.dbview import dbview
@@ -264,6 +268,85 @@ class TestAmsg(tbs.TestCase):
                     os.kill(pid, 0)
 
 
+class TestAmsgMessages(unittest.TestCase):
+
+    BLOB = bytes(range(256)) * 16
+
+    def _frame(self, msg):
+        return struct.pack('!Q', len(msg)) + msg
+
+    def test_server_compiler_amsg_encode_01(self):
+        obj = (
+            'compile',
+            amsg.out_of_band([self.BLOB, b'small', 42, None]),
+        )
+        parts = amsg.encode_message(obj)
+        msg = memoryview(b''.join(parts))
+        name, (blob, small, num, none) = amsg.decode_message(msg)
+
+        self.assertEqual(name, 'compile')
+        self.assertEqual(small, b'small')
+        self.assertEqual(num, 42)
+        self.assertIsNone(none)
+        # The large blob is sent out-of-band and decoded as a zero-copy
+        # slice of the message.
+        self.assertIsInstance(blob, memoryview)
+        self.assertIs(blob.obj, msg.obj)
+        self.assertEqual(bytes(blob), self.BLOB)
+        self.assertIn(self.BLOB, parts)
+
+    def test_server_compiler_amsg_encode_02(self):
+        # Plain pickles are still accepted.
+        obj = ('compile', (self.BLOB, 1))
+        self.assertEqual(
+            amsg.decode_message(memoryview(pickle.dumps(obj, -1))),
+            obj,
+        )
+
+    def test_server_compiler_amsg_stream_01(self):
+        msgs = [
+            b'a' * 10,
+            b''.join(amsg.encode_message(amsg.out_of_band([self.BLOB]))),
+            b'b',
+            b'c' * 100,
+        ]
+        data = b''.join(self._frame(msg) for msg in msgs)
+
+        for chunk_size in (1, 3, 8, 9, 100, 1000, len(data)):
+            with self.subTest(chunk_size=chunk_size):
+                stream = amsg.MessageStream()
+                received = []
+                for i in range(0, len(data), chunk_size):
+                    received.extend(
+                        bytes(msg)
+                        for msg in stream.feed_data(data[i:i + chunk_size])
+                    )
+                self.assertEqual(received, msgs)
+                self.assertEqual(stream._buffered, 0)
+
+    def test_server_compiler_amsg_stream_02(self):
+        # Messages within a single chunk are not copied.
+        data = self._frame(b'first') + self._frame(b'second')
+        stream = amsg.MessageStream()
+        received = list(stream.feed_data(data))
+        self.assertEqual([bytes(m) for m in received], [b'first', b'second'])
+        self.assertTrue(all(m.obj is data for m in received))
+
+    def test_server_compiler_amsg_stream_03(self):
+        # A message split across chunks is joined once, and the
+        # rest of the last chunk is kept for the next message.
+        blob = b''.join(amsg.encode_message(amsg.out_of_band([self.BLOB])))
+        data = self._frame(blob) + self._frame(b'next')
+        split = len(data) // 3
+        stream = amsg.MessageStream()
+        self.assertEqual(list(stream.feed_data(data[:split])), [])
+        received = list(stream.feed_data(data[split:]))
+        self.assertEqual(len(received), 2)
+        self.assertEqual(
+            bytes(amsg.decode_message(received[0])[0]), self.BLOB)
+        self.assertEqual(bytes(received[1]), b'next')
+
+
 class TestServerCompilerPool(tbs.TestCase):
     def _wait_pids(self, *pids, timeout=1):
         remaining = list(pids)
@@ -386,7 +469,8 @@ class TestCompilerPool(tbs.TestCase):
         result = tb._load_reflection_schema()
         cls._refl_schema, cls._schema_class_layout = result
 
-    async def _test_pool_disconnect_queue(self, pool_class):
+    @contextlib.asynccontextmanager
+    async def _start_pool(self, pool_class):
         with tempfile.TemporaryDirectory() as td:
             pool_ = pool.create_compiler_pool(
                 runstate_dir=td,
@@ -397,58 +481,353 @@ class TestCompilerPool(tbs.TestCase):
                 schema_class_layout=self._schema_class_layout,
                 pool_class=pool_class,
             )
-            pool_.add_dbindex(
-                0,
-                dbview.DatabaseIndex(
-                    unittest.mock.MagicMock(),
-                    std_schema=self._std_schema,
-                    global_schema=None,
-                    sys_config={},
-                    default_sysconfig=immutables.Map(),
-                    sys_config_spec=config.load_spec_from_schema(
-                        self._std_schema),
-                ),
-            )
+            pool_.add_dbindex(0, self._new_dbindex())
             await pool_.start()
             # HACK: For adaptive pool, force the creation of a second
             # worker. This is needed to work around issue #4680, where
             # we won't scale up from a single connection.
             if issubclass(pool_class, pool.SimpleAdaptivePool):
                 await pool_._create_worker()
-
+                await asyncio.wait_for(
+                    self._wait_workers(pool_, 2), SHORT_WAIT)
             try:
-                w1 = await pool_._acquire_worker()
-                w2 = await pool_._acquire_worker()
-                with self.assertRaises(AttributeError):
-                    await w1.call('nonexist')
-                with self.assertRaises(AttributeError):
-                    await w2.call('nonexist')
-                pool_._release_worker(w1)
-                pool_._release_worker(w2)
-
-                pool_._ready_evt.clear()
-                os.kill(w1.get_pid(), signal.SIGTERM)
-                os.kill(w2.get_pid(), signal.SIGTERM)
-                await asyncio.wait_for(pool_._ready_evt.wait(), LONG_WAIT)
-
-                context = edbcompiler.new_compiler_context(
-                    compiler_state=None,
-                    user_schema=self._std_schema,
-                    modaliases={None: 'default'},
-                )
-                await asyncio.gather(*(pool_.compile_in_tx(
-                    context.state.current_tx().id,
-                    pickle.dumps(context.state),
-                    0,
-                    edgeql.Source.from_string('SELECT 123'),
-                    edbcompiler.OutputFormat.BINARY,
-                    False, 101, False, True, (1, 0), True
-                ) for _ in range(4)))
+                yield pool_
             finally:
                 await pool_.stop()
 
+    def _new_dbindex(self):
+        return dbview.DatabaseIndex(
+            unittest.mock.MagicMock(),
+            std_schema=self._std_schema,
+            global_schema=None,
+            sys_config={},
+            default_sysconfig=immutables.Map(),
+            sys_config_spec=config.load_spec_from_schema(self._std_schema),
+        )
+
+    def _register_db(self, dbindex, dbname, user_schema):
+        dbindex.register_db(
+            dbname,
+            user_schema=user_schema,
+            db_config=immutables.Map(),
+            reflection_cache=immutables.Map(),
+            backend_ids={},
+            extensions=set(),
+        )
+        return dbindex.get_db(dbname)
+
+    def _cache_queries(self, db, *queries):
+        keys = []
+        for query in queries:
+            request = dbview.QueryRequestInfo(
+                edgeql.Source.from_string(query),
+                (2, 0),
+                output_format=edbcompiler.OutputFormat.BINARY,
+            )
+            keys.append(
+                (request, immutables.Map({None: 'default'}), immutables.Map())
+            )
+        group = dbstate.QueryUnitGroup()
+        group.append(dbstate.QueryUnit(sql=(b'SELECT 1',), status=b'SELECT'))
+        db.warm_up_query_cache([(key, group) for key in keys])
+        return keys
+
+    async def _wait_workers(self, pool_, num):
+        while len(pool_._workers) < num:
+            await asyncio.sleep(0.1)
+
+    def _compile_in_tx(self, pool_, txid, tx_state, query='SELECT 123', *,
+                       expect_rollback=False):
+        if not isinstance(tx_state, pool.TxState):
+            tx_state = pickle.dumps(tx_state)
+        return pool_.compile_in_tx(
+            txid,
+            tx_state,
+            0,
+            edgeql.Source.from_string(query),
+            edbcompiler.OutputFormat.BINARY,
+            False, 101, False, True, (1, 0), True,
+            False, expect_rollback,
+        )
+
+    def _new_tx_state(self):
+        context = edbcompiler.new_compiler_context(
+            compiler_state=None,
+            user_schema=self._std_schema,
+            modaliases={None: 'default'},
+        )
+        return context.state
+
+    async def _test_pool_disconnect_queue(self, pool_class):
+        async with self._start_pool(pool_class) as pool_:
+            w1 = await pool_._acquire_worker()
+            w2 = await pool_._acquire_worker()
+            with self.assertRaises(AttributeError):
+                await w1.call('nonexist')
+            with self.assertRaises(AttributeError):
+                await w2.call('nonexist')
+            pool_._release_worker(w1)
+            pool_._release_worker(w2)
+
+            pool_._ready_evt.clear()
+            os.kill(w1.get_pid(), signal.SIGTERM)
+            os.kill(w2.get_pid(), signal.SIGTERM)
+            await asyncio.wait_for(pool_._ready_evt.wait(), LONG_WAIT)
+
+            cstate = self._new_tx_state()
+            txid = cstate.current_tx().id
+            await asyncio.gather(*(
+                self._compile_in_tx(pool_, txid, cstate)
+                for _ in range(4)
+            ))
+
     async def test_server_compiler_pool_disconnect_queue_fixed(self):
         await self._test_pool_disconnect_queue(pool.FixedPool)
 
     async def test_server_compiler_pool_disconnect_queue_adaptive(self):
         await self._test_pool_disconnect_queue(pool.SimpleAdaptivePool)
+
+    async def test_server_compiler_pool_tx_state_01(self):
+        # The next statement waits for the busy worker holding the
+        # transaction state instead of moving the state elsewhere.
+        async with self._start_pool(pool.FixedPool) as pool_:
+            cstate = self._new_tx_state()
+            txid = cstate.current_tx().id
+            _, tx_state, _ = await self._compile_in_tx(pool_, txid, cstate)
+            self.assertIsInstance(tx_state, pool.TxState)
+            owner = tx_state.worker
+            self.assertIs(await pool_._acquire_owner(owner), owner)
+
+            task = asyncio.create_task(
+                self._compile_in_tx(pool_, txid, tx_state))
+            await asyncio.sleep(0.5)
+            self.assertFalse(task.done())
+            self.assertEqual(pool_._workers_queue.qsize(), 1)
+
+            pool_._release_worker(owner)
+            _, tx_state2, _ = await asyncio.wait_for(task, SHORT_WAIT)
+            self.assertIs(tx_state2.worker, owner)
+            self.assertIsNone(tx_state.pickled)
+            self.assertEqual(pool_._workers_queue.qsize(), 2)
+
+    async def test_server_compiler_pool_tx_state_02(self):
+        # Retiring a worker moves the transaction states out of it.
+        async with self._start_pool(pool.SimpleAdaptivePool) as pool_:
+            cstate = self._new_tx_state()
+            txid = cstate.current_tx().id
+            _, tx_state, _ = await self._compile_in_tx(pool_, txid, cstate)
+            owner = tx_state.worker
+
+            await pool_._retire_worker(owner)
+            self.assertNotIn(owner.get_pid(), pool_._workers)
+            self.assertIsNone(tx_state.worker)
+            self.assertIsNotNone(tx_state.pickled)
+
+            _, tx_state2, _ = await self._compile_in_tx(pool_, txid, tx_state)
+            self.assertIsNot(tx_state2.worker, owner)
+
+    async def test_server_compiler_pool_tx_state_03(self):
+        # The transaction state is lost with the worker exiting
+        # unexpectedly; the transaction fails but can be rolled back.
+        async with self._start_pool(pool.FixedPool) as pool_:
+            cstate = self._new_tx_state()
+            txid = cstate.current_tx().id
+            _, tx_state, _ = await self._compile_in_tx(pool_, txid, cstate)
+            owner = tx_state.worker
+
+            os.kill(owner.get_pid(), signal.SIGKILL)
+            while owner.get_pid() in pool_._workers:
+                await asyncio.sleep(0.1)
+
+            with self.assertRaisesRegex(
+                errors.TransactionError, 'must be rolled back'
+            ):
+                await self._compile_in_tx(pool_, txid, tx_state)
+
+            units, _, _ = await self._compile_in_tx(
+                pool_, txid, tx_state, 'ROLLBACK', expect_rollback=True)
+            self.assertTrue(units[0].tx_rollback)
+
+    def test_server_compiler_pool_recent_queries(self):
+        dbindex = self._new_dbindex()
+        db = self._register_db(dbindex, 'db', self._std_schema)
+        keys = self._cache_queries(db, 'SELECT 1', 'SELECT 2', 'SELECT 3')
+
+        # Most recent first.
+        self.assertEqual(db.get_recent_queries(10), keys[::-1])
+        self.assertEqual(db.get_recent_queries(2), keys[:0:-1])
+        self.assertEqual(db.get_recent_queries(0), [])
+
+        # Entries of the invalidated cache are not returned.
+        dbindex.register_db(
+            'db',
+            user_schema=self._std_schema,
+            db_config=immutables.Map(),
+            reflection_cache=immutables.Map(),
+            backend_ids={},
+            extensions={'ext'},
+        )
+        self.assertEqual(db.get_recent_queries(10), [])
+
+    def test_server_compiler_pool_warm_up_corpus(self):
+        dbindex = self._new_dbindex()
+        self._register_db(dbindex, 'not_introspected', None)
+        db1 = self._register_db(dbindex, 'db1', self._std_schema)
+        keys1 = self._cache_queries(db1, 'SELECT 1', 'SELECT 2')
+        db2 = self._register_db(dbindex, 'db2', self._std_schema)
+        keys2 = self._cache_queries(db2, 'SELECT 3', 'SELECT 4')
+        pool_ = types.SimpleNamespace(_warm_up_workers=True, _dbindex=dbindex)
+
+        with unittest.mock.patch.object(pool, 'WORKER_WARM_UP_QUERIES', 3):
+            corpus = pool.AbstractPool._get_warm_up_corpus(pool_)
+        self.assertEqual(
+            corpus,
+            [(db1, keys1[1]), (db1, keys1[0]), (db2, keys2[1])],
+        )
+
+        with unittest.mock.patch.object(pool, 'WORKER_WARM_UP_QUERIES', 0):
+            self.assertEqual(pool.AbstractPool._get_warm_up_corpus(pool_), [])
+
+        # The multi-tenant pool has no database index to warm up from.
+        self.assertFalse(pool.MultiTenantPool._warm_up_workers)
+        pool_._warm_up_workers = False
+        self.assertEqual(pool.AbstractPool._get_warm_up_corpus(pool_), [])
+
+    async def test_server_compiler_pool_warm_up_timeout(self):
+        # A slow compilation does not hold the worker back past the
+        # timeout, and the state it may have synced is sent again.
+        compiled = []
+
+        async def warm_up_query(worker, db, *args):
+            if db.name == 'slow':
+                await asyncio.sleep(LONG_WAIT)
+            compiled.append(db.name)
+            return True
+
+        dbs = [types.SimpleNamespace(name=name) for name in ['fast', 'slow']]
+        pool_ = types.SimpleNamespace(
+            _get_warm_up_corpus=lambda: [(db, (None,) * 3) for db in dbs],
+            _dbindex=unittest.mock.MagicMock(),
+            _warm_up_query=warm_up_query,
+        )
+        worker = types.SimpleNamespace(
+            _dbs=immutables.Map({'fast': object(), 'slow': object()}))
+
+        with unittest.mock.patch.object(pool, 'WORKER_WARM_UP_TIMEOUT', 0.1):
+            await asyncio.wait_for(
+                pool.AbstractPool._warm_up_worker(pool_, worker), SHORT_WAIT)
+
+        self.assertEqual(compiled, ['fast'])
+        self.assertEqual(list(worker._dbs.keys()), ['fast'])
+
+
+class TestAdaptivePoolScaling(unittest.TestCase):
+    NOW = 1000.0
+
+    def _new_pool(self, num_workers, *, max_size=4):
+        with unittest.mock.patch.object(pool, 'ADAPTIVE_MIN_POOL_SIZE', 1):
+            pool_ = pool.SimpleAdaptivePool(
+                loop=unittest.mock.MagicMock(),
+                runstate_dir=tempfile.gettempdir(),
+                pool_size=max_size,
+                backend_runtime_params=None,
+                std_schema=None,
+                refl_schema=None,
+                schema_class_layout=None,
+            )
+        pool_._create_worker = unittest.mock.MagicMock()
+        pool_._scale_down = unittest.mock.MagicMock()
+        pool_._workers = {
+            pid: types.SimpleNamespace(_acquired_at=None)
+            for pid in range(num_workers)
+        }
+        pool_._expected_num_workers = num_workers
+        return pool_
+
+    def test_server_compiler_pool_adaptive_load(self):
+        pool_ = self._new_pool(2)
+        now = self.NOW
+        pool_._wait_samples.extend([(now - 20, 5.0), (now - 1, 0.01)])
+        pool_._busy_samples.extend([(now - 20, 5.0), (now - 1, 5.0)])
+        pool_._workers[0]._acquired_at = now - 2
+
+        # Samples older than the window are dropped; the busy time of
+        # the workers still acquired counts.
+        wait_p95, busy_workers = pool_._get_load(now)
+        self.assertEqual(wait_p95, 0.01)
+        self.assertAlmostEqual(busy_workers, 0.7)
+
+        # A request still waiting counts with how long it has waited.
+        pool_._waiting_since[object()] = now - 2
+        pool_._waiting_since[object()] = now - 1
+        wait_p95, _ = pool_._get_load(now)
+        self.assertEqual(wait_p95, 2)
+
+    def test_server_compiler_pool_adaptive_scale_up(self):
+        pool_ = self._new_pool(2)
+        now = self.NOW
+        pool_._waiting_since[object()] = now - 1
+
+        pool_._maybe_scale(now)
+        pool_._create_worker.assert_not_called()
+        pool_._maybe_scale(now + pool.ADAPTIVE_SCALE_UP_WAIT_TIME)
+        pool_._create_worker.assert_called_once()
+
+        # Not beyond the maximum size.
+        pool_ = self._new_pool(4)
+        pool_._waiting_since[object()] = now - 1
+        pool_._maybe_scale(now)
+        pool_._maybe_scale(now + pool.ADAPTIVE_SCALE_UP_WAIT_TIME)
+        pool_._create_worker.assert_not_called()
+
+    def test_server_compiler_pool_adaptive_scale_down(self):
+        pool_ = self._new_pool(3)
+        now = self.NOW
+
+        pool_._maybe_scale(now)
+        pool_._scale_down.assert_not_called()
+        pool_._maybe_scale(now + pool.ADAPTIVE_SCALE_DOWN_WAIT_TIME)
+        pool_._scale_down.assert_called_once()
+
+        # Not below the pool size.
+        pool_ = self._new_pool(1)
+        pool_._maybe_scale(now)
+        pool_._maybe_scale(now + pool.ADAPTIVE_SCALE_DOWN_WAIT_TIME)
+        pool_._scale_down.assert_not_called()
+
+        # Not when the remaining workers would be too busy.
+        pool_ = self._new_pool(2)
+        pool_._busy_samples.append((now, pool.ADAPTIVE_SAMPLE_WINDOW))
+        pool_._maybe_scale(now)
+        pool_._maybe_scale(now + 1)
+        pool_._scale_down.assert_not_called()
+
+    def test_server_compiler_pool_adaptive_hysteresis(self):
+        now = self.NOW
+        target = pool.ADAPTIVE_TARGET_WAIT_TIME
+
+        def tick(pool_, t, wait_time=None):
+            pool_._wait_samples.clear()
+            if wait_time is not None:
+                pool_._wait_samples.append((t, wait_time))
+            pool_._maybe_scale(t)
+
+        # A wait time between the watermarks resets the scale-up timer.
+        pool_ = self._new_pool(2)
+        tick(pool_, now, target * 2)
+        tick(pool_, now + 1, target * 0.75)
+        tick(pool_, now + 2, target * 2)
+        tick(pool_, now + pool.ADAPTIVE_SCALE_UP_WAIT_TIME, target * 2)
+        pool_._create_worker.assert_not_called()
+        tick(pool_, now + 2 + pool.ADAPTIVE_SCALE_UP_WAIT_TIME, target * 2)
+        pool_._create_worker.assert_called_once()
+
+        # ... and so it does for the scale-down timer.
+        pool_ = self._new_pool(2)
+        tick(pool_, now)
+        tick(pool_, now + 1, target * 0.75)
+        tick(pool_, now + 2)
+        tick(pool_, now + pool.ADAPTIVE_SCALE_DOWN_WAIT_TIME)
+        pool_._scale_down.assert_not_called()
+        tick(pool_, now + 2 + pool.ADAPTIVE_SCALE_DOWN_WAIT_TIME)
+        pool_._scale_down.assert_called_once()
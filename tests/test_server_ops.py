@@ -1097,6 +1097,124 @@ class TestServerOps(tb.BaseHTTPTestCase, tb.CLITestCaseMixin):
             raise
         return cluster, connect_args
 
+    async def test_server_ops_pipelined_queries(self):
+        # Concurrent read-only queries of different clients share a
+        # backend connection.
+        KEY = 'edgedb_server_backend_connection_pipelining_total'
+        query = 'select count(range_unpack(range(0, 3000000)))'
+
+        def pipelined(sd, result):
+            for line in sd.fetch_metrics().split('\n'):
+                if line.startswith(f'{KEY}{{result="{result}"}}'):
+                    return float(line.split(' ')[1])
+            return 0.0
+
+        async with tb.start_edgedb_server(
+            env={'EDGEDB_SERVER_PG_PIPELINE_DEPTH': '4'},
+        ) as sd:
+            con1 = await sd.connect()
+            con2 = await sd.connect()
+            try:
+                # Compile the query first, so that both clients get to
+                # the backend at the same time.
+                self.assertEqual(await con1.query_single(query), 3000000)
+                self.assertEqual(await con2.query_single(query), 3000000)
+                self.assertEqual(pipelined(sd, 'shared'), 0)
+
+                for _ in range(5):
+                    results = await asyncio.gather(
+                        con1.query_single(query),
+                        con2.query_single(query),
+                    )
+                    self.assertEqual(results, [3000000, 3000000])
+                    if pipelined(sd, 'shared'):
+                        break
+                self.assertGreater(pipelined(sd, 'shared'), 0)
+
+                # Queries returning an unbounded number of rows are not
+                # pipelined, as their rows could not be held back for a
+                # slow client without stalling the others.
+                counts = pipelined(sd, 'shared'), pipelined(sd, 'acquired')
+                results = await asyncio.gather(
+                    con1.query('select range_unpack(range(0, 1000))'),
+                    con2.query('select range_unpack(range(0, 1000))'),
+                )
+                self.assertEqual([len(r) for r in results], [1000, 1000])
+                self.assertEqual(
+                    (pipelined(sd, 'shared'), pipelined(sd, 'acquired')),
+                    counts,
+                )
+            finally:
+                await con1.aclose()
+                await con2.aclose()
+
+    async def test_server_ops_shard_databases(self):
+        # A database placed on a backend shard is in the global schema of
+        # the servers that learn about it by introspecting it again.
+        with (
+            tempfile.TemporaryDirectory() as td1,
+            tempfile.TemporaryDirectory() as td2,
+            tempfile.TemporaryDirectory() as td3,
+        ):
+            fs = [
+                self.loop.create_task(self._init_pg_cluster(td))
+                for td in [td1, td2]
+            ]
+            await asyncio.wait(fs)
+            cluster1, args1 = await fs[0]
+            cluster2, _ = await fs[1]
+
+            def start_server(runstate_dir):
+                return tb.start_edgedb_server(
+                    runstate_dir=(
+                        None if devmode.is_in_dev_mode() else runstate_dir),
+                    backend_dsn=f'postgres:///?user=postgres&host={td1}',
+                    env={
+                        'EDGEDB_SERVER_BACKEND_SHARD_DSNS': (
+                            f'postgres:///?user=postgres&host={td2}'),
+                        'EDGEDB_SERVER_BACKEND_SHARD_MAP': (
+                            json.dumps({'sharded': 1})),
+                    },
+                )
+
+            async def get_dbnames(con):
+                return set(await con.query('SELECT sys::Database.name'))
+
+            try:
+                async with (
+                    start_server(td1) as sd1,
+                    start_server(td3) as sd2,
+                ):
+                    con1 = await sd1.connect(**args1)
+                    con2 = await sd2.connect(**args1)
+                    try:
+                        await con1.execute('CREATE DATABASE sharded;')
+                        self.assertIn('sharded', await get_dbnames(con1))
+
+                        async for tr in self.try_until_succeeds(
+                            ignore=AssertionError,
+                            timeout=30,
+                        ):
+                            async with tr:
+                                self.assertIn(
+                                    'sharded', await get_dbnames(con2))
+
+                        with self.assertRaises(
+                            errors.DuplicateDatabaseDefinitionError
+                        ):
+                            await con2.execute('CREATE DATABASE sharded;')
+
+                        await con2.execute('DROP DATABASE sharded;')
+                        self.assertNotIn('sharded', await get_dbnames(con2))
+                    finally:
+                        await con1.aclose()
+                        await con2.aclose()
+            finally:
+                try:
+                    await cluster1.stop()
+                finally:
+                    await cluster2.stop()
+
     async def test_server_ops_multi_tenant(self):
         with (
             tempfile.TemporaryDirectory() as td1,
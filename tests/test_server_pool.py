@@ -290,6 +290,9 @@ class Spec:
     disconn_cost_base: float = 0.006
     disconn_cost_var: float = 0.0015
     score: typing.List[ScoreMethod] = dataclasses.field(default_factory=list)
+    # Keyword arguments of Pool.set_policy() per database
+    policies: typing.Dict[str, typing.Dict[str, typing.Any]] = (
+        dataclasses.field(default_factory=dict))
 
     def __post_init__(self):
         self.timeout *= TIME_SCALE
@@ -506,6 +509,8 @@ class SimulatedCase(unittest.TestCase, metaclass=SimulatedCaseMeta):
         )
         if hasattr(pool, '_gc_interval'):
             pool._gc_interval = 0.1 * TIME_SCALE
+        for db, policy in spec.policies.items():
+            pool.set_policy(db, **policy)
 
         TICK_EVERY = 0.001
 
@@ -1290,6 +1295,70 @@ class TestServerConnpoolSimulation(SimulatedCase):
             ]
         )
 
+    @with_base_test
+    def test_server_connpool_11(self):
+        return Spec(
+            desc='''
+            This is a test for per-database pool policies under skewed
+            load. t1 has a moderate load but is weighted and has a
+            reservation, like a tenant paying for guaranteed capacity, while
+            t2 - t5 together ask for several times the pool capacity. t1
+            should see much lower acquire latencies than the others, without
+            the pool losing throughput to excess connection churn.
+            ''',
+            timeout=20,
+            duration=1.1,
+            capacity=100,
+            conn_cost_base=0.01,
+            conn_cost_var=0.005,
+            policies={
+                't1': dict(weight=4, reserved=30),
+            },
+            score=[
+                LatencyRatio(
+                    percentile='P75',
+                    dividend=range(1, 2),
+                    divisor=range(2, 6),
+                    weight=0.4,
+                    v100=0.1, v90=0.25, v60=0.5, v0=1.0,
+                ),
+                LatencyRatio(
+                    percentile='P99',
+                    dividend=range(1, 2),
+                    divisor=range(2, 6),
+                    weight=0.2,
+                    v100=0.2, v90=0.4, v60=0.7, v0=1.2,
+                ),
+                LatencyDistribution(
+                    group=range(2, 6), weight=0.2,
+                    v100=0.2, v90=0.5, v60=1.0, v0=2.0,
+                ),
+                ConnectionOverhead(
+                    weight=0.2, v100=0, v90=200, v60=400, v0=1000,
+                ),
+            ],
+            dbs=[
+                DBSpec(
+                    db='t1',
+                    start_at=0,
+                    end_at=1.0,
+                    qps=int(self.full_qps / 4),
+                    query_cost_base=0.01,
+                    query_cost_var=0.005,
+                ),
+            ] + [
+                DBSpec(
+                    db=f't{i}',
+                    start_at=0.1,
+                    end_at=1.0,
+                    qps=int(self.full_qps / 2),
+                    query_cost_base=0.01,
+                    query_cost_var=0.005,
+                )
+                for i in range(2, 6)
+            ]
+        )
+
 
 class TestServerConnectionPool(unittest.TestCase):
 
@@ -1407,6 +1476,200 @@ class TestServerConnectionPool(unittest.TestCase):
 
         asyncio.run(main())
 
+    def test_connpool_prefer(self):
+        async def test():
+            pool = connpool.Pool(
+                connect=self.make_fake_connect(),
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=5,
+            )
+
+            conns = [await pool.acquire('aaa') for _ in range(3)]
+            for conn in conns:
+                pool.release('aaa', conn)
+
+            # The preferred connection is handed out even though it is
+            # not the most recently used one.
+            conn = await pool.acquire('aaa', prefer=lambda c: c is conns[0])
+            self.assertIs(conn, conns[0])
+            pool.release('aaa', conn)
+
+            # Without a match, the most recently used one is.
+            conn = await pool.acquire('aaa', prefer=lambda c: False)
+            self.assertIs(conn, conns[0])
+            pool.release('aaa', conn)
+
+            # The connection with the highest score is handed out.
+            scores = {conns[0]: 1, conns[1]: 2, conns[2]: 1}
+            conn = await pool.acquire('aaa', prefer=scores.__getitem__)
+            self.assertIs(conn, conns[1])
+            pool.release('aaa', conn)
+
+            # The stack stays ordered by release time.
+            block = pool._blocks['aaa']
+            self.assertEqual(
+                [block.conns[c].in_stack_since for c in block.conn_stack],
+                sorted(block.conns[c].in_stack_since
+                       for c in block.conn_stack),
+            )
+
+        async def main():
+            await asyncio.wait_for(test(), timeout=5)
+
+        asyncio.run(main())
+
+    def test_connpool_policy(self):
+        async def test():
+            pool = connpool.Pool(
+                connect=self.make_fake_connect(),
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=10,
+            )
+            pool.set_policy('aaa', reserved=4)
+
+            async def query(db):
+                conn = await pool.acquire(db)
+                await asyncio.sleep(0.05)
+                pool.release(db, conn)
+
+            async with taskgroup.TaskGroup() as g:
+                for _ in range(40):
+                    g.create_task(query('bbb'))
+                await asyncio.sleep(0.02)
+                for _ in range(8):
+                    g.create_task(query('aaa'))
+                await asyncio.sleep(0.1)
+
+                # With 40 queries of the other database waiting, 'aaa'
+                # only gets a single connection by its demand, but its
+                # reservation guarantees it 4.
+                self.assertEqual(pool._blocks['aaa'].quota, 4)
+                self.assertLessEqual(
+                    pool._blocks['aaa'].quota + pool._blocks['bbb'].quota,
+                    10,
+                )
+
+            with self.assertRaises(ValueError):
+                pool.set_policy('aaa', weight=0)
+
+        async def main():
+            await asyncio.wait_for(test(), timeout=5)
+
+        asyncio.run(main())
+
+    def test_connpool_warm_up(self):
+        async def test():
+            pool = connpool.Pool(
+                connect=self.make_fake_connect(),
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=5,
+            )
+
+            pool.warm_up('aaa', 3)
+            pool.warm_up('bbb', 3)
+            # The max capacity is not exceeded.
+            self.assertEqual(pool.current_capacity, 5)
+            self.assertEqual(pool.get_pending_conns(), 5)
+
+            await asyncio.sleep(0.1)
+            self.assertEqual(pool.get_pending_conns(), 0)
+            self.assertEqual(pool._blocks['aaa'].count_queued_conns(), 3)
+            self.assertEqual(pool._blocks['bbb'].count_queued_conns(), 2)
+
+            # Acquiring a warmed up connection doesn't wait for a new one.
+            conn = await pool.acquire('aaa')
+            self.assertEqual(pool.current_capacity, 5)
+            pool.release('aaa', conn)
+
+        async def main():
+            await asyncio.wait_for(test(), timeout=5)
+
+        asyncio.run(main())
+
+    def test_connpool_warm_up_stats(self):
+        async def test():
+            snapshots = []
+            pool = connpool.Pool(
+                connect=self.make_fake_connect(),
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=5,
+                stats_collector=snapshots.append,
+            )
+
+            # Connections are opened before the first acquire().
+            pool.warm_up('aaa', 3)
+            await asyncio.sleep(0.1)
+            self.assertEqual(pool._blocks['aaa'].count_queued_conns(), 3)
+
+            # The pool is not busy enough to tick; the stats are
+            # reported on demand.
+            pool.report_stats()
+            self.assertEqual(len(snapshots), 1)
+            snapshot = snapshots[0]
+            self.assertEqual(snapshot.capacity, 3)
+            self.assertEqual(
+                [(b.dbname, b.nconns) for b in snapshot.blocks], [('aaa', 3)])
+            self.assertEqual(
+                [e.event for e in snapshot.log if e.dbname == 'aaa'].count(
+                    'connect'),
+                3,
+            )
+
+            conn = await pool.acquire('aaa')
+            pool.release('aaa', conn)
+            pool.report_stats()
+            self.assertEqual(len(snapshots), 2)
+            self.assertNotIn(
+                'connect', [e.event for e in snapshots[1].log])
+
+        async def main():
+            await asyncio.wait_for(test(), timeout=5)
+
+        asyncio.run(main())
+
+    @unittest.mock.patch('edb.server.connpool.pool.PREDICT_INTERVAL', 0.05)
+    def test_connpool_predictive(self):
+        async def test():
+            pool = connpool.Pool(
+                connect=self.make_fake_connect(),
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=10,
+                predictive=True,
+            )
+
+            async def query():
+                conn = await pool.acquire('aaa')
+                await asyncio.sleep(0.02)
+                pool.release('aaa', conn)
+
+            # A steady stream of queries, one at a time: about 1 connection
+            # is in use at any time.
+            for _ in range(20):
+                await query()
+
+            block = pool._blocks['aaa']
+            self.assertGreaterEqual(block.predicted_conns, 1)
+
+            # A burst of concurrent queries raises the prediction and
+            # connections are opened for it.
+            await asyncio.gather(*(query() for _ in range(8)))
+            await asyncio.sleep(0.1)
+            self.assertGreater(block.predicted_conns, 1)
+            self.assertGreaterEqual(
+                block.count_conns(),
+                min(block.predicted_conns, pool.max_capacity),
+            )
+
+            # The prediction decays once the pool is idle.
+            await asyncio.sleep(connpool.pool.PREDICT_HISTORY * 0.05 + 0.2)
+            self.assertEqual(block.predicted_conns, 0)
+            self.assertIsNone(pool._hpredict)
+
+        async def main():
+            await asyncio.wait_for(test(), timeout=10)
+
+        asyncio.run(main())
+
     class MockLogger(logging.Logger):
         logs: asyncio.Queue
 
@@ -17,9 +17,25 @@
 #
 
 
+import asyncio
+import pathlib
+import tempfile
+import types
 import unittest
+import unittest.mock
 
+import immutables
+
+from edb import edgeql
+from edb.server import compiler
+from edb.server import defines
+from edb.server import pgreplica
+from edb.server import pgshard
+from edb.server import query_cache
 from edb.server import server
+from edb.server import tenant
+from edb.server.compiler import dbstate
+from edb.server.dbview import dbview
 
 
 class TestServerUnittests(unittest.TestCase):
@@ -108,3 +124,210 @@ class TestServerUnittests(unittest.TestCase):
                 (set(expected[0]), set(expected[1]))
             )
             self.assertEqual(tuple(has_wildcards), expected_wildcard)
+
+    def test_server_unittest_persistent_query_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = query_cache.PersistentQueryCache(
+                pathlib.Path(tmp), 'instance')
+            key1 = (query_cache.FORMAT_VERSION, 1, 'a', 'b')
+            key2 = (query_cache.FORMAT_VERSION, 1, 'c', 'b')
+
+            self.assertEqual(store.load('db', key1), [])
+
+            store.save('db', key1, [('q1', 'unit1'), ('q2', 'unit2')])
+            self.assertEqual(
+                store.load('db', key1), [('q1', 'unit1'), ('q2', 'unit2')])
+            self.assertEqual(store.load('other', key1), [])
+
+            # A schema change makes the stored entries stale.
+            self.assertEqual(store.load('db', key2), [])
+            self.assertEqual(store.load('db', key1), [])
+
+            store.save('db', key2, [('q1', 'unit1')])
+            store.discard('db')
+            self.assertEqual(store.load('db', key2), [])
+
+    def test_server_unittest_persistent_query_cache_entries(self):
+        # Entries are stored under the keys of the compiled query cache:
+        # the request, the module aliases and the session config.
+        version_key = (query_cache.FORMAT_VERSION, 1, 'a', 'b')
+        group = dbstate.QueryUnitGroup(
+            cardinality=compiler.Cardinality.ONE,
+            capabilities=compiler.Capability.MODIFICATIONS,
+        )
+        group.append(dbstate.QueryUnit(
+            sql=(b'SELECT 1',),
+            status=b'SELECT',
+            output_format=compiler.OutputFormat.JSON,
+            cardinality=compiler.Cardinality.ONE,
+        ))
+
+        for source_cls in [edgeql.Source, edgeql.NormalizedSource]:
+            with self.subTest(source=source_cls.__name__):
+                request = dbview.QueryRequestInfo(
+                    source_cls.from_string('select 1 + 2'),
+                    (2, 0),
+                    output_format=compiler.OutputFormat.JSON,
+                    expect_one=True,
+                    implicit_limit=10,
+                    allow_capabilities=compiler.Capability.MODIFICATIONS,
+                )
+                key = (
+                    request,
+                    immutables.Map({None: 'default'}),
+                    immutables.Map(),
+                )
+
+                with tempfile.TemporaryDirectory() as tmp:
+                    store = query_cache.PersistentQueryCache(
+                        pathlib.Path(tmp), 'instance')
+                    store.save('db', version_key, [(key, group)])
+                    [(loaded_key, loaded_group)] = store.load(
+                        'db', version_key)
+
+                self.assertEqual(loaded_key, key)
+                self.assertEqual(hash(loaded_key), hash(key))
+                loaded_request = loaded_key[0]
+                self.assertIsInstance(loaded_request.source, source_cls)
+                self.assertEqual(
+                    loaded_request.source.text(), request.source.text())
+                self.assertEqual(
+                    loaded_request.allow_capabilities,
+                    request.allow_capabilities,
+                )
+                self.assertEqual(loaded_group, group)
+
+    def test_server_unittest_persist_query_cache_failure(self):
+        # A database whose cache could not be saved is retried.
+        db = unittest.mock.Mock(user_schema=object())
+        db.name = 'db'
+        db.get_persistable_query_cache.return_value = [('q', 'unit')]
+        store = unittest.mock.Mock()
+        store.save.side_effect = OSError('no space left on device')
+        dbindex = unittest.mock.Mock()
+        dbindex.iter_dbs.return_value = [db]
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        t = types.SimpleNamespace(
+            _query_cache_store=store,
+            _dbindex=dbindex,
+            _Tenant__loop=loop,
+        )
+        with unittest.mock.patch.object(
+            query_cache, 'get_version_key', return_value='v',
+        ), self.assertLogs('edb.server', level='ERROR'):
+            loop.run_until_complete(tenant.Tenant._persist_query_caches(t))
+
+        store.save.assert_called_once_with('db', 'v', [('q', 'unit')])
+        db.mark_query_cache_unpersisted.assert_called_once_with()
+
+    def test_server_unittest_read_replica_lsn(self):
+        self.assertEqual(pgreplica.parse_lsn('0/0'), 0)
+        self.assertEqual(pgreplica.parse_lsn('0/10'), 0x10)
+        self.assertEqual(pgreplica.parse_lsn('16/B374D848'), 0x16B374D848)
+        self.assertLess(
+            pgreplica.parse_lsn('0/FFFFFFFF'), pgreplica.parse_lsn('1/0'))
+        with self.assertRaises(ValueError):
+            pgreplica.parse_lsn('B374D848')
+
+    def test_server_unittest_read_replica_check(self):
+        replica = pgreplica.ReadReplica('postgres://replica:5433', None)
+        self.assertFalse(replica.is_available())
+
+        replica._check_conn = unittest.mock.Mock()
+        replica._check_conn.is_healthy.return_value = True
+        replica._check_conn.sql_fetch = unittest.mock.AsyncMock(
+            return_value=[[b'0.25', b'1/10']])
+        self.assertEqual(
+            asyncio.run(replica._check_lag()), (0.25, (1 << 32) + 0x10))
+
+        # Not a replica, or nothing replayed yet.
+        replica._check_conn.sql_fetch.return_value = [[None, None]]
+        self.assertEqual(asyncio.run(replica._check_lag()), (None, 0))
+
+        replica._replay_lsn = 100
+        replica._set_lag(0.0)
+        self.assertTrue(replica.is_available())
+        self.assertTrue(replica.is_available(100))
+        self.assertFalse(replica.is_available(101))
+
+        replica._set_lag(pgreplica.READ_REPLICA_MAX_LAG + 1)
+        self.assertFalse(replica.is_available())
+
+        replica._set_lag(0.0)
+        replica.mark_unavailable()
+        self.assertFalse(replica.is_available())
+
+    def test_server_unittest_read_replica_routing(self):
+        def make_replica(name, replay_lsn):
+            replica = pgreplica.ReadReplica(f'postgres://{name}:5433', None)
+            replica._replay_lsn = replay_lsn
+            replica._set_lag(0.0)
+            return replica
+
+        r1 = make_replica('r1', 10)
+        r2 = make_replica('r2', 20)
+        t = types.SimpleNamespace(
+            _read_replicas=[r1, r2],
+            _next_read_replica=0,
+            _ddl_lsn=0,
+            _ddl_lsn_pending=0,
+        )
+
+        def pick():
+            return tenant.Tenant.get_read_replica(t)
+
+        # The replicas are used in turns.
+        self.assertEqual([pick(), pick(), pick()], [r1, r2, r1])
+
+        # Only the replicas that replayed the last schema change.
+        t._ddl_lsn = 15
+        self.assertEqual([pick(), pick()], [r2, r2])
+        t._ddl_lsn = 25
+        self.assertIsNone(pick())
+
+        # While the position of a schema change is being fetched.
+        t._ddl_lsn = 0
+        t._ddl_lsn_pending = 1
+        self.assertIsNone(pick())
+
+    def test_server_unittest_shard_placement(self):
+        for dbname in defines.EDGEDB_SPECIAL_DBS:
+            self.assertEqual(pgshard.get_placement(dbname, 3), pgshard.HOME)
+        self.assertEqual(pgshard.get_placement('db', 1), pgshard.HOME)
+
+        # The placement only depends on the name, and uses all shards.
+        names = [f'db{i}' for i in range(100)]
+        placements = [pgshard.get_placement(name, 3) for name in names]
+        self.assertEqual(
+            placements, [pgshard.get_placement(name, 3) for name in names])
+        self.assertEqual(set(placements), {0, 1, 2})
+
+        with unittest.mock.patch.dict(
+            pgshard.BACKEND_SHARD_MAP,
+            {'db0': 2, 'db1': 1, defines.EDGEDB_SYSTEM_DB: 1},
+        ):
+            self.assertEqual(pgshard.get_placement('db0', 3), 2)
+            self.assertEqual(pgshard.get_placement('db1', 3), 1)
+            # The system database always stays home.
+            self.assertEqual(
+                pgshard.get_placement(defines.EDGEDB_SYSTEM_DB, 3),
+                pgshard.HOME,
+            )
+
+    def test_server_unittest_shard_existing_placement(self):
+        # A database that exists on several clusters is used on the
+        # first one it was found on, the home cluster first...
+        self.assertEqual(pgshard.get_existing_placement('db', [2]), 2)
+        self.assertEqual(pgshard.get_existing_placement('db', [0, 2]), 0)
+        self.assertEqual(pgshard.get_existing_placement('db', [1, 2]), 1)
+
+        # ...unless the shard map places it on another one of them.
+        with unittest.mock.patch.dict(
+            pgshard.BACKEND_SHARD_MAP, {'db': 2, 'other': 1}
+        ):
+            self.assertEqual(pgshard.get_existing_placement('db', [0, 2]), 2)
+            self.assertEqual(pgshard.get_existing_placement('db', [0]), 0)
+            self.assertEqual(
+                pgshard.get_existing_placement('other', [0, 2]), 0)
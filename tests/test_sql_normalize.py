@@ -0,0 +1,138 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2024-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import unittest
+
+from edb.pgsql import codegen
+from edb.pgsql import normalize
+from edb.pgsql import parser
+
+
+class TestSQLNormalize(unittest.TestCase):
+
+    def test_sql_normalize_01(self):
+        source = normalize.normalize(
+            "SELECT a FROM b WHERE x > 5 AND y = 'foo'")
+        self.assertEqual(
+            source.text, "SELECT a FROM b WHERE ((x > $1) AND (y = $2))")
+        self.assertEqual(source.constants, ('5', "'foo'"))
+        self.assertEqual(source.first_param, 1)
+
+    def test_sql_normalize_02(self):
+        # Lifted constants are numbered after the parameters of the query.
+        source = normalize.normalize(
+            "SELECT a FROM b WHERE x > $2 AND y IN ('a', 'b', $1)")
+        self.assertEqual(
+            source.text,
+            "SELECT a FROM b WHERE ((x > $2) AND (y IN ($3, $4, $1)))",
+        )
+        self.assertEqual(source.constants, ("'a'", "'b'"))
+        self.assertEqual(source.first_param, 3)
+
+    def test_sql_normalize_03(self):
+        # Queries differing only in their constants share the cache key.
+        a = normalize.normalize("SELECT a FROM b WHERE x > 5")
+        b = normalize.normalize("SELECT a FROM b WHERE x > 42")
+        c = normalize.normalize("SELECT a FROM b WHERE x < 5")
+        self.assertEqual(a.cache_key(), b.cache_key())
+        self.assertNotEqual(a.cache_key(), c.cache_key())
+
+    def test_sql_normalize_04(self):
+        # Constants the translation may look at are left alone.
+        for query in [
+            "SELECT 1",
+            "SELECT a FROM b WHERE x > f(5)",
+            "SELECT a FROM b WHERE x > '5'::int8",
+            "SELECT a FROM b WHERE x = current_query()",
+        ]:
+            with self.subTest(query=query):
+                self.assertIsNone(normalize.normalize(query))
+
+    def test_sql_normalize_05(self):
+        # Only queries made of a single SELECT are normalized.
+        for query in [
+            "SELECT a FROM b WHERE x > 5; SELECT a FROM b WHERE x > 5",
+            "UPDATE b SET a = 1 WHERE x > 5",
+            "SELECT a FRO b WHERE x > 5",
+        ]:
+            with self.subTest(query=query):
+                self.assertIsNone(normalize.normalize(query))
+
+    def test_sql_normalize_template_01(self):
+        source = codegen.SQLSource(
+            text='SELECT $1 + $3 + $3',
+            param_index={},
+            param_offsets={1: [7], 3: [12, 17]},
+        )
+        template = source.get_template(2)
+        self.assertEqual(template.chunks, ('SELECT $1 + ', ' + ', ''))
+        self.assertEqual(template.params, (1, 1))
+        self.assertEqual(
+            template.instantiate(['10', '200']), 'SELECT $1 + 200 + 200')
+
+    def test_sql_normalize_template_02(self):
+        template = codegen.SQLTemplate(
+            chunks=('SELECT ', ' + ', ''),
+            params=(0, 1),
+            first_param=3,
+        )
+        values = ['10', '200']
+        # SELECT $3 + $4
+        # SELECT 10 + 200
+        self.assertEqual(template.instantiate(values), 'SELECT 10 + 200')
+        for pos, expected in [
+            (0, 0),
+            (6, 6),
+            # within a value: its parameter
+            (7, 7),
+            (8, 8),
+            (9, 9),
+            (12, 12),
+            (13, 13),
+            (14, 13),
+            # the end of the text
+            (15, 14),
+        ]:
+            with self.subTest(pos=pos):
+                self.assertEqual(template.translate(pos, values), expected)
+
+    def test_sql_normalize_error_position_01(self):
+        # Positions in an instantiated translation are mapped back to
+        # the constants in the original query.
+        query = "SELECT a FROM b WHERE x > 'abc' AND y IN (42, 'foo')"
+        source = normalize.normalize(query)
+
+        stmt = parser.parse(source.text)[0]
+        translated = codegen.generate(
+            stmt, pretty=False, with_translation_data=True)
+        template = translated.get_template(source.first_param)
+        text = template.instantiate(source.constants)
+        translation_data = codegen.TemplateTranslationData(
+            template=template,
+            values=source.constants,
+            translation_data=translated.translation_data,
+            source_translation_data=source.translation_data,
+        )
+
+        for constant in ["'abc'", '42', "'foo'"]:
+            with self.subTest(constant=constant):
+                # Like Postgres, positions are 1-based.
+                pos = text.index(constant) + 1
+                self.assertEqual(
+                    translation_data.translate(pos), query.index(constant))
@@ -20,6 +20,7 @@ import csv
 import io
 import os.path
 import unittest
+import uuid
 
 from edb.testbase import server as tb
 from edb.tools import test
@@ -586,6 +587,48 @@ class TestSQL(tb.SQLQueryTestCase):
             [2, 1],
         ])
 
+    async def test_sql_query_39(self):
+        # queries differing only in constants share the translation,
+        # so they add a single entry to the query cache of the database
+        N = 20
+
+        def cache_size():
+            databases = self.fetch_server_info()['databases']
+            return databases[self.get_database_name()]['query_cache_size']
+
+        name = f'x_{uuid.uuid4().hex}'
+        orig_size = cache_size()
+        for i in range(N):
+            first_name = ('Tom', 'Robin')[i % 2]
+            year = 1970 + i
+            res = await self.squery_values(
+                f'''
+                SELECT title AS {name} FROM "Movie"
+                WHERE release_year > {year} AND director_id IN (
+                    SELECT id FROM "Person"
+                    WHERE first_name IN ('{first_name}', 'Steven')
+                )
+                ORDER BY title
+                '''
+            )
+            self.assertEqual(res, [['Saving Private Ryan']])
+        self.assertEqual(cache_size() - orig_size, 1)
+
+        for year, titles in [
+            (1990, ['Forrest Gump', 'Saving Private Ryan']),
+            (1995, ['Saving Private Ryan']),
+            (-1, ['Forrest Gump', 'Saving Private Ryan']),
+        ]:
+            res = await self.scon.fetch(
+                f'''
+                SELECT title FROM "Movie"
+                WHERE release_year > {year} AND title NOT IN ($1, 'It''s')
+                ORDER BY title
+                ''',
+                'Cast Away',
+            )
+            self.assertEqual([r[0] for r in res], titles)
+
     async def test_sql_query_introspection_00(self):
         dbname = self.con.dbname
         res = await self.squery_values(